@@ -0,0 +1,38 @@
+import threading
+
+
+class AckBatcher:
+    """
+    Batches consumer acknowledgements when messages are processed out of order
+    by a worker pool. Only the highest *contiguous* processed delivery tag is acked
+    (with multiple=True), every `ack_every` messages or as soon as no work is
+    outstanding, so the prefetch window can never stall and no unprocessed
+    message is ever acked.
+    """
+    def __init__(self, ack_fn, ack_every=10):
+        self.ack_fn = ack_fn            # ack_fn(delivery_tag, multiple) - must be safe to call from any thread
+        self.ack_every = ack_every
+        self._lock = threading.Lock()
+        self._done = set()              # processed tags above the floor
+        self._floor = 0                 # every tag <= floor has been processed
+        self._acked = 0                 # highest tag acknowledged to the broker
+        self._outstanding = 0           # delivered but not processed yet
+        self.acks_sent = 0
+
+    def delivered(self, delivery_tag):
+        with self._lock:
+            self._outstanding += 1
+
+    def processed(self, delivery_tag):
+        with self._lock:
+            self._outstanding -= 1
+            self._done.add(delivery_tag)
+            while self._floor + 1 in self._done:
+                self._floor += 1
+                self._done.discard(self._floor)
+            pending = self._floor - self._acked
+            if pending <= 0 or (pending < self.ack_every and self._outstanding):
+                return
+            tag = self._acked = self._floor
+            self.acks_sent += 1
+        self.ack_fn(tag, True)
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from server import Server
+from framing import FrameError, read_frame_async, write_message_async
+from codec import detect_codec
+
+
+class AsyncServer(Server):
+    """
+    Song server running every connection on one asyncio event loop instead of
+    one worker thread per connection, so idle or slow clients only cost a socket.
+    Request handling (Lamport updates, ordered queue, responses) is shared with Server.
+    """
+    def __init__(self, host='localhost', port=5001, queue_size=1024, max_workers=32, backlog=4096,
+                 clock="lamport", catalog=None):
+        # enqueue_timeout=0: a full queue must never block the event loop
+        # max_workers sizes the thread pool requests are handled on, off the event loop
+        super().__init__(host, port, queue_size=queue_size, enqueue_timeout=0, max_workers=max_workers,
+                         backlog=backlog, clock=clock, catalog=catalog)
+        self._loop = None
+        self._aio_server = None
+        self._writers = set()
+        self.connections = 0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            print("[AsyncServer] already running"); return
+
+        self._stop.clear()
+        _raise_fd_limit()
+        self.request_queue.start_consumer(self._dispatch_request, concurrent=self.lamport_clock.concurrent,
+                                          workers=self.dispatch_workers)
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, args=(ready,), daemon=True)
+        self._thread.start()
+        ready.wait(timeout=5)
+
+    def _run_loop(self, ready):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.set_default_executor(ThreadPoolExecutor(self.max_workers, thread_name_prefix="SERVER"))
+        self._loop = loop
+        try:
+            self._aio_server = loop.run_until_complete(asyncio.start_server(
+                self._handle_client_async, self.host, self.port,
+                backlog=self.backlog, reuse_address=True))
+        except OSError as e:
+            print(f"[AsyncServer] could not listen on {self.host}:{self.port}: {e}")
+            ready.set()
+            loop.close()
+            return
+        print(f"[AsyncServer] Listening on {self.host}:{self.port}")
+        ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    async def _shutdown(self):
+        """Stop listening, close every client connection and let the handlers finish"""
+        self._aio_server.close()
+        for writer in list(self._writers):
+            writer.close()
+        handlers = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        if handlers:
+            await asyncio.wait(handlers, timeout=1)
+        asyncio.get_running_loop().stop()
+
+    async def _handle_client_async(self, reader, writer):
+        addr = writer.get_extra_info("peername")
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            # a connection may carry any number of framed requests
+            while True:
+                payload = await read_frame_async(reader)
+                if payload is None:
+                    break
+                codec = detect_codec(payload)   # answer in the codec the client spoke
+                message = codec.decode(payload)
+                await write_message_async(writer, await self._respond_async(message, addr), codec)
+        except (FrameError, ConnectionError, ValueError) as e:
+            print(f"[SERVER] Dropping connection {addr}: {e}")
+        finally:
+            self.connections -= 1
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _respond_async(self, message, addr):
+        """Build the response on the worker pool so slow handling never stalls the event loop"""
+        try:
+            if not isinstance(message, dict):
+                raise ValueError("request is not an object")
+            return await asyncio.get_running_loop().run_in_executor(None, self._respond, message)
+        except Exception as e:
+            # malformed request (missing field, wrong type, ...): answer it, keep the connection
+            print(f"[SERVER] Bad request from {addr}: {e!r}")
+            return self._error_response(message, f"Bad request: {e!r}")
+
+    def stop(self):
+        self._stop.set()
+        self.request_queue.stop_consumer()
+        if self._loop and self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop)
+        if self._thread:
+            self._thread.join(timeout=2)
+
+
+def _raise_fd_limit():
+    """Lift the soft open-file limit to the hard limit so many sockets can stay open"""
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
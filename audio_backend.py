@@ -0,0 +1,199 @@
+import threading
+import time
+
+# Audio backends used by MusicPlayer. A backend provides:
+#   load(file_path) -> Sound      decode a whole file into memory (raises backend.error)
+#   decoded_size(sound) -> int    bytes of PCM the Sound holds (for the cache budget)
+#   music                         streaming player: load/play/pause/unpause/stop/get_busy/set_volume
+#   error                         exception raised for files that cannot be loaded
+#   quit()
+# Sounds have get_length() and play() -> Channel; a Channel has set_volume, pause,
+# unpause, stop, get_busy, get_sound, queue and get_queue (the pygame.mixer API).
+
+
+def create_backend(kind="pygame", **options):
+    """Build an audio backend: "pygame" (sound device) or "null" (simulated, no device)"""
+    if kind == "pygame":
+        return PygameBackend()
+    if kind == "null":
+        return NullBackend(**options)
+    raise ValueError(f"unknown audio backend: {kind}")
+
+
+# --- pygame.mixer backend ---
+
+class PygameBackend:
+    name = "pygame"
+
+    def __init__(self):
+        import pygame
+        self.pygame = pygame
+        self.error = pygame.error
+        pygame.mixer.init()
+        self.music = pygame.mixer.music
+
+    def load(self, file_path):
+        return self.pygame.mixer.Sound(file_path)
+
+    def decoded_size(self, sound):
+        """Bytes of PCM held by a Sound, from its length and the mixer's sample format"""
+        init = self.pygame.mixer.get_init()
+        if not init:
+            return 0
+        frequency, sample_format, channels = init
+        return int(sound.get_length() * frequency) * channels * (abs(sample_format) // 8)
+
+    def quit(self):
+        self.pygame.mixer.quit()
+
+
+# --- simulated backend (headless machines, load tests) ---
+
+class NullAudioError(Exception):
+    pass
+
+
+class NullBackend:
+    """
+    Plays nothing and needs no sound device or audio files: tracks last
+    `duration` seconds (a number, or a function of the file path) and playback
+    state is computed from the clock, so many players can run in one process.
+    speed > 1 runs time faster (speed=60 plays a 3-minute track in 3 seconds):
+    Sound.get_length() is the simulated playing time in real seconds.
+    """
+    name = "null"
+    error = NullAudioError
+    FREQUENCY, CHANNELS, SAMPLE_BYTES = 44100, 2, 2   # sizes reported to the cache
+
+    def __init__(self, duration=180.0, speed=1.0, clock=time.monotonic):
+        self._duration = duration if callable(duration) else (lambda file_path: duration)
+        self.speed = speed
+        self.clock = clock
+        self.music = _NullMusic(self)
+
+    def load(self, file_path):
+        return _NullSound(self, file_path, self._duration(file_path))
+
+    def decoded_size(self, sound):
+        return int(sound.duration * self.FREQUENCY) * self.CHANNELS * self.SAMPLE_BYTES
+
+    def quit(self):
+        self.music.stop()
+
+
+class _NullSound:
+    __slots__ = ("backend", "file_path", "duration", "length")
+
+    def __init__(self, backend, file_path, duration):
+        self.backend = backend
+        self.file_path = file_path
+        self.duration = float(duration)          # track length
+        self.length = self.duration / backend.speed  # real seconds it plays for
+
+    def get_length(self):
+        return self.length
+
+    def play(self):
+        channel = _NullChannel(self.backend)
+        channel.play(self)
+        return channel
+
+
+class _NullChannel:
+    """One playing sound plus one queued behind it; switches gaplessly when the first ends"""
+    def __init__(self, backend):
+        self.backend = backend
+        self.volume = 1.0
+        self._lock = threading.Lock()
+        self._sound = None
+        self._queued = None
+        self._started = 0.0        # backend.clock() when _sound started (shifted forward by pauses)
+        self._paused_at = None
+
+    def play(self, sound):
+        with self._lock:
+            self._sound, self._queued = sound, None
+            self._started = self.backend.clock()
+            self._paused_at = None
+
+    def _advance(self):
+        """Move past sounds that have finished by now (called with the lock held)"""
+        now = self._paused_at if self._paused_at is not None else self.backend.clock()
+        while self._sound is not None and now >= self._started + self._sound.length:
+            self._started += self._sound.length
+            self._sound, self._queued = self._queued, None
+
+    def get_busy(self):
+        with self._lock:
+            self._advance()
+            return self._sound is not None
+
+    def get_sound(self):
+        with self._lock:
+            self._advance()
+            return self._sound
+
+    def get_queue(self):
+        with self._lock:
+            self._advance()
+            return self._queued
+
+    def queue(self, sound):
+        with self._lock:
+            self._advance()
+            if self._sound is None:
+                self._sound, self._started = sound, self.backend.clock()
+            else:
+                self._queued = sound
+
+    def pause(self):
+        with self._lock:
+            if self._paused_at is None:
+                self._paused_at = self.backend.clock()
+
+    def unpause(self):
+        with self._lock:
+            if self._paused_at is not None:
+                self._started += self.backend.clock() - self._paused_at
+                self._paused_at = None
+
+    def stop(self):
+        with self._lock:
+            self._sound = self._queued = None
+            self._paused_at = None
+
+    def set_volume(self, volume):
+        self.volume = volume
+
+
+class _NullMusic:
+    """Stands in for pygame.mixer.music: one streamed file at a time"""
+    def __init__(self, backend):
+        self.backend = backend
+        self.volume = 1.0
+        self._channel = _NullChannel(backend)
+        self._loaded = None
+
+    def load(self, file_path):
+        self._channel.stop()
+        self._loaded = self.backend.load(file_path)
+
+    def play(self):
+        if self._loaded is None:
+            raise NullAudioError("music not loaded")
+        self._channel.play(self._loaded)
+
+    def get_busy(self):
+        return self._channel.get_busy()
+
+    def pause(self):
+        self._channel.pause()
+
+    def unpause(self):
+        self._channel.unpause()
+
+    def stop(self):
+        self._channel.stop()
+
+    def set_volume(self, volume):
+        self.volume = volume
@@ -0,0 +1,66 @@
+"""
+Microbenchmark: LamportClock vs the original lock-per-call LockingLamportClock.
+Each thread runs a mix of increment() and update() (and optionally reserve()),
+as the server/client hot paths do.
+
+    python bench/lamport_clock_bench.py [--threads=1,4,16] [--ops=200000] [--reserve=32]
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from lamport_clock import LamportClock, LockingLamportClock
+
+
+def run(clock_cls, threads, ops, reserve):
+    clock = clock_cls("BENCH")
+    start = threading.Barrier(threads + 1)
+    issued = [[] for _ in range(threads)]
+
+    def worker(out):
+        start.wait()
+        received = 0
+        for i in range(ops):
+            if reserve and i % reserve == 0:
+                out.extend(clock.reserve(reserve))
+            elif i % 4 == 0:
+                received += 3   # peer timestamps that sometimes run ahead of ours
+                out.append(clock.update(received))
+            else:
+                out.append(clock.increment())
+
+    workers = [threading.Thread(target=worker, args=(issued[i],)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    start.wait()
+    began = time.perf_counter()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - began
+
+    values = [v for out in issued for v in out]
+    if len(values) != len(set(values)):
+        raise AssertionError(f"{clock_cls.__name__}: duplicate timestamps")
+    if any(out != sorted(out) for out in issued):
+        raise AssertionError(f"{clock_cls.__name__}: timestamps went backwards within a thread")
+    return threads * ops / elapsed
+
+
+def main():
+    options = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--") and "=" in arg)
+    thread_counts = [int(n) for n in options.get("threads", "1,4,16").split(",")]
+    ops = int(options.get("ops", 200000))
+    reserve = int(options.get("reserve", 0))
+
+    print(f"{'threads':>7}  {'locking ops/s':>14}  {'lock-free ops/s':>15}  {'speedup':>7}")
+    for threads in thread_counts:
+        per_thread = ops // threads
+        old = run(LockingLamportClock, threads, per_thread, reserve)
+        new = run(LamportClock, threads, per_thread, reserve)
+        print(f"{threads:>7}  {old:>14,.0f}  {new:>15,.0f}  {new / old:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
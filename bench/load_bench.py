@@ -0,0 +1,348 @@
+"""
+Load generator: concurrent Clients against a Server and a TwoPhaseCommitCoordinator
+over loopback, one thread per client. For each workload it reports throughput,
+p50/p99/p999 latency and process CPU time per operation:
+
+  song_request   request/response on each client's server connection
+  add_remove     add_song / remove_song 2PC transactions (every client is a participant)
+  notify         artist update published -> delivered to every subscribed client
+
+Client/server logging goes to /dev/null while a workload runs (--verbose keeps it).
+The server gets one worker per client unless --server-workers says otherwise; a
+"busy" reply or a failed request counts as an error.
+--json=FILE writes the results, plus the commit and configuration, for comparing runs.
+
+    python bench/load_bench.py [--clients=8] [--server-workers=CLIENTS] [--ops=200] [--warmup=10]
+        [--workloads=song_request,add_remove,notify] [--engine=threaded|asyncio]
+        [--broker=inprocess|pika] [--clock=lamport] [--codec=json] [--fresh-connections]
+        [--port=5101] [--coordinator-port=5102] [--json=results.json] [--verbose]
+"""
+import contextlib
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from catalog import load_catalog
+from client import Client
+from coordinator_2pc import TwoPhaseCommitCoordinator
+from framing import decode_message, recv_message, send_message
+from health import wait_until_ready
+from notifications import Notifications
+from server import create_server
+from transport import create_transport
+
+WORKLOADS = ("song_request", "add_remove", "notify")
+BENCH_ARTIST = "Bench Artist"
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    rank = max(int(len(sorted_values) * p / 100.0 + 0.999999) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(name, latencies, seconds, cpu_seconds, errors=0, **extra):
+    latencies = sorted(latencies)
+    ops = len(latencies)
+    ms = lambda value: None if value is None else round(value * 1000, 3)
+    return {
+        "workload": name,
+        "ops": ops,
+        "errors": errors,
+        "seconds": round(seconds, 4),
+        "throughput_ops_s": round(ops / seconds, 1) if seconds else None,
+        "latency_ms": {
+            "mean": ms(sum(latencies) / ops) if ops else None,
+            "p50": ms(percentile(latencies, 50)),
+            "p99": ms(percentile(latencies, 99)),
+            "p999": ms(percentile(latencies, 99.9)),
+            "max": ms(latencies[-1]) if ops else None,
+        },
+        "cpu_us_per_op": round(cpu_seconds / ops * 1e6, 1) if ops else None,
+        **extra,
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def quiet(enabled):
+    """Send print() output from every thread to /dev/null"""
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def run_clients(clients, ops, operation, warmup=0):
+    """
+    Run operation(client, i) -> label (or raise) ops times on every client at once.
+    Returns ({label: [latency, ...]}, errors, seconds, cpu_seconds).
+    """
+    latencies = {}
+    errors = [0]
+    lock = threading.Lock()
+    start = threading.Barrier(len(clients) + 1)
+
+    def worker(client):
+        for i in range(-warmup, 0):   # negative i: warm-up, not measured
+            try:
+                operation(client, i)
+            except Exception:
+                pass
+        start.wait()
+        mine = {}
+        failed = 0
+        for i in range(ops):
+            began = time.perf_counter()
+            try:
+                label = operation(client, i)
+            except Exception:
+                failed += 1
+                continue
+            mine.setdefault(label, []).append(time.perf_counter() - began)
+        with lock:
+            for label, values in mine.items():
+                latencies.setdefault(label, []).extend(values)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker, args=(client,)) for client in clients]
+    for t in threads:
+        t.start()
+    start.wait()
+    cpu = time.process_time()
+    began = time.perf_counter()
+    for t in threads:
+        t.join()
+    return latencies, errors[0], time.perf_counter() - began, time.process_time() - cpu
+
+
+def bench_song_request(clients, options, catalog):
+    songs = [f"{song['title']} - {song['artist']}" for song in catalog.page(0, 50)]
+
+    def operation(client, i):
+        song = songs[i % len(songs)]
+        if options["fresh_connections"]:
+            # what client.song_request does, minus its catch-all, so failures are counted
+            with socket.create_connection((client.server_host, client.server_port), timeout=10.0) as s:
+                send_message(s, client._song_message(song), client.codec)
+                response = recv_message(s)   # raises ConnectionError if the server hangs up
+            client._on_song_response(response)
+        else:
+            response = client.song_request_async(song).result(timeout=10.0)
+        if response.get("status") == "busy":
+            raise RuntimeError("server busy")
+        return "song_request"
+
+    latencies, errors, seconds, cpu = run_clients(clients, options["ops"], operation, options["warmup"])
+    return [summarize("song_request", latencies.get("song_request", []), seconds, cpu, errors,
+                      clients=len(clients))]
+
+
+def bench_add_remove(clients, options, catalog):
+    aborted = {"add_song": 0, "remove_song": 0}
+    failed = {"add_song": 0, "remove_song": 0}
+    lock = threading.Lock()
+
+    def operation(client, i):
+        # each client adds a song of its own, then removes it again
+        song_id = f"{client.node_id}-song-{i // 2}"
+        label = "add_song" if i % 2 == 0 else "remove_song"
+        try:
+            ok = client.add_song(song_id) if label == "add_song" else client.remove_song(song_id)
+        except Exception:
+            if i >= 0:
+                with lock:
+                    failed[label] += 1
+            raise
+        if not ok and i >= 0:
+            with lock:
+                aborted[label] += 1
+        return label
+
+    ops = options["ops"] + options["ops"] % 2   # whole add/remove pairs
+    latencies, _, seconds, cpu = run_clients(clients, ops, operation, options["warmup"] * 2)
+    total = sum(len(values) for values in latencies.values())
+    results = []
+    for label in ("add_song", "remove_song"):
+        values = latencies.get(label, [])
+        # both kinds ran interleaved: split wall and CPU time by their share of the operations
+        share = len(values) / total if total else 0
+        results.append(summarize(label, values, seconds * share, cpu * share, failed[label],
+                                 aborted=aborted[label], participants=len(clients)))
+    return results
+
+
+def bench_notify(clients, options, catalog):
+    published_at = {}
+    latencies = []
+    lock = threading.Lock()
+    expected = options["ops"] * len(clients)
+    done = threading.Event()
+
+    def tracking(handler):
+        def on_message(body):
+            handler(body)
+            arrived = time.perf_counter()
+            key = decode_message(body)["message"]
+            with lock:
+                latencies.append(arrived - published_at[key])
+                if len(latencies) >= expected:
+                    done.set()
+        return on_message
+
+    transport = options["transport"]
+    for client in clients:
+        client._handle_notification = tracking(client._handle_notification)
+        client.receive_notification([BENCH_ARTIST])
+    publisher = Notifications("localhost", transport=transport, clock=options["clock"], codec=options["codec"])
+
+    cpu = time.process_time()
+    began = time.perf_counter()
+    for i in range(options["ops"]):
+        key = f"bench update {i}"
+        with lock:
+            published_at[key] = time.perf_counter()
+        publisher.publish_artist_message(BENCH_ARTIST, key)
+    publish_seconds = time.perf_counter() - began
+    delivered_all = done.wait(timeout=30.0)
+    seconds = time.perf_counter() - began
+    cpu = time.process_time() - cpu
+
+    with lock:
+        delivered = list(latencies)
+    return [summarize("notify", delivered, seconds, cpu, expected - len(delivered),
+                      subscribers=len(clients), published=options["ops"],
+                      publish_ops_s=round(options["ops"] / publish_seconds, 1) if publish_seconds else None,
+                      complete=delivered_all)]
+
+
+BENCHMARKS = {
+    "song_request": bench_song_request,
+    "add_remove": bench_add_remove,
+    "notify": bench_notify,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def make_clients(count, options, run_id):
+    return [Client(
+        node_id=f"BENCH_{run_id}_{i}",
+        server_port=options["port"],
+        fav_artist_list=[BENCH_ARTIST],
+        coordinator_port=options["coordinator_port"],
+        participant_port=free_port(),
+        persistent_connection=not options["fresh_connections"],
+        notification_transport=options["transport"],
+        clock=options["clock"],
+        codec=options["codec"],
+    ) for i in range(count)]
+
+
+def run(options):
+    catalog = load_catalog()
+    results = []
+    with quiet(not options["verbose"]):
+        server = create_server(options["engine"], port=options["port"], clock=options["clock"], catalog=catalog,
+                               max_workers=options["server_workers"])
+        server.start()
+        coordinator = TwoPhaseCommitCoordinator(port=options["coordinator_port"], clock=options["clock"],
+                                                codec=options["codec"])
+        coordinator.start()
+        wait_until_ready("localhost", options["port"])
+        wait_until_ready("localhost", options["coordinator_port"])
+        try:
+            for run_id, workload in enumerate(options["workloads"]):
+                # fresh clients per workload, so 2PC fan-out and subscriptions don't pile up
+                clients = make_clients(options["clients"], options, run_id)
+                try:
+                    results.extend(BENCHMARKS[workload](clients, options, catalog))
+                finally:
+                    for client in clients:
+                        client.close()
+                    with coordinator.lock:
+                        coordinator.participants.clear()
+        finally:
+            coordinator.stop()
+            server.stop()
+    return results
+
+
+def print_table(results):
+    print(f"{'workload':<13} {'ops':>7} {'ops/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'p999 ms':>8} "
+          f"{'cpu us/op':>9} {'errors':>6}")
+    for r in results:
+        latency = r["latency_ms"]
+        cells = [latency["p50"], latency["p99"], latency["p999"]]
+        print(f"{r['workload']:<13} {r['ops']:>7} {r['throughput_ops_s'] or 0:>9.1f} "
+              + " ".join(f"{'-' if v is None else f'{v:.2f}':>8}" for v in cells)
+              + f" {r['cpu_us_per_op'] or 0:>9.1f} {r['errors']:>6}")
+
+
+def main():
+    args = sys.argv[1:]
+    options = dict(arg[2:].split("=", 1) for arg in args if arg.startswith("--") and "=" in arg)
+    clients = int(options.get("clients", 8))
+    config = {
+        "clients": clients,
+        "server_workers": int(options.get("server-workers", clients)),
+        "ops": int(options.get("ops", 200)),
+        "warmup": int(options.get("warmup", 10)),
+        "workloads": options.get("workloads", ",".join(WORKLOADS)).split(","),
+        "engine": options.get("engine", "threaded"),
+        "broker": options.get("broker", "inprocess"),
+        "clock": options.get("clock", "lamport"),
+        "codec": options.get("codec", "json"),
+        "port": int(options.get("port", 5101)),
+        "coordinator_port": int(options.get("coordinator-port", 5102)),
+        "fresh_connections": "--fresh-connections" in args,
+        "verbose": "--verbose" in args,
+    }
+    unknown = [w for w in config["workloads"] if w not in BENCHMARKS]
+    if unknown:
+        raise SystemExit(f"unknown workloads: {', '.join(unknown)} (choose from {', '.join(WORKLOADS)})")
+    transport = None if config["broker"] == "pika" else create_transport(config["broker"])
+
+    results = run(dict(config, transport=transport))
+    print(f"{config['clients']} clients, {config['engine']} server with {config['server_workers']} workers"
+          f"{', fresh connections' if config['fresh_connections'] else ''}")
+    print_table(results)
+
+    if "json" in options:
+        report = {
+            "commit": git_commit(),
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {k: v for k, v in config.items() if k != "verbose"},
+            "results": results,
+        }
+        with open(options["json"], "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {options['json']}")
+
+
+if __name__ == "__main__":
+    main()
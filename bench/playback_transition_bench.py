@@ -0,0 +1,123 @@
+"""
+Benchmark: silence between consecutive tracks when playing a playlist.
+
+  sequential  the old way: mixer.music.load/play each file, poll get_busy() until it ends
+  queue       MusicPlayer.play_playlist (decoded Sounds queued on the channel)
+
+A sampler thread watches the mixer and measures every stretch of silence between
+the first track starting and the last one ending. Runs headless on SDL's dummy
+audio driver unless SDL_AUDIODRIVER is already set.
+
+    python bench/playback_transition_bench.py [--tracks=6] [--seconds=0.5] [--poll=0.01] [--files=a.mp3,b.mp3]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import wave
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import pygame
+from music_player import MusicPlayer
+
+
+def write_tracks(directory, count, seconds):
+    """Silent 44.1 kHz stereo wav files"""
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"track_{i}.wav")
+        with wave.open(path, "wb") as out:
+            out.setnchannels(2)
+            out.setsampwidth(2)
+            out.setframerate(44100)
+            out.writeframes(b"\0\0\0\0" * int(44100 * seconds))
+        paths.append(path)
+    return paths
+
+
+class GapSampler:
+    """Records how long the mixer is silent between tracks (polls every `interval` seconds)"""
+    def __init__(self, interval=0.0002):
+        self.interval = interval
+        self.gaps = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        started = False
+        silent_since = None
+        while not self._stop.is_set():
+            busy = pygame.mixer.get_busy() or pygame.mixer.music.get_busy()
+            now = time.perf_counter()
+            if busy:
+                if silent_since is not None:
+                    self.gaps.append(now - silent_since)
+                started, silent_since = True, None
+            elif started and silent_since is None:
+                silent_since = now
+            time.sleep(self.interval)
+        # trailing silence after the last track is not a gap
+
+
+def run_sequential(files, poll):
+    with GapSampler() as sampler:
+        for path in files:
+            pygame.mixer.music.load(path)
+            pygame.mixer.music.play()
+            while pygame.mixer.music.get_busy():
+                time.sleep(poll)
+    return sampler.gaps
+
+
+def run_queue(player, files):
+    tracks = [(path, os.path.basename(path), "bench") for path in files]
+    player.queue.transitions.clear()
+    with GapSampler() as sampler:
+        player.play_playlist(tracks)
+        while player.queue.active or player._is_playing():
+            time.sleep(0.05)
+    return sampler.gaps, list(player.queue.transitions)
+
+
+def summary(values):
+    if not values:
+        return "      -        -"
+    return f"{sum(values) / len(values) * 1000:7.2f}  {max(values) * 1000:7.2f}"
+
+
+def main():
+    options = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--") and "=" in arg)
+    count = int(options.get("tracks", 6))
+    seconds = float(options.get("seconds", 0.5))
+    poll = float(options.get("poll", 0.01))
+
+    with tempfile.TemporaryDirectory() as directory:
+        files = options["files"].split(",") if "files" in options else write_tracks(directory, count, seconds)
+        player = MusicPlayer()
+        try:
+            sequential_gaps = run_sequential(files, poll)
+            player.preload(files[:1])
+            queue_gaps, handoffs = run_queue(player, files)
+        finally:
+            player.cleanup()
+
+    transitions = len(files) - 1
+    print(f"{len(files)} tracks, {transitions} transitions (audio driver: {os.environ['SDL_AUDIODRIVER']})")
+    print(f"{'mode':<11} {'gaps':>4}  {'mean ms':>7}  {'max ms':>7}")
+    print(f"{'sequential':<11} {len(sequential_gaps):>4}  {summary(sequential_gaps)}")
+    print(f"{'queue':<11} {len(queue_gaps):>4}  {summary(queue_gaps)}")
+    print(f"queue handoff (track end -> next track queued behind it): mean/max ms {summary(handoffs).strip()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,506 @@
+import array
+import bisect
+import csv
+import difflib
+import heapq
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+from collections import defaultdict
+
+_TOKEN = re.compile(r"[^\W_]+")     # runs of letters/digits, any script
+
+
+def tokenize(text):
+    """Lower-cased words of a title or artist, used by the inverted index and search"""
+    return _TOKEN.findall(text.casefold())
+
+
+class _CatalogBase:
+    """
+    Lookup, paging and search shared by the in-memory and memory-mapped catalogs.
+    Subclasses provide rows through a few primitives: _row_of(id), _record(row),
+    _artist_rows(key), _titles_sorted(), _words(), _word_rows(word) and __len__.
+    Rows come back as {"id", "title", "artist", "file"} dicts built on demand.
+    """
+    FIELDS = ("id", "title", "artist", "file")
+
+    def get(self, song_id, default=None):
+        row = self._row_of(str(song_id))
+        return default if row is None else self._record(row)
+
+    def __getitem__(self, song_id):
+        row = self._row_of(str(song_id))
+        if row is None:
+            raise KeyError(song_id)
+        return self._record(row)
+
+    def __contains__(self, song_id):
+        return self._row_of(str(song_id)) is not None
+
+    def __iter__(self):
+        return (self._id_at(row) for row in range(len(self)))
+
+    def items(self):
+        """(song id, song) pairs in catalog order"""
+        return ((self._id_at(row), self._record(row)) for row in range(len(self)))
+
+    def page(self, page, page_size=20):
+        """Songs on one page (0-based), in catalog order"""
+        start = max(page, 0) * page_size
+        return [self._record(row) for row in range(start, min(start + page_size, len(self)))]
+
+    def page_count(self, page_size=20):
+        return max(1, -(-len(self) // page_size))
+
+    def by_artist(self, artist):
+        return [self._record(row) for row in self._artist_rows(artist.casefold())]
+
+    def title_prefix(self, prefix, limit=20):
+        """Songs whose title starts with prefix (case-insensitive), alphabetically"""
+        index = self._titles_sorted()
+        prefix = prefix.casefold()
+        i = bisect.bisect_left(index, (prefix, -1))
+        found = []
+        while i < len(index) and len(found) < limit:
+            title, row = index[i]
+            if not title.startswith(prefix):
+                break
+            found.append(self._record(row))
+            i += 1
+        return found
+
+    def build_indexes(self):
+        """Build any lazily built indexes now instead of on the first lookup"""
+        self._titles_sorted()
+        self._words()
+
+    # --- search ---
+    def _expand(self, term, max_prefix=50):
+        """Index words matching a query word: itself, words it is a prefix of, else close spellings"""
+        words = self._words()
+        matches = []
+        i = bisect.bisect_left(words, term)
+        if i < len(words) and words[i] == term:
+            matches.append((term, 1.0))
+            i += 1
+        for i in range(i, min(i + max_prefix, len(words))):
+            word = words[i]
+            if not word.startswith(term):
+                break
+            matches.append((word, 0.8))
+        if not matches:
+            # typo tolerance: only compare against words with the same first letter
+            lo = bisect.bisect_left(words, term[0])
+            hi = bisect.bisect_left(words, chr(ord(term[0]) + 1))
+            candidates = [words[j] for j in range(lo, hi)]
+            for word in difflib.get_close_matches(term, candidates, n=3, cutoff=0.75):
+                matches.append((word, 0.5))
+        return matches
+
+    def search(self, query, limit=10):
+        """
+        Fuzzy search over titles and artists. Each query word matches index words
+        exactly, as a prefix, or by close spelling; songs are ranked by how well
+        all query words matched.
+        """
+        scores = defaultdict(float)
+        for term in tokenize(query):
+            best = {}
+            for word, weight in self._expand(term):
+                for row in self._word_rows(word):
+                    if weight > best.get(row, 0):
+                        best[row] = weight
+            for row, weight in best.items():
+                scores[row] += weight
+        top = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [self._record(row) for row, _ in top]
+
+    def resolve(self, text):
+        """
+        Song for a request string: a song id, "Title - Artist" or a title,
+        falling back to the best search hit. None if nothing matches.
+        """
+        text = text.strip()
+        row = self._row_of(text)
+        if row is not None:
+            return self._record(row)
+        title, _, artist = text.rpartition(" - ")
+        if not title:
+            title, artist = text, ""
+        for song in self.title_prefix(title, limit=50):
+            if song["title"].casefold() == title.casefold() and (
+                    not artist or song["artist"].casefold() == artist.casefold()):
+                return song
+        hits = self.search(text, limit=1)
+        return hits[0] if hits else None
+
+
+class Catalog(_CatalogBase):
+    """
+    Song catalog stored column-wise: one list per field instead of one dict per
+    song, with each artist name stored once (rows keep a small int). Indexed by
+    song id, by artist, by title prefix (sorted titles + bisect) and by word
+    (inverted token index) so lookups and searches never walk the whole catalog.
+    """
+    def __init__(self, songs=()):
+        self._ids = []
+        self._titles = []
+        self._files = []
+        self._artist_of = array.array("I")  # row -> position in _artists
+        self._artists = []                  # distinct artist names
+        self._artist_ids = {}               # {artist name: position in _artists}
+        self._by_id = {}                    # {song id: row}
+        self._by_artist = defaultdict(lambda: array.array("I"))    # {casefolded artist: rows}
+        self._tokens = defaultdict(lambda: array.array("I"))       # {word: rows}
+        self._title_index = None            # sorted [(casefolded title, row)], rebuilt lazily
+        self._vocab = None                  # sorted words, rebuilt lazily
+        for song in songs:
+            self.add(**song)
+
+    # --- loading ---
+    @classmethod
+    def load(cls, path):
+        """Load a catalog file: .csv with id,title,artist,file columns, or .json (list or {id: song})"""
+        catalog = cls()
+        if path.endswith(".json"):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                data = [dict(song, id=song_id) for song_id, song in data.items()]
+            for song in data:
+                catalog.add(song["id"], song["title"], song["artist"], song.get("file", ""))
+        else:
+            with open(path, newline="", encoding="utf-8") as f:
+                for song in csv.DictReader(f):
+                    catalog.add(song["id"], song["title"], song["artist"], song.get("file") or "")
+        catalog.build_indexes()
+        return catalog
+
+    def add(self, id, title, artist, file=""):
+        song_id = str(id)
+        if song_id in self._by_id:
+            raise ValueError(f"duplicate song id {song_id!r}")
+        row = len(self._ids)
+        artist_id = self._artist_ids.get(artist)
+        if artist_id is None:
+            artist_id = self._artist_ids[artist] = len(self._artists)
+            self._artists.append(artist)
+        self._ids.append(song_id)
+        self._titles.append(title)
+        self._files.append(file)
+        self._artist_of.append(artist_id)
+        self._by_id[song_id] = row
+        self._by_artist[artist.casefold()].append(row)
+        for token in set(tokenize(title) + tokenize(artist)):
+            self._tokens[token].append(row)
+        self._title_index = self._vocab = None
+        return row
+
+    def save(self, path):
+        """Write this catalog in the memory-mappable format read by MappedCatalog"""
+        write_mapped_catalog(self, path)
+
+    # --- primitives ---
+    def _row_of(self, song_id):
+        return self._by_id.get(song_id)
+
+    def _id_at(self, row):
+        return self._ids[row]
+
+    def _record(self, row):
+        return {
+            "id": self._ids[row],
+            "title": self._titles[row],
+            "artist": self._artists[self._artist_of[row]],
+            "file": self._files[row],
+        }
+
+    def __len__(self):
+        return len(self._ids)
+
+    def artists(self):
+        return list(self._artists)
+
+    def _artist_rows(self, key):
+        return self._by_artist.get(key, ())
+
+    def _titles_sorted(self):
+        if self._title_index is None:
+            self._title_index = sorted((title.casefold(), row) for row, title in enumerate(self._titles))
+        return self._title_index
+
+    def _words(self):
+        if self._vocab is None:
+            self._vocab = sorted(self._tokens)
+        return self._vocab
+
+    def _word_rows(self, word):
+        return self._tokens.get(word, ())
+
+
+# --- memory-mapped catalog file ---
+#
+# header: magic, version, byte order, row count, then (offset, length) of each section.
+# Every section except "strings" is an array of native uint32:
+#   string_offsets  n_strings + 1 offsets into "strings" (string i = strings[o[i]:o[i+1]])
+#   strings         every distinct string once, utf-8
+#   rows            4 string numbers per song: id, title, artist, file
+#   id_order        rows sorted by id                      (binary search by id)
+#   title_order     rows sorted by casefolded title        (title prefix lookups)
+#   artists         (key, name, start, count) per artist, sorted by casefolded key;
+#                   start/count select its rows in "artist_rows"
+#   artist_rows     rows grouped by artist
+#   words           (word, start, count) per index word, sorted; selects "postings"
+#   postings        rows grouped by word (the inverted index)
+
+MAPPED_MAGIC = b"SCAT"
+MAPPED_VERSION = 1
+_SECTIONS = ("string_offsets", "strings", "rows", "id_order", "title_order",
+             "artists", "artist_rows", "words", "postings")
+_MAPPED_HEADER = struct.Struct("=4sHBxI" + "QQ" * len(_SECTIONS))
+_BYTE_ORDER = {"little": 1, "big": 2}[sys.byteorder]
+
+
+def write_mapped_catalog(catalog, path):
+    """Serialize a Catalog into the memory-mappable format (written atomically)"""
+    strings = {}
+
+    def string_id(text):
+        number = strings.get(text)
+        if number is None:
+            number = strings[text] = len(strings)
+        return number
+
+    n = len(catalog)
+    rows = array.array("I")
+    for row in range(n):
+        song = catalog._record(row)
+        rows.extend(string_id(song[field]) for field in Catalog.FIELDS)
+    id_order = array.array("I", sorted(range(n), key=catalog._id_at))
+    title_order = array.array("I", (row for _, row in catalog._titles_sorted()))
+
+    artists, artist_rows = array.array("I"), array.array("I")
+    for key in sorted(catalog._by_artist):
+        members = catalog._by_artist[key]
+        name = catalog._record(members[0])["artist"]
+        artists.extend((string_id(key), string_id(name), len(artist_rows), len(members)))
+        artist_rows.extend(members)
+
+    words, postings = array.array("I"), array.array("I")
+    for word in catalog._words():
+        members = catalog._tokens[word]
+        words.extend((string_id(word), len(postings), len(members)))
+        postings.extend(members)
+
+    pool = bytearray()
+    string_offsets = array.array("I", [0])
+    for text in strings:   # dicts keep insertion order = string numbers
+        pool += text.encode("utf-8")
+        string_offsets.append(len(pool))
+    pool += b"\0" * (-len(pool) % 4)  # keep the uint32 sections aligned
+
+    sections = [string_offsets.tobytes(), bytes(pool), rows.tobytes(), id_order.tobytes(),
+                title_order.tobytes(), artists.tobytes(), artist_rows.tobytes(),
+                words.tobytes(), postings.tobytes()]
+    directory, offset = [], _MAPPED_HEADER.size
+    for data in sections:
+        directory += [offset, len(data)]
+        offset += len(data)
+
+    # unique temp file next to the target, so concurrent compiles never write into each other's file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                               prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_MAPPED_HEADER.pack(MAPPED_MAGIC, MAPPED_VERSION, _BYTE_ORDER, n, *directory))
+            for data in sections:
+                f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class _Column:
+    """Read-only sequence over a mapped section, decoding each item on access (bisect-friendly)"""
+    def __init__(self, length, item):
+        self._length = length
+        self._item = item
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._length
+        if not 0 <= i < self._length:
+            raise IndexError(i)
+        return self._item(i)
+
+
+class MappedCatalog(_CatalogBase):
+    """
+    Catalog read straight from a file written by Catalog.save(), through mmap.
+    Opening it only reads the header: strings and index entries are decoded when
+    a lookup touches them, and every process that opens the same file shares its
+    pages through the OS page cache instead of holding its own copy.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._file.close()
+            raise ValueError(f"{path} is not a catalog file")
+        self._view = memoryview(self._map)
+        if len(self._map) < _MAPPED_HEADER.size:
+            self.close()
+            raise ValueError(f"{path} is not a catalog file")
+        magic, version, byte_order, self._n, *directory = _MAPPED_HEADER.unpack_from(self._map)
+        if magic != MAPPED_MAGIC or version != MAPPED_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {MAPPED_VERSION} catalog file")
+        if byte_order != _BYTE_ORDER:
+            self.close()
+            raise ValueError(f"{path} was written on a machine with the other byte order; rebuild it")
+        # a truncated or corrupt file must fail here (ValueError -> rebuilt by load_catalog),
+        # not with an IndexError in the middle of a lookup
+        size = len(self._map)
+        for i, name in enumerate(_SECTIONS):
+            offset, length = directory[2 * i], directory[2 * i + 1]
+            if offset < _MAPPED_HEADER.size or offset + length > size or (
+                    name != "strings" and (offset % 4 or length % 4)):
+                self.close()
+                raise ValueError(f"{path} is truncated or corrupt (section {name})")
+        sections = {}
+        for i, name in enumerate(_SECTIONS):
+            offset, length = directory[2 * i], directory[2 * i + 1]
+            view = self._view[offset:offset + length]
+            sections[name] = view if name == "strings" else view.cast("I")
+        self._string_offsets = sections["string_offsets"]
+        self._strings = sections["strings"]
+        self._rows = sections["rows"]
+        self._id_order = sections["id_order"]
+        self._title_order = sections["title_order"]
+        self._artist_table = sections["artists"]
+        self._artist_rows_section = sections["artist_rows"]
+        self._word_table = sections["words"]
+        self._postings = sections["postings"]
+        if (len(self._rows) != 4 * self._n or len(self._id_order) != self._n
+                or len(self._title_order) != self._n or len(self._artist_table) % 4
+                or len(self._word_table) % 3 or not len(self._string_offsets)
+                or self._string_offsets[-1] > len(self._strings)):
+            self.close()
+            raise ValueError(f"{path} is truncated or corrupt (section sizes do not match)")
+        self._ids_sorted = _Column(self._n, lambda i: self._field(self._id_order[i], 0))
+        self._title_index = _Column(self._n, self._title_entry)
+        self._vocab = _Column(len(self._word_table) // 3, lambda i: self._string(self._word_table[3 * i]))
+
+    def _string(self, number):
+        return str(self._strings[self._string_offsets[number]:self._string_offsets[number + 1]], "utf-8")
+
+    def _field(self, row, column):
+        return self._string(self._rows[4 * row + column])
+
+    def _title_entry(self, i):
+        row = self._title_order[i]
+        return (self._field(row, 1).casefold(), row)
+
+    # --- primitives ---
+    def _row_of(self, song_id):
+        i = bisect.bisect_left(self._ids_sorted, song_id)
+        if i < self._n and self._ids_sorted[i] == song_id:
+            return self._id_order[i]
+        return None
+
+    def _id_at(self, row):
+        return self._field(row, 0)
+
+    def _record(self, row):
+        base = 4 * row
+        rows, string = self._rows, self._string
+        return {
+            "id": string(rows[base]),
+            "title": string(rows[base + 1]),
+            "artist": string(rows[base + 2]),
+            "file": string(rows[base + 3]),
+        }
+
+    def __len__(self):
+        return self._n
+
+    def artists(self):
+        table = self._artist_table
+        return [self._string(table[i + 1]) for i in range(0, len(table), 4)]
+
+    def _artist_rows(self, key):
+        table = self._artist_table
+        keys = _Column(len(table) // 4, lambda i: self._string(table[4 * i]))
+        i = bisect.bisect_left(keys, key)
+        if i == len(keys) or keys[i] != key:
+            return ()
+        start, count = table[4 * i + 2], table[4 * i + 3]
+        return self._artist_rows_section[start:start + count]
+
+    def _titles_sorted(self):
+        return self._title_index
+
+    def _words(self):
+        return self._vocab
+
+    def _word_rows(self, word):
+        i = bisect.bisect_left(self._vocab, word)
+        if i == len(self._vocab) or self._vocab[i] != word:
+            return ()
+        start, count = self._word_table[3 * i + 1], self._word_table[3 * i + 2]
+        return self._postings[start:start + count]
+
+    def close(self):
+        for name in ("_string_offsets", "_strings", "_rows", "_id_order", "_title_order",
+                     "_artist_table", "_artist_rows_section", "_word_table", "_postings", "_view"):
+            view = self.__dict__.pop(name, None)
+            if view is not None:
+                view.release()
+        self._map.close()
+        self._file.close()
+
+
+DEFAULT_CATALOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog.csv")
+MAPPED_SUFFIX = ".scat"
+
+
+def load_catalog(path=None):
+    """
+    The catalog at path (default: the bundled catalog.csv).
+    A .csv/.json source is compiled once into a sibling .scat file, which later
+    calls (and other processes) memory-map instead of parsing the source again.
+    """
+    path = path or DEFAULT_CATALOG
+    if path.endswith(MAPPED_SUFFIX):
+        return MappedCatalog(path)
+    mapped = os.path.splitext(path)[0] + MAPPED_SUFFIX
+    try:
+        if os.path.getmtime(mapped) >= os.path.getmtime(path):
+            return MappedCatalog(mapped)
+    except (OSError, ValueError):
+        pass  # missing, stale or unreadable: rebuild it from the source
+    catalog = Catalog.load(path)
+    try:
+        catalog.save(mapped)
+    except OSError as e:
+        print(f"[CATALOG] could not write {mapped}: {e}")
+    return catalog
+
+
+if __name__ == "__main__":
+    # python catalog.py songs.csv [songs.scat] -> compile a catalog for memory-mapping
+    source = sys.argv[1]
+    target = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(source)[0] + MAPPED_SUFFIX
+    Catalog.load(source).save(target)
+    print(f"wrote {target}")
@@ -1,23 +1,37 @@
 import socket
 import threading
-import pika #RabbitMQ
-import json  # timestamp msgs
-from lamport_clock import LamportClock  # lamport clock
+from lamport_clock import create_clock  # lamport / vector / hybrid logical clock
+from framing import FrameReader, send_message, recv_message, decode_message  # length-prefixed messages
+from song_connection import SongConnection  # persistent pipelined server connection
+import wal  # durable transaction log
+from lock_table import SongLockTable  # per-song 2PC locks
+from playlist import Playlist  # ordered set with O(1) membership
+from transport import PikaTransport, is_connection_error  # default notification transport (RabbitMQ)
 
 class Client:
     # M4: added node_id parameter
     def __init__(self, node_id, server_host="localhost", server_port=5001, 
                  fav_artist_list=None, broker_host="localhost",
                  coordinator_host="localhost", coordinator_port=5002,
-                 participant_port=None):
+                 participant_port=None, persistent_connection=False,
+                 wal_path=None, checkpoint_every=1000, notification_transport=None, clock="lamport",
+                 codec="json"):
         
         self.node_id = node_id                      # M4: unique client identifier
-        self.playlist = []                          # Individual playlist
-        self.temp_playlist = None                   # Temporary state during 2PC 
-        self.lamport_clock = LamportClock(node_id)  # M4: added lamport clock
+        self.playlist = Playlist()                  # Individual playlist
+        self.locks = SongLockTable()                # per-song locks + pending deltas during 2PC
+        self.lamport_clock = create_clock(clock, node_id)  # M4: added lamport clock
         self.subscription = []                      # list of fav artists client is subscribed to
         self.server_host = server_host
         self.server_port = server_port
+        self.persistent_connection = persistent_connection  # reuse one socket for all song requests
+        self.codec = codec                          # wire format we speak ("json" or "binary"); peers answer in kind
+        self.song_connection = None
+        self._song_connection_lock = threading.Lock()
+        self.broker_host = broker_host
+        self.notification_transport = notification_transport  # None -> RabbitMQ on broker_host
+        self._owns_transport = False                # True if we created (and must close) the transport
+        self.notification_subscription = None
         self.connection = None
         self.channel = None
 
@@ -31,8 +45,17 @@ class Client:
         self._stop = threading.Event()
         
         # Transaction log for recovery
-        self.transaction_log = []
+        self.transaction_log = {}                   # {transaction_id: entry}
         self.log_lock = threading.Lock()
+        
+        # Durable write-ahead log (optional); transactions prepared before a crash
+        # whose outcome is not known yet are kept in in_doubt
+        self.wal = None
+        self.checkpoint_every = checkpoint_every
+        self.in_doubt = {}                          # {transaction_id: operations}
+        if wal_path:
+            self.wal = wal.WriteAheadLog(wal_path)
+            self._recover_from_wal()
 
         for artist in fav_artist_list:
             self.subscription.append(artist) 
@@ -42,75 +65,133 @@ class Client:
         
         # Register with coordinator
         self._register_with_coordinator()
+        
+        # Ask the coordinator how in-doubt transactions ended
+        if self.in_doubt:
+            threading.Thread(target=self._resolve_in_doubt, daemon=True).start()
 
     def song_request(self, input_song):
         """
         send a song request to the server using TCP sockets (IPC)
         """
-        # M4: increment clock and create msg with timestamp
-        timestamp = self.lamport_clock.increment()
-        message = json.dumps({
-            "song": input_song,
-            "timestamp": timestamp,
-            "node_id": self.node_id
-        })
-        print(f"[CLIENT {self.node_id}] Sending at T={timestamp}: {input_song}")
+        if self.persistent_connection:
+            try:
+                self.song_request_async(input_song).result(timeout=10.0)
+            except ConnectionRefusedError:
+                print("ERRROR - could not connect to the server")
+            except Exception as e:
+                print(f"socket error: {e}")
+            return
+
+        message = self._song_message(input_song)
         
         # create TCP pocket
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
             try:
                 s.connect((self.server_host, self.server_port)) # connect to the server as localhost:5000
-                s.sendall(message.encode("utf-8")) # send the song name
-                response = s.recv(1024).decode("utf-8") # wait for the server to respond
-                
-                # M4: update clock with server's timestamp
-                response_data = json.loads(response)
-                new_time = self.lamport_clock.update(response_data["timestamp"])
-                print(f"[CLIENT {self.node_id}] Response at T={new_time}: {response_data['message']}")
+                send_message(s, message, self.codec) # send the song name
+                response_data = recv_message(s) # wait for the server to respond
+                self._on_song_response(response_data)
 
             except ConnectionRefusedError:
                 print("ERRROR - could not connect to the server")
             except Exception as e:
                 print(f"socket error: {e}")
 
-    def receive_notification(self, fav_artist_list):
-       """
-       connect to RabbitMQ and subscribe to favorite artist updates
-       """
-       try:
-            self.connection = pika.BlockingConnection(pika.ConnectionParameters("localhost"))
-            self.channel = self.connection.channel()
+    def song_request_async(self, input_song):
+        """
+        pipeline a song request over the persistent server connection.
+        returns a Future that resolves to the server's response
+        """
+        connection = self._get_song_connection()
+        future = connection.request(self._song_message(input_song))
+        future.add_done_callback(
+            lambda f: f.exception() is None and self._on_song_response(f.result()))
+        return future
 
-            # declare a topic exchange for artist notifications
-            self.channel.exchange_declare(exchange="artist_update", exchange_type="topic")
+    def browse_catalog(self, page=0, page_size=20, query=None):
+        """
+        ask the server for one page of its song catalog, or for search results
+        when a query is given. returns the list of songs ({id, title, artist, file})
+        """
+        message = {"type": "catalog", "page": page, "page_size": page_size,
+                   "timestamp": self.lamport_clock.increment(), "node_id": self.node_id}
+        if query:
+            message["query"] = query
+        try:
+            if self.persistent_connection:
+                response = self._get_song_connection().request(message).result(timeout=10.0)
+            else:
+                with socket.create_connection((self.server_host, self.server_port), timeout=10.0) as s:
+                    send_message(s, message, self.codec)
+                    response = recv_message(s)
+        except Exception as e:
+            print(f"[CLIENT {self.node_id}] catalog request failed: {e}")
+            return []
+        self.lamport_clock.update(response["timestamp"])
+        return response.get("songs", [])
 
-            # create a temp queue for this client
-            result = self.channel.queue_declare(queue="", exclusive=True)
-            queue_name = result.method.queue
+    def _song_message(self, input_song):
+        # M4: increment clock and create msg with timestamp
+        timestamp = self.lamport_clock.increment()
+        print(f"[CLIENT {self.node_id}] Sending at T={timestamp}: {input_song}")
+        return {
+            "song": input_song,
+            "timestamp": timestamp,
+            "node_id": self.node_id
+        }
 
-            # bind to the exchange for each fav artist
-            for artist in self.subscription:
-                routing_key = f"artist.{artist}"
-                self.channel.queue_bind(exchange="artist_update", queue=queue_name, routing_key=routing_key)
+    def _on_song_response(self, response_data):
+        # M4: update clock with server's timestamp
+        new_time = self.lamport_clock.update(response_data["timestamp"])
+        print(f"[CLIENT {self.node_id}] Response at T={new_time}: {response_data['message']}")
 
-            print(f"\n[CLIENT {self.node_id}] subscribed to updates from:", self.subscription, "\n")
+    def _get_song_connection(self):
+        """open (or reopen after a failure) the shared server connection"""
+        with self._song_connection_lock:
+            if self.song_connection is None or not self.song_connection.is_open():
+                self.song_connection = SongConnection(self.server_host, self.server_port, codec=self.codec)
+                self.song_connection.connect()
+            return self.song_connection
+
+    def receive_notification(self, fav_artist_list, prefetch_count=50, ack_every=10, workers=2):
+       """
+       connect to RabbitMQ and subscribe to favorite artist updates.
+       the broker sends at most `prefetch_count` unacked messages; they are handed
+       off to `workers` threads and acked in batches of `ack_every` (multiple=True)
+       """
+       try:
+            if self.notification_transport is None:
+                # pooled: clients in one process share the same few AMQP connections
+                self.notification_transport = PikaTransport(self.broker_host)
+                self._owns_transport = True
 
-            # start consuming messages
-            # M4: update clock when receiving notifications
-            def callback(ch, method, properties, body):
-                notif = json.loads(body.decode('utf-8'))
-                new_time = self.lamport_clock.update(notif.get("lamport_timestamp", 0))
-                print(f"🎵 [NOTIFICATION {self.node_id}] T={new_time}: {notif['message']}\n")
+            # bind to the topic exchange for each fav artist
+            routing_keys = [f"artist.{artist}" for artist in self.subscription]
+            self.notification_subscription = self.notification_transport.subscribe(
+                "artist_update", "topic", routing_keys, self._handle_notification,
+                prefetch_count=prefetch_count, ack_every=ack_every, workers=workers)
+            self.connection = getattr(self.notification_subscription, "connection", None)
+            self.channel = getattr(self.notification_subscription, "channel", None)
 
-            self.channel.basic_consume(queue=queue_name, on_message_callback=callback, auto_ack=True)
+            print(f"\n[CLIENT {self.node_id}] subscribed to updates from:", self.subscription, "\n")
             print(f"[CLIENT {self.node_id}] waiting for notifs...")
-            # run listener on a separate thread so the client can still send requests
-            threading.Thread(target=self.channel.start_consuming, daemon=True).start()
 
-       except pika.exceptions.AMQPConnectionError:
-            print("Error: Could not connect to RabbitMQ. Is it running?")
        except Exception as e:
-            print(f"RabbitMQ setup error: {e}")
+            if is_connection_error(e):
+                print("Error: Could not connect to RabbitMQ. Is it running?")
+            else:
+                print(f"RabbitMQ setup error: {e}")
+
+    def _handle_notification(self, body):
+        # M4: update clock when receiving notifications
+        try:
+            notif = decode_message(body)  # JSON or binary, whichever the publisher used
+        except ValueError as e:
+            print(f"[CLIENT {self.node_id}] dropping malformed notification: {e}")
+            return
+        new_time = self.lamport_clock.update(notif.get("lamport_timestamp", 0))
+        print(f"🎵 [NOTIFICATION {self.node_id}] T={new_time}: {notif['message']}\n")
 
     def _start_participant_server(self):
         """Start server to receive 2PC messages from coordinator"""
@@ -149,9 +230,8 @@ class Client:
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
                 s.settimeout(5.0)
                 s.connect((self.coordinator_host, self.coordinator_port))
-                s.sendall(json.dumps(message).encode('utf-8'))
-                response = s.recv(1024).decode('utf-8')
-                result = json.loads(response)
+                send_message(s, message, self.codec)
+                result = recv_message(s)
                 
                 # Update clock
                 if 'timestamp' in result:
@@ -165,111 +245,101 @@ class Client:
         """Handle 2PC phase messages from coordinator"""
         with conn:
             try:
-                data = conn.recv(4096).decode('utf-8')
-                if not data:
-                    return
+                reader = FrameReader(conn)
+                while True:
+                    message = reader.read_message()
+                    if message is None:
+                        return
+                    phase = message['phase']
                     
-                message = json.loads(data)
-                phase = message['phase']
-                transaction_id = message['transaction_id']
-                
-                # Update clock on receive
-                if 'timestamp' in message:
-                    self.lamport_clock.update(message['timestamp'])
-                
-                if phase == 'prepare':
-                    response = self._handle_prepare(message)
-                elif phase == 'commit':
-                    response = self._handle_commit(message)
-                elif phase == 'abort':
-                    response = self._handle_abort(message)
-                else:
-                    response = {'status': 'error'}
+                    # Update clock on receive
+                    if 'timestamp' in message:
+                        self.lamport_clock.update(message['timestamp'])
                     
-                conn.sendall(json.dumps(response).encode('utf-8'))
+                    if phase == 'prepare':
+                        response = self._handle_prepare(message)
+                    elif phase == 'commit':
+                        response = self._handle_commit(message)
+                    elif phase == 'abort':
+                        response = self._handle_abort(message)
+                    else:
+                        response = {'status': 'error'}
+                        
+                    send_message(conn, response, reader.codec)
                 
             except Exception as e:
                 print(f"[{self.node_id}] Error handling 2PC message: {e}")
                 
+    @staticmethod
+    def _operations_of(message):
+        """2PC messages carry a list of operations; older ones a single operation/song_id"""
+        if message.get('operations'):
+            return message['operations']
+        return [{'operation': message['operation'], 'song_id': message['song_id']}]
+
+    @staticmethod
+    def _describe(operations):
+        if len(operations) == 1:
+            return f"{operations[0]['operation']} song {operations[0]['song_id']}"
+        return f"batch of {len(operations)} operations"
+
     def _handle_prepare(self, message):
-        """Handle PREPARE phase - validate and prepare the operation"""
+        """Handle PREPARE phase - validate and prepare every operation in the transaction"""
         transaction_id = message['transaction_id']
-        operation = message['operation']
-        song_id = message['song_id']
+        operations = self._operations_of(message)
         
         timestamp = self.lamport_clock.increment()
-        print(f"[{self.node_id} T={timestamp}] PREPARE: {operation} song {song_id}")
-        
-        # Save current state for potential rollback
-        self.temp_playlist = self.playlist.copy()
+        print(f"[{self.node_id} T={timestamp}] PREPARE: {self._describe(operations)}")
         
-        # Validate the operation and check for conflicts
-        if operation == 'add':
-            if song_id in self.temp_playlist:
-                print(f"[{self.node_id}] Vote NO - song already in playlist (conflict)")
-                return {'vote': 'no', 'reason': 'duplicate', 'timestamp': timestamp}
-            else:
-                # Tentatively add to temp state
-                self.temp_playlist.append(song_id)
-                
-                # Log transaction in PREPARING state
-                with self.log_lock:
-                    self.transaction_log.append({
-                        'transaction_id': transaction_id,
-                        'state': 'PREPARING',
-                        'operation': operation,
-                        'song_id': song_id,
-                        'timestamp': timestamp
-                    })
-                
-                print(f"[{self.node_id}] Vote YES - ready to add")
-                return {'vote': 'yes', 'timestamp': timestamp}
-                
-        elif operation == 'remove':
-            if song_id not in self.temp_playlist:
-                print(f"[{self.node_id}] Vote NO - song not in playlist (conflict)")
-                return {'vote': 'no', 'reason': 'not_found', 'timestamp': timestamp}
-            else:
-                # Tentatively remove from temp state
-                self.temp_playlist.remove(song_id)
-                
-                # Log transaction
-                with self.log_lock:
-                    self.transaction_log.append({
-                        'transaction_id': transaction_id,
-                        'state': 'PREPARING',
-                        'operation': operation,
-                        'song_id': song_id,
-                        'timestamp': timestamp
-                    })
+        # Validate against the committed playlist and lock every song the transaction touches;
+        # only this transaction's operations are kept as its pending delta. Held under log_lock
+        # so an ABORT cannot slip in between taking the locks and logging PREPARED.
+        with self.log_lock:
+            ok, reason = self.locks.prepare(transaction_id, operations, self.playlist.__contains__)
+            if not ok:
+                print(f"[{self.node_id}] Vote NO - {reason} (conflict)")
+                return {'vote': 'no', 'reason': reason, 'timestamp': timestamp}
                 
-                print(f"[{self.node_id}] Vote YES - ready to remove")
-                return {'vote': 'yes', 'timestamp': timestamp}
+            # Log transaction in PREPARING state (forced to disk before voting YES)
+            self.transaction_log[transaction_id] = {
+                'transaction_id': transaction_id,
+                'state': 'PREPARING',
+                'operations': operations,
+                'timestamp': timestamp
+            }
+            lsn = self._wal_append(wal.PREPARED, transaction_id, operations)
+        self._wal_wait(lsn)
         
-        return {'vote': 'no', 'reason': 'invalid_operation', 'timestamp': timestamp}
+        print(f"[{self.node_id}] Vote YES - ready to apply {self._describe(operations)}")
+        return {'vote': 'yes', 'timestamp': timestamp}
         
     def _handle_commit(self, message):
         """Handle COMMIT phase - apply the changes"""
         transaction_id = message['transaction_id']
-        operation = message['operation']
-        song_id = message['song_id']
+        operations = self._operations_of(message)
         
         timestamp = self.lamport_clock.increment()
-        print(f"[{self.node_id} T={timestamp}] COMMIT: {operation} song {song_id}")
+        print(f"[{self.node_id} T={timestamp}] COMMIT: {self._describe(operations)}")
         
-        # Apply the temporary state
-        if self.temp_playlist is not None:
-            self.playlist = self.temp_playlist
-            self.temp_playlist = None
+        # Apply the pending delta, then release the song locks
+        lsn = None
+        with self.log_lock:
+            pending = self.locks.get(transaction_id)
+            if pending is not None:
+                self._apply_operations(pending)
+                lsn = self._wal_append(wal.COMMITTED, transaction_id)
+                self.locks.release(transaction_id)
+            self.in_doubt.pop(transaction_id, None)
             
             # Update transaction log
-            with self.log_lock:
-                for txn in self.transaction_log:
-                    if txn['transaction_id'] == transaction_id:
-                        txn['state'] = 'COMMITTED'
-                        break
-            
-            print(f"[{self.node_id}] ✅ Transaction COMMITTED")
+            if transaction_id in self.transaction_log:
+                self.transaction_log[transaction_id]['state'] = 'COMMITTED'
+        
+        if lsn is not None:
+            self._wal_wait(lsn)
+        print(f"[{self.node_id}] ✅ Transaction COMMITTED")
+        if lsn is not None:
+            self._maybe_checkpoint()
         
         return {'status': 'committed', 'timestamp': timestamp}
         
@@ -280,15 +350,15 @@ class Client:
         timestamp = self.lamport_clock.increment()
         print(f"[{self.node_id} T={timestamp}] ABORT transaction")
         
-        # Discard temporary state (rollback)
-        self.temp_playlist = None
-        
-        # Update transaction log
+        # Discard the pending delta and release the song locks (rollback)
+        # Update transaction log (presumed abort: no need to force it to disk)
+        # (the id is remembered, so a PREPARE that shows up after this ABORT votes NO)
         with self.log_lock:
-            for txn in self.transaction_log:
-                if txn['transaction_id'] == transaction_id:
-                    txn['state'] = 'ABORTED'
-                    break
+            self.locks.abort(transaction_id)
+            self.in_doubt.pop(transaction_id, None)
+            if transaction_id in self.transaction_log:
+                self.transaction_log[transaction_id]['state'] = 'ABORTED'
+            self._wal_append(wal.ABORTED, transaction_id)
         
         print(f"[{self.node_id}] ❌ Transaction ABORTED (rolled back)")
         
@@ -296,73 +366,157 @@ class Client:
 
     def add_song(self, song_id):
         """Add a song using 2PC to keep all clients in sync"""
-        timestamp = self.lamport_clock.increment()
-        message = {
-            'type': 'transaction',
-            'client_id': self.node_id,
-            'operation': 'add',
-            'song_id': song_id,
-            'timestamp': timestamp
-        }
-        
-        print(f"\n[{self.node_id} T={timestamp}] Initiating distributed ADD transaction")
-        
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.settimeout(10.0)
-            s.connect((self.coordinator_host, self.coordinator_port))
-            s.sendall(json.dumps(message).encode('utf-8'))
-            response = s.recv(4096).decode('utf-8')
-            result = json.loads(response)
-            
-            # Update clock
-            if 'timestamp' in result:
-                new_time = self.lamport_clock.update(result['timestamp'])
-            
-            if result['status'] == 'committed':
-                # Also update local playlist if not already updated
-                if song_id not in self.playlist:
-                    self.playlist.append(song_id)
-                print(f"[{self.node_id} T={new_time}] ✅ Song added across all clients")
-                return True
-            else:
-                print(f"[{self.node_id} T={new_time}] ❌ Transaction aborted: {result.get('votes', 'conflict detected')}")
-                return False
+        return self._run_transaction([{'operation': 'add', 'song_id': song_id}], "ADD",
+                                     "Song added across all clients")
             
     def remove_song(self, song_id):
         """Remove a song using 2PC to keep all clients in sync"""
+        return self._run_transaction([{'operation': 'remove', 'song_id': song_id}], "REMOVE",
+                                     "Song removed across all clients")
+
+    def add_songs(self, song_ids):
+        """Add many songs in one 2PC transaction (all or nothing)"""
+        return self.apply_batch([{'operation': 'add', 'song_id': song_id} for song_id in song_ids])
+
+    def remove_songs(self, song_ids):
+        """Remove many songs in one 2PC transaction (all or nothing)"""
+        return self.apply_batch([{'operation': 'remove', 'song_id': song_id} for song_id in song_ids])
+
+    def apply_batch(self, operations):
+        """
+        Run a list of {'operation': 'add'|'remove', 'song_id': ...} as a single
+        distributed transaction. Operations are validated in order and applied atomically.
+        """
+        if not operations:
+            return True
+        return self._run_transaction(operations, "BATCH",
+                                     f"{len(operations)} operations applied across all clients")
+
+    def _run_transaction(self, operations, label, success_text):
         timestamp = self.lamport_clock.increment()
         message = {
             'type': 'transaction',
             'client_id': self.node_id,
-            'operation': 'remove',
-            'song_id': song_id,
+            'operations': operations,
             'timestamp': timestamp
         }
         
-        print(f"\n[{self.node_id} T={timestamp}] Initiating distributed REMOVE transaction")
+        print(f"\n[{self.node_id} T={timestamp}] Initiating distributed {label} transaction")
         
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
             s.settimeout(10.0)
             s.connect((self.coordinator_host, self.coordinator_port))
-            s.sendall(json.dumps(message).encode('utf-8'))
-            response = s.recv(4096).decode('utf-8')
-            result = json.loads(response)
+            send_message(s, message, self.codec)
+            result = recv_message(s)
             
             # Update clock
-            if 'timestamp' in result:
-                new_time = self.lamport_clock.update(result['timestamp'])
+            new_time = self.lamport_clock.update(result.get('timestamp', 0))
             
             if result['status'] == 'committed':
-                # Also update local playlist if not already updated
-                if song_id in self.playlist:
-                    self.playlist.remove(song_id)
-                print(f"[{self.node_id} T={new_time}] ✅ Song removed across all clients")
+                # the initiator is a participant too: its COMMIT handler already applied the
+                # operations under log_lock and logged them, so the playlist is not touched here
+                print(f"[{self.node_id} T={new_time}] ✅ {success_text}")
                 return True
             else:
                 print(f"[{self.node_id} T={new_time}] ❌ Transaction aborted: {result.get('votes', 'conflict detected')}")
                 return False
                 
 
+    def _apply_operations(self, operations):
+        """apply committed operations to the playlist (idempotent)"""
+        for op in operations:
+            if op['operation'] == 'add':
+                self.playlist.add(op['song_id'])
+            elif op['operation'] == 'remove':
+                self.playlist.discard(op['song_id'])
+
+    def _wal_append(self, kind, transaction_id, operations=()):
+        """append to the WAL without waiting for fsync (call with log_lock held)"""
+        if self.wal is None:
+            return None
+        return self.wal.append(kind, transaction_id, operations, sync=False)
+
+    def _wal_wait(self, lsn):
+        """wait until a record is on disk (call without holding log_lock)"""
+        if self.wal is not None and lsn is not None:
+            self.wal.wait_durable(lsn)
+
+    def _recover_from_wal(self):
+        """rebuild the playlist and in-doubt transactions from the WAL"""
+        for kind, transaction_id, operations in self.wal.replay():
+            if kind == wal.SNAPSHOT:
+                self.playlist.clear()
+                self._apply_operations(operations)
+            elif kind == wal.PREPARED:
+                self.in_doubt[transaction_id] = operations
+            elif kind == wal.COMMITTED and transaction_id in self.in_doubt:
+                self._apply_operations(self.in_doubt.pop(transaction_id))
+            elif kind == wal.ABORTED:
+                self.in_doubt.pop(transaction_id, None)
+                self.locks.abort(transaction_id)
+        # in-doubt transactions keep their songs locked until the outcome is known
+        for transaction_id, operations in self.in_doubt.items():
+            self.locks.restore(transaction_id, operations)
+        print(f"[{self.node_id}] Recovered playlist of {len(self.playlist)} songs, "
+              f"{len(self.in_doubt)} in-doubt transactions")
+
+    def _resolve_in_doubt(self):
+        """ask the coordinator for the outcome of each in-doubt transaction until all are resolved"""
+        while self.in_doubt and not self._stop.is_set():
+            for transaction_id in list(self.in_doubt):
+                operations = self.in_doubt.get(transaction_id)
+                if operations is None:
+                    continue  # resolved meanwhile by a COMMIT/ABORT from the coordinator
+                try:
+                    outcome = self._query_coordinator(transaction_id)
+                except Exception as e:
+                    print(f"[{self.node_id}] Could not query coordinator about {transaction_id}: {e}")
+                    break
+                if outcome == 'committed':
+                    self._handle_commit({'transaction_id': transaction_id, 'operations': operations})
+                elif outcome == 'aborted':
+                    self._handle_abort({'transaction_id': transaction_id})
+            self._stop.wait(1.0)
+
+    def _query_coordinator(self, transaction_id):
+        timestamp = self.lamport_clock.increment()
+        message = {'type': 'query', 'transaction_id': transaction_id, 'timestamp': timestamp}
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.settimeout(5.0)
+            s.connect((self.coordinator_host, self.coordinator_port))
+            send_message(s, message, self.codec)
+            result = recv_message(s)
+        self.lamport_clock.update(result.get('timestamp', 0))
+        return result['status']
+
+    def _maybe_checkpoint(self):
+        """replace the WAL with a snapshot once enough records have accumulated"""
+        if self.wal is None or self.wal.records_since_checkpoint < self.checkpoint_every:
+            return
+        with self.log_lock:
+            records = [(wal.SNAPSHOT, '', [{'operation': 'add', 'song_id': song_id}
+                                            for song_id in self.playlist])]
+            # prepared transactions (including in-doubt ones) are exactly the lock table's pending set
+            records += [(wal.PREPARED, txn_id, ops)
+                        for txn_id, ops in self.locks.pending_transactions().items()]
+            self.wal.checkpoint(records)
+            # completed transactions no longer need to be kept in memory either
+            self.transaction_log = {txn_id: txn for txn_id, txn in self.transaction_log.items()
+                                    if txn['state'] == 'PREPARING'}
+
     def close(self):
         """close open connections"""
+        if self.song_connection:
+            self.song_connection.close()
+            self.song_connection = None
+        self._stop.set()
+        if self.notification_subscription:
+            self.notification_subscription.close()
+            self.notification_subscription = None
+        if self._owns_transport:
+            self.notification_transport.close()
+            self.notification_transport = None
+            self._owns_transport = False
+        if self.wal:
+            self.wal.close()
         self.connection = None
\ No newline at end of file
@@ -0,0 +1,247 @@
+import json
+import struct
+
+# Message codecs. Every codec turns a message (dict of JSON-compatible values) into
+# bytes and back:
+#   encode(message) -> bytes
+#   decode(payload) -> message
+# JSON is the default. The binary codec starts every payload with MAGIC, which is
+# never the first byte of a JSON document, so a receiver can tell the two apart
+# from the first frame and answer each connection in the codec it was spoken to in.
+
+MAGIC = 0xB7
+
+
+class CodecError(ValueError):
+    """Raised for a payload that cannot be decoded (truncated, corrupt or not this codec)"""
+
+
+class JsonCodec:
+    name = "json"
+
+    @staticmethod
+    def encode(message):
+        return json.dumps(message).encode("utf-8")
+
+    @staticmethod
+    def decode(payload):
+        return json.loads(payload)
+
+
+# Field names and common string values, interned as one-byte ids by BinaryCodec.
+# Append only: ids are positions in this tuple and must match on both ends.
+INTERNED = (
+    # message fields
+    "type", "timestamp", "node_id", "request_id", "song", "message",
+    "transaction_id", "operation", "operations", "song_id", "status", "vote",
+    "reason", "state", "phase", "client_id", "host", "port", "participants",
+    "initiator", "artist", "timestamp_utc", "lamport_timestamp", "votes",
+    # values
+    "register", "transaction", "query", "prepare", "commit", "abort",
+    "add", "remove", "yes", "no", "committed", "aborted", "registered", "error",
+    "artist_update", "NOTIFICATION_SERVICE", "SERVER", "COORDINATOR",
+    "locked", "duplicate", "not_found", "invalid_operation",
+)
+_INTERN_IDS = {s: i for i, s in enumerate(INTERNED)}
+
+# value tags
+_NONE, _FALSE, _TRUE, _INT8, _INT32, _INT64, _BIGINT, _FLOAT = range(8)
+_STR8, _STR32, _INTERNED, _LIST8, _LIST32, _DICT8, _DICT32 = range(8, 15)
+# dict keys are a 1-byte interned id, or _KEY_STR followed by a STR8/STR32 value
+_KEY_STR = 0xFF
+
+_B = struct.Struct("!B")
+_TAG_B = struct.Struct("!BB")
+_TAG_b = struct.Struct("!Bb")
+_TAG_I = struct.Struct("!BI")
+_TAG_i = struct.Struct("!Bi")
+_TAG_q = struct.Struct("!Bq")
+_TAG_d = struct.Struct("!Bd")
+_I = struct.Struct("!I")
+_b = struct.Struct("!b")
+_i = struct.Struct("!i")
+_q = struct.Struct("!q")
+_d = struct.Struct("!d")
+
+
+def _encode_str(value, out):
+    data = value.encode("utf-8")
+    n = len(data)
+    out += _TAG_B.pack(_STR8, n) if n < 256 else _TAG_I.pack(_STR32, n)
+    out += data
+
+
+class BinaryCodec:
+    """
+    Compact struct-based encoding: one tag byte per value, fixed-width ints and
+    floats, length-prefixed strings, and well-known field names / values sent as
+    one-byte ids instead of text. Accepts the same values as JSON (dict keys are
+    converted to str the way json.dumps does).
+    """
+    name = "binary"
+
+    @classmethod
+    def encode(cls, message):
+        out = bytearray(_B.pack(MAGIC))
+        cls._encode(message, out)
+        return bytes(out)
+
+    @classmethod
+    def _encode(cls, value, out):
+        kind = type(value)
+        if kind is str:
+            interned = _INTERN_IDS.get(value)
+            if interned is not None:
+                out += _TAG_B.pack(_INTERNED, interned)
+            else:
+                _encode_str(value, out)
+        elif kind is int:
+            if -128 <= value < 128:
+                out += _TAG_b.pack(_INT8, value)
+            elif -2**31 <= value < 2**31:
+                out += _TAG_i.pack(_INT32, value)
+            elif -2**63 <= value < 2**63:
+                out += _TAG_q.pack(_INT64, value)
+            else:
+                out.append(_BIGINT)
+                _encode_str(str(value), out)
+        elif kind is dict:
+            n = len(value)
+            out += _TAG_B.pack(_DICT8, n) if n < 256 else _TAG_I.pack(_DICT32, n)
+            encode = cls._encode
+            for key, item in value.items():
+                if type(key) is not str:
+                    key = json.dumps(key)   # 1 -> "1", True -> "true", like JSON object keys
+                interned = _INTERN_IDS.get(key)
+                if interned is not None:
+                    out.append(interned)
+                else:
+                    out.append(_KEY_STR)
+                    _encode_str(key, out)
+                encode(item, out)
+        elif kind is list or kind is tuple:
+            n = len(value)
+            out += _TAG_B.pack(_LIST8, n) if n < 256 else _TAG_I.pack(_LIST32, n)
+            encode = cls._encode
+            for item in value:
+                encode(item, out)
+        elif value is None:
+            out.append(_NONE)
+        elif value is True:
+            out.append(_TRUE)
+        elif value is False:
+            out.append(_FALSE)
+        elif kind is float:
+            out += _TAG_d.pack(_FLOAT, value)
+        elif isinstance(value, (str, int, float, dict, list, tuple)):
+            # subclasses (e.g. IntEnum, OrderedDict): encode as the base JSON type
+            for base in (str, int, float, dict, list):
+                if isinstance(value, base):
+                    return cls._encode(base(value), out)
+            cls._encode(list(value), out)
+        else:
+            raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+    @classmethod
+    def decode(cls, payload):
+        if not payload or payload[0] != MAGIC:
+            raise CodecError("not a binary-codec payload")
+        view = memoryview(payload)
+        try:
+            value, end = cls._decode(view, 1)
+        except (IndexError, struct.error, RecursionError) as e:
+            # reading past the end of a truncated payload, or absurdly deep nesting
+            raise CodecError(f"truncated or corrupt binary message: {e}") from None
+        if end != len(view):
+            raise CodecError(f"{len(view) - end} trailing bytes after binary message")
+        return value
+
+    @classmethod
+    def _decode(cls, view, pos):
+        tag = view[pos]
+        pos += 1
+        if tag == _INTERNED:
+            return INTERNED[view[pos]], pos + 1
+        if tag == _STR8 or tag == _STR32:
+            return cls._decode_str(view, pos - 1)
+        if tag == _INT8:
+            return _b.unpack_from(view, pos)[0], pos + 1
+        if tag == _INT32:
+            return _i.unpack_from(view, pos)[0], pos + 4
+        if tag == _DICT8 or tag == _DICT32:
+            if tag == _DICT8:
+                n, pos = view[pos], pos + 1
+            else:
+                n, pos = _I.unpack_from(view, pos)[0], pos + 4
+            result = {}
+            for _ in range(n):
+                key_id = view[pos]
+                if key_id == _KEY_STR:
+                    key, pos = cls._decode_str(view, pos + 1)
+                else:
+                    key, pos = INTERNED[key_id], pos + 1
+                result[key], pos = cls._decode(view, pos)
+            return result, pos
+        if tag == _LIST8 or tag == _LIST32:
+            if tag == _LIST8:
+                n, pos = view[pos], pos + 1
+            else:
+                n, pos = _I.unpack_from(view, pos)[0], pos + 4
+            result = []
+            for _ in range(n):
+                item, pos = cls._decode(view, pos)
+                result.append(item)
+            return result, pos
+        if tag == _INT64:
+            return _q.unpack_from(view, pos)[0], pos + 8
+        if tag == _FLOAT:
+            return _d.unpack_from(view, pos)[0], pos + 8
+        if tag == _NONE:
+            return None, pos
+        if tag == _TRUE:
+            return True, pos
+        if tag == _FALSE:
+            return False, pos
+        if tag == _BIGINT:
+            text, pos = cls._decode_str(view, pos)
+            return int(text), pos
+        raise CodecError(f"unknown binary-codec tag {tag}")
+
+    @staticmethod
+    def _decode_str(view, pos):
+        tag = view[pos]
+        if tag == _STR8:
+            n, pos = view[pos + 1], pos + 2
+        elif tag == _STR32:
+            n, pos = _I.unpack_from(view, pos + 1)[0], pos + 5
+        else:
+            raise CodecError(f"expected a string, got tag {tag}")
+        if pos + n > len(view):
+            raise CodecError("binary message ends in the middle of a string")
+        return str(view[pos:pos + n], "utf-8"), pos + n
+
+
+CODECS = {
+    "json": JsonCodec,
+    "binary": BinaryCodec,
+}
+
+
+def get_codec(codec):
+    """Codec by name ("json", "binary"); codec classes and None (-> JSON) pass through"""
+    if codec is None:
+        return JsonCodec
+    if isinstance(codec, str):
+        if codec not in CODECS:
+            raise ValueError(f"unknown codec: {codec}")
+        return CODECS[codec]
+    return codec
+
+
+def detect_codec(payload):
+    """The codec a payload was written in, from its first byte"""
+    return BinaryCodec if payload and payload[0] == MAGIC else JsonCodec
+
+
+def decode(payload):
+    return detect_codec(payload).decode(payload)
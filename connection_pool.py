@@ -0,0 +1,235 @@
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FuturesTimeout
+
+
+class SharedConnection:
+    """
+    One pika BlockingConnection shared by many users in the process.
+    pika connections are not thread-safe, so a single I/O thread owns the socket:
+    it services heartbeats and consumer deliveries, and runs every job handed to
+    call()/call_soon() in order. If the connection drops, the thread reconnects
+    with backoff, reopens the shared publish channel and re-runs each registered
+    setup function (used by subscriptions to redeclare their queue and consumer).
+    If only the publish channel is closed (e.g. the broker rejected a declare),
+    the job that hit it fails and the channel is reopened before the next job.
+    """
+    def __init__(self, host, name, heartbeat=30, poll_interval=0.05, max_backoff=10.0):
+        import pika
+        self.pika = pika
+        self.host = host
+        self.name = name
+        self.heartbeat = heartbeat
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self.users = 0                  # transports/subscriptions holding this connection (pool-managed)
+        self.reconnects = 0
+        self._jobs = deque()            # (fn, future or None), run on the I/O thread
+        self._setups = {}               # {id: setup(connection)} re-run after every reconnect
+        self._setup_ids = itertools.count(1)
+        self._connection = None
+        self._channel = None            # shared publish/declare channel
+        self._stop = threading.Event()
+
+        self._connect()                 # first connect happens on the caller so errors surface
+        self._thread = threading.Thread(target=self._run, name=f"AMQP-{name}", daemon=True)
+        self._thread.start()
+
+    # --- health ---
+    @property
+    def healthy(self):
+        conn = self._connection
+        return (not self._stop.is_set() and self._thread.is_alive()
+                and conn is not None and conn.is_open)
+
+    # --- caller side ---
+    def call(self, fn, timeout=None):
+        """Run fn(publish_channel) on the I/O thread and return its result"""
+        if threading.current_thread() is self._thread:
+            return fn(self._channel)
+        future = Future()
+        self._submit(fn, future)
+        try:
+            return future.result(timeout)
+        except FuturesTimeout:
+            # don't let the job run later, after the caller was told it failed
+            # (one the I/O thread is running at this very moment can't be stopped)
+            future.cancel()
+            raise
+
+    def call_soon(self, fn):
+        """Queue fn(publish_channel) on the I/O thread without waiting for it"""
+        if threading.current_thread() is self._thread:
+            fn(self._channel)
+        else:
+            self._submit(fn, None)
+
+    def add_setup(self, setup):
+        """Run setup(connection) now and again after every reconnect; returns a handle"""
+        setup_id = next(self._setup_ids)
+
+        def register(_):
+            self._setups[setup_id] = setup
+            setup(self._connection)
+        self.call(register)
+        return setup_id
+
+    def remove_setup(self, setup_id):
+        self.call_soon(lambda _: self._setups.pop(setup_id, None))
+
+    def _submit(self, fn, future):
+        if self._stop.is_set():
+            raise RuntimeError(f"AMQP connection {self.name} is closed")
+        self._jobs.append((fn, future))
+        conn = self._connection
+        try:
+            if conn is not None and conn.is_open:
+                conn.add_callback_threadsafe(lambda: None)  # wake process_data_events early
+        except Exception:
+            pass  # the loop polls the job queue anyway
+
+    # --- I/O thread ---
+    def _connect(self):
+        pika = self.pika
+        self._connection = pika.BlockingConnection(
+            pika.ConnectionParameters(self.host, heartbeat=self.heartbeat))
+        self._channel = self._connection.channel()
+
+    def _ensure_channel(self):
+        """Reopen the publish channel if the broker closed it (the connection itself is still up)"""
+        if self._channel is None or not self._channel.is_open:
+            self._channel = self._connection.channel()
+            print(f"[AMQP {self.name}] reopened publish channel")
+
+    def _run_jobs(self):
+        while self._jobs:
+            fn, future = self._jobs.popleft()
+            # futures stay pending until the job is done, so a caller whose call() timed
+            # out can still cancel it, including while it waits here for a reconnect
+            if future is not None and future.cancelled():
+                continue
+            try:
+                self._ensure_channel()
+                result = fn(self._channel)
+            except self.pika.exceptions.AMQPConnectionError:
+                self._jobs.appendleft((fn, future))   # retry once reconnected
+                raise
+            except Exception as e:
+                if future is None:
+                    print(f"[AMQP {self.name}] background job failed: {e}")
+                else:
+                    self._resolve(future, error=e)
+            else:
+                if future is not None:
+                    self._resolve(future, result)
+
+    @staticmethod
+    def _resolve(future, result=None, error=None):
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass  # cancelled by a timed-out caller while the job was running
+
+    def _run(self):
+        backoff = 0.5
+        while not self._stop.is_set():
+            try:
+                if self._connection is None or not self._connection.is_open:
+                    self._connect()
+                    self.reconnects += 1
+                    for setup in list(self._setups.values()):
+                        setup(self._connection)
+                    print(f"[AMQP {self.name}] reconnected to {self.host}")
+                    backoff = 0.5
+                self._run_jobs()
+                try:
+                    self._connection.process_data_events(time_limit=self.poll_interval)
+                except self.pika.exceptions.AMQPChannelError as e:
+                    # only a channel closed: the connection is fine, so don't reconnect
+                    # (the publish channel is reopened before the next job)
+                    print(f"[AMQP {self.name}] channel error: {e!r}")
+            except Exception as e:   # pika.exceptions.AMQPError, or a setup that failed half-way
+                if self._stop.is_set():
+                    break
+                print(f"[AMQP {self.name}] connection lost ({e!r}), retrying in {backoff:.1f}s")
+                self._connection = None
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+        self._close_connection()
+
+    def _close_connection(self):
+        try:
+            if self._connection is not None and self._connection.is_open:
+                self._connection.close()
+        except Exception:
+            pass
+        while self._jobs:
+            _, future = self._jobs.popleft()
+            if future is not None and future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError(f"AMQP connection {self.name} is closed"))
+
+    def close(self):
+        self._stop.set()
+        if threading.current_thread() is not self._thread:
+            self._thread.join(timeout=5)
+
+
+class PikaConnectionPool:
+    """
+    Process-wide pool of SharedConnections, one pool per broker host.
+    Users acquire() a connection and release() it when done; connections are
+    spread over at most `max_connections` sockets (healthy, then least loaded
+    first) and closed when their last user leaves.
+    """
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, host="localhost"):
+        """Pool shared by every PikaTransport for this broker host"""
+        with cls._pools_lock:
+            if host not in cls._pools:
+                cls._pools[host] = cls(host)
+            return cls._pools[host]
+
+    def __init__(self, host="localhost", max_connections=2):
+        self.host = host
+        self.max_connections = max_connections
+        self._lock = threading.Lock()
+        self._connections = []
+        self._names = itertools.count(1)
+
+    def acquire(self):
+        with self._lock:
+            if len(self._connections) < self.max_connections:
+                conn = SharedConnection(self.host, f"{self.host}-{next(self._names)}")
+                self._connections.append(conn)
+            else:
+                # prefer connections that are up right now, then the least loaded
+                conn = min(self._connections, key=lambda c: (not c.healthy, c.users))
+            conn.users += 1
+            return conn
+
+    def release(self, conn):
+        with self._lock:
+            conn.users -= 1
+            if conn.users > 0:
+                return
+            if conn in self._connections:
+                self._connections.remove(conn)
+        conn.close()
+
+    def stats(self):
+        with self._lock:
+            return [{"name": c.name, "users": c.users, "healthy": c.healthy,
+                     "reconnects": c.reconnects} for c in self._connections]
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
@@ -1,9 +1,12 @@
 import socket
 import threading
-import json
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from enum import Enum
-from lamport_clock import LamportClock
+from lamport_clock import create_clock
+from framing import FrameReader, FrameError, send_message, recv_message
+from executor import BoundedExecutor
+import wal
 
 class TransactionState(Enum):
     PREPARING = "preparing"
@@ -11,7 +14,10 @@ class TransactionState(Enum):
     ABORTED = "aborted"
 
 class TwoPhaseCommitCoordinator:
-    def __init__(self, host='localhost', port=5002):
+    def __init__(self, host='localhost', port=5002, max_workers=16, max_pending=64, backlog=128,
+                 phase_timeout=5.0, fanout_workers=32, group_commit_window=0.0,
+                 wal_path=None, checkpoint_every=1000, clock="lamport", codec="json",
+                 commit_retry_interval=1.0):
         self.host = host
         self.port = port
         self.participants = {}  # {client_id: (host, port)}
@@ -20,29 +26,50 @@ class TwoPhaseCommitCoordinator:
         self.lock = threading.Lock()
         self.server_socket = None
         self._stop = threading.Event()
-        self.lamport_clock = LamportClock("COORDINATOR")
+        self.lamport_clock = create_clock(clock, "COORDINATOR")
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.backlog = backlog
+        self.executor = None
+        # PREPARE/COMMIT/ABORT go to all participants concurrently; each phase has one deadline
+        self.phase_timeout = phase_timeout
+        self.codec = codec      # wire format for PREPARE/COMMIT/ABORT ("json" or "binary")
+        self.fanout_pool = ThreadPoolExecutor(max_workers=fanout_workers, thread_name_prefix="2pc-fanout")
+        # COMMITs that were not acknowledged are re-sent this often until every participant has
+        self.commit_retry_interval = commit_retry_interval
+        # group commit: transactions arriving within the window share one 2PC round (0 = off)
+        self.group_commit_window = group_commit_window
+        self._group = []
+        self._group_lock = threading.Lock()
+        # durable decision log (optional); transactions are recovered from it on startup
+        self.wal = None
+        self.checkpoint_every = checkpoint_every
+        self._wal_lock = threading.Lock()
+        if wal_path:
+            self.wal = wal.WriteAheadLog(wal_path)
+            self._recover_from_wal()
         
     def start(self):
         """Start the coordinator server"""
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.server_socket.bind((self.host, self.port))
-        self.server_socket.listen(10)
+        self.server_socket.listen(self.backlog)
         print(f"[COORDINATOR] Running on {self.host}:{self.port}")
+        self.executor = BoundedExecutor(self.max_workers, self.max_pending, name="COORDINATOR").start()
         
         def accept_loop():
             while not self._stop.is_set():
                 try:
                     conn, addr = self.server_socket.accept()
-                    threading.Thread(
-                        target=self._handle_request,
-                        args=(conn, addr),
-                        daemon=True
-                    ).start()
                 except OSError:
                     break
+                if not self.executor.submit(self._handle_request, conn, addr):
+                    print(f"[COORDINATOR] Busy, rejecting connection from {addr}")
+                    conn.close()
                     
         threading.Thread(target=accept_loop, daemon=True).start()
+        threading.Thread(target=self._redeliver_commits, daemon=True).start()
         
     def register_participant(self, client_id, host, port):
         """Register a client as a participant in 2PC"""
@@ -53,60 +80,129 @@ class TwoPhaseCommitCoordinator:
     def _handle_request(self, conn, addr):
         """Handle incoming requests from clients"""
         with conn:
-            data = conn.recv(4096).decode('utf-8')
+            reader = FrameReader(conn)
+            while True:
+                try:
+                    request = reader.read_message()
+                except (FrameError, OSError, ValueError) as e:
+                    print(f"[COORDINATOR] Dropping connection {addr}: {e}")
+                    return
+                if request is None:
+                    return
+                send_message(conn, self._dispatch_request(request), reader.codec)
+
+    def _dispatch_request(self, request):
+        """Route a single decoded request and build its response"""
+        request_type = request.get('type')
+        
+        # Update Lamport clock on receive
+        if 'timestamp' in request:
+            self.lamport_clock.update(request['timestamp'])
+        
+        if request_type == 'register':
+            client_id = request['client_id']
+            client_host = request['host']
+            client_port = request['port']
+            self.register_participant(client_id, client_host, client_port)
             
-            request = json.loads(data)
-            request_type = request.get('type')
+            timestamp = self.lamport_clock.increment()
+            return {'status': 'registered', 'timestamp': timestamp}
             
-            # Update Lamport clock on receive
-            if 'timestamp' in request:
-                self.lamport_clock.update(request['timestamp'])
+        elif request_type == 'transaction':
+            # Start a new distributed transaction
+            return self._execute_transaction(request)
             
-            if request_type == 'register':
-                client_id = request['client_id']
-                client_host = request['host']
-                client_port = request['port']
-                self.register_participant(client_id, client_host, client_port)
-                
-                timestamp = self.lamport_clock.increment()
-                response = {'status': 'registered', 'timestamp': timestamp}
-                
-            elif request_type == 'transaction':
-                # Start a new distributed transaction
-                response = self._execute_transaction(request)
-                
-            else:
-                timestamp = self.lamport_clock.increment()
-                response = {'status': 'error', 'message': 'Unknown request type', 'timestamp': timestamp}
-                
-            conn.sendall(json.dumps(response).encode('utf-8'))
+        elif request_type == 'query':
+            # A recovering participant asks how a transaction ended
+            return self._query_transaction(request['transaction_id'])
+
+        elif request_type == 'health':
+            # Readiness probe (health.py)
+            return {'status': 'ok'}
+            
+        timestamp = self.lamport_clock.increment()
+        return {'status': 'error', 'message': 'Unknown request type', 'timestamp': timestamp}
                 
-                    
+    @staticmethod
+    def _operations_of(request):
+        """A transaction carries either a list of operations or a single operation/song_id"""
+        if request.get('operations'):
+            return [{'operation': op['operation'], 'song_id': op['song_id']}
+                    for op in request['operations']]
+        return [{'operation': request['operation'], 'song_id': request['song_id']}]
+
     def _execute_transaction(self, request):
+        """Execute a 2PC transaction, batching it with concurrent ones when group commit is on"""
+        if self.group_commit_window > 0:
+            return self._group_commit(request)
+        return self._run_transaction(self._operations_of(request), request['client_id'])
+
+    def _group_commit(self, request):
+        """
+        The first transaction to arrive waits group_commit_window seconds, then runs
+        everything that arrived meanwhile as a single 2PC round. If the combined
+        batch aborts, each transaction is retried on its own so one conflict does
+        not fail unrelated work.
+        """
+        slot = {'request': request, 'done': threading.Event(), 'response': None}
+        with self._group_lock:
+            self._group.append(slot)
+            leader = len(self._group) == 1
+        if not leader:
+            slot['done'].wait()
+            return slot['response']
+            
+        time.sleep(self.group_commit_window)
+        with self._group_lock:
+            group, self._group = self._group, []
+            
+        try:
+            if len(group) > 1:
+                operations = [op for member in group for op in self._operations_of(member['request'])]
+                initiators = ",".join(sorted({member['request']['client_id'] for member in group}))
+                print(f"[COORDINATOR] Group commit of {len(group)} transactions")
+                response = self._run_transaction(operations, initiators)
+                if response['status'] == 'committed':
+                    for member in group:
+                        member['response'] = response
+                        
+            for member in group:
+                if member['response'] is None:
+                    member['response'] = self._run_transaction(
+                        self._operations_of(member['request']), member['request']['client_id'])
+        finally:
+            for member in group:
+                if member['response'] is None:
+                    timestamp = self.lamport_clock.increment()
+                    member['response'] = {'status': 'aborted', 'reason': 'coordinator_error',
+                                          'timestamp': timestamp}
+                member['done'].set()
+        return slot['response']
+
+    def _run_transaction(self, operations, initiator):
         """Execute a 2PC transaction with BEGIN, PREPARE, COMMIT/ABORT phases"""
         with self.lock:
             self.transaction_counter += 1
             transaction_id = f"txn_{self.transaction_counter}"
-            
-        operation = request['operation']  # 'add' or 'remove'
-        song_id = request['song_id']
-        initiator = request['client_id']
         
         # Increment clock for transaction start
         txn_timestamp = self.lamport_clock.increment()
         
         print(f"\n[COORDINATOR T={txn_timestamp}] ===== BEGIN TRANSACTION {transaction_id} =====")
-        print(f"[COORDINATOR] Operation: {operation} song {song_id}")
+        if len(operations) == 1:
+            print(f"[COORDINATOR] Operation: {operations[0]['operation']} song {operations[0]['song_id']}")
+        else:
+            print(f"[COORDINATOR] Batch of {len(operations)} operations")
         print(f"[COORDINATOR] Initiator: {initiator}")
         
         # Store transaction info
         self.transactions[transaction_id] = {
-            'operation': operation,
-            'song_id': song_id,
+            'operations': operations,
             'initiator': initiator,
             'timestamp': txn_timestamp,
             'state': TransactionState.PREPARING
         }
+        self._log(wal.PREPARING, transaction_id, operations)
         
         # Get all participants (including initiator for consistency)
         with self.lock:
@@ -117,13 +213,15 @@ class TwoPhaseCommitCoordinator:
             
         if not participants:
             print(f"[COORDINATOR] No participants registered")
+            self.transactions[transaction_id]['state'] = TransactionState.ABORTED
+            self._log(wal.ABORTED, transaction_id)
             timestamp = self.lamport_clock.increment()
             return {'status': 'aborted', 'transaction_id': transaction_id, 
                     'reason': 'no_participants', 'timestamp': timestamp}
             
         # PHASE 1: PREPARE (ask all nodes if they can commit)
         print(f"\n[COORDINATOR] ===== PHASE 1: PREPARE =====")
-        prepare_votes = self._phase1_prepare(transaction_id, operation, song_id, participants)
+        prepare_votes, inflight = self._phase1_prepare(transaction_id, operations, participants)
         
         # Check if all voted YES
         all_yes = all(vote == 'yes' for vote in prepare_votes.values())
@@ -132,7 +230,14 @@ class TwoPhaseCommitCoordinator:
             # PHASE 2: COMMIT
             print(f"\n[COORDINATOR] All votes YES - ===== PHASE 2: COMMIT =====")
             self.transactions[transaction_id]['state'] = TransactionState.COMMITTED
-            self._phase2_commit(transaction_id, operation, song_id, participants)
+            # the decision must be durable before any participant hears about it
+            self._log(wal.COMMITTED, transaction_id, sync=True)
+            unacknowledged = self._phase2_commit(transaction_id, operations, participants)
+            # participants that missed the COMMIT get it again from _redeliver_commits;
+            # once every participant acknowledged, the decision can be forgotten at checkpoint
+            self.transactions[transaction_id]['unacknowledged'] = unacknowledged
+            self.transactions[transaction_id]['acknowledged'] = not unacknowledged
+            self._maybe_checkpoint()
             
             timestamp = self.lamport_clock.increment()
             print(f"\n[COORDINATOR T={timestamp}] ===== TRANSACTION {transaction_id} COMMITTED =====\n")
@@ -147,7 +252,9 @@ class TwoPhaseCommitCoordinator:
             # PHASE 2: ABORT
             print(f"\n[COORDINATOR] Some votes NO - ===== PHASE 2: ABORT =====")
             self.transactions[transaction_id]['state'] = TransactionState.ABORTED
-            self._phase2_abort(transaction_id, participants)
+            self._log(wal.ABORTED, transaction_id)  # presumed abort: no forced write needed
+            self._phase2_abort(transaction_id, participants, inflight)
+            self._maybe_checkpoint()
             
             timestamp = self.lamport_clock.increment()
             print(f"\n[COORDINATOR T={timestamp}] ===== TRANSACTION {transaction_id} ABORTED =====\n")
@@ -159,39 +266,62 @@ class TwoPhaseCommitCoordinator:
                 'timestamp': timestamp
             }
             
-    def _phase1_prepare(self, transaction_id, operation, song_id, participants):
-        """Phase 1: Send PREPARE to all participants and collect votes"""
+    def _phase1_prepare(self, transaction_id, operations, participants):
+        """
+        Phase 1: Send PREPARE to all participants concurrently and collect votes.
+        Stops waiting at the phase deadline or as soon as any participant votes NO.
+        Returns (votes, inflight) where inflight maps participants that have not
+        answered yet to their pending PREPARE futures.
+        """
         votes = {}
         timestamp = self.lamport_clock.increment()
+        deadline = time.monotonic() + self.phase_timeout
         
-        for client_id, host, port in participants:
-            try:
-                vote = self._send_prepare(client_id, host, port, transaction_id, 
-                                         operation, song_id, timestamp)
-                votes[client_id] = vote
-                print(f"[COORDINATOR] {client_id} voted: {vote}")
-            except Exception as e:
-                print(f"[COORDINATOR] {client_id} failed to respond: {e}")
-                votes[client_id] = 'no'  # Failed response = NO vote
+        futures = {
+            self.fanout_pool.submit(self._send_prepare, client_id, host, port,
+                                    transaction_id, operations, timestamp): client_id
+            for client_id, host, port in participants
+        }
+        pending = set(futures)
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                client_id = futures[future]
+                try:
+                    votes[client_id] = future.result()
+                    print(f"[COORDINATOR] {client_id} voted: {votes[client_id]}")
+                except Exception as e:
+                    print(f"[COORDINATOR] {client_id} failed to respond: {e}")
+                    votes[client_id] = 'no'  # Failed response = NO vote
+            if any(vote != 'yes' for vote in votes.values()):
+                break  # one NO decides the outcome, no need to wait for the rest
+                
+        inflight = {}
+        for future in pending:
+            client_id = futures[future]
+            print(f"[COORDINATOR] {client_id} did not vote before the decision")
+            votes[client_id] = 'no'
+            inflight[client_id] = future
                 
-        return votes
+        return votes, inflight
         
-    def _send_prepare(self, client_id, host, port, transaction_id, operation, song_id, timestamp):
+    def _send_prepare(self, client_id, host, port, transaction_id, operations, timestamp):
         """Send PREPARE message to a participant"""
         message = {
             'phase': 'prepare',
             'transaction_id': transaction_id,
-            'operation': operation,
-            'song_id': song_id,
+            'operations': operations,
             'timestamp': timestamp
         }
         
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.settimeout(5.0)
+            s.settimeout(self.phase_timeout)
             s.connect((host, port))
-            s.sendall(json.dumps(message).encode('utf-8'))
-            response = s.recv(1024).decode('utf-8')
-            result = json.loads(response)
+            send_message(s, message, self.codec)
+            result = recv_message(s)
             
             # Update clock with response
             if 'timestamp' in result:
@@ -199,45 +329,114 @@ class TwoPhaseCommitCoordinator:
                 
             return result.get('vote', 'no')
             
-    def _phase2_commit(self, transaction_id, operation, song_id, participants):
-        """Phase 2: Send COMMIT to all participants"""
+    def _phase2_commit(self, transaction_id, operations, participants):
+        """Phase 2: Send COMMIT to all participants concurrently. Returns those that did not acknowledge."""
         timestamp = self.lamport_clock.increment()
         
-        for client_id, host, port in participants:
-            self._send_commit(client_id, host, port, transaction_id, 
-                                operation, song_id, timestamp)
-            print(f"[COORDINATOR] {client_id} committed")
+        futures = {
+            self.fanout_pool.submit(self._send_commit, client_id, host, port, transaction_id,
+                                    operations, timestamp): client_id
+            for client_id, host, port in participants
+        }
+        unacknowledged = self._await_phase2(futures, "committed")
+        return [participant for participant in participants if participant[0] in unacknowledged]
                 
-    def _send_commit(self, client_id, host, port, transaction_id, operation, song_id, timestamp):
+    def _send_commit(self, client_id, host, port, transaction_id, operations, timestamp):
         """Send COMMIT message to a participant"""
         message = {
             'phase': 'commit',
             'transaction_id': transaction_id,
-            'operation': operation,
-            'song_id': song_id,
+            'operations': operations,
             'timestamp': timestamp
         }
         
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.settimeout(5.0)
+            s.settimeout(self.phase_timeout)
             s.connect((host, port))
-            s.sendall(json.dumps(message).encode('utf-8'))
-            response = s.recv(1024).decode('utf-8')
-            result = json.loads(response)
+            send_message(s, message, self.codec)
+            result = recv_message(s)
             
             # Update clock
             if 'timestamp' in result:
                 self.lamport_clock.update(result['timestamp'])
             
-    def _phase2_abort(self, transaction_id, participants):
-        """Phase 2: Send ABORT to all participants"""
+    def _phase2_abort(self, transaction_id, participants, inflight=None):
+        """
+        Phase 2: Send ABORT to all participants concurrently.
+        Participants whose PREPARE is still in flight get their ABORT once that
+        PREPARE completes or fails. A PREPARE that timed out on our side may still
+        reach the participant after the ABORT; participants remember aborted
+        transaction ids and vote NO on such a late PREPARE.
+        """
         timestamp = self.lamport_clock.increment()
+        inflight = inflight or {}
         
+        futures = {}
         for client_id, host, port in participants:
+            if client_id in inflight:
+                inflight[client_id].add_done_callback(
+                    lambda _, args=(client_id, host, port, transaction_id, timestamp):
+                        self._send_abort_quietly(*args))
+            else:
+                future = self.fanout_pool.submit(self._send_abort, client_id, host, port,
+                                                 transaction_id, timestamp)
+                futures[future] = client_id
+        self._await_phase2(futures, "aborted")
+
+    def _await_phase2(self, futures, outcome):
+        """Wait (up to the phase deadline) for phase 2 acknowledgements. Returns the ids that did not ack."""
+        done, pending = wait(futures, timeout=self.phase_timeout)
+        unacknowledged = set()
+        for future in done:
+            client_id = futures[future]
+            try:
+                future.result()
+                print(f"[COORDINATOR] {client_id} {outcome}")
+            except Exception as e:
+                print(f"[COORDINATOR] {client_id} did not acknowledge: {e}")
+                unacknowledged.add(client_id)
+        for future in pending:
+            print(f"[COORDINATOR] {futures[future]} did not acknowledge before the deadline")
+            unacknowledged.add(futures[future])
+        return unacknowledged
+
+    def _redeliver_commits(self):
+        """
+        Re-send COMMIT for decisions that some participant never acknowledged (ack
+        timeout, or recovered from the WAL) until all have, so participants release
+        their locks and the decision can be dropped at the next checkpoint. The
+        participants of a recovered commit are not logged, so after a restart it
+        goes to every registered participant.
+        """
+        while not self._stop.wait(self.commit_retry_interval):
+            unacknowledged = [(txn_id, txn) for txn_id, txn in list(self.transactions.items())
+                              if txn['state'] == TransactionState.COMMITTED
+                              and txn.get('acknowledged') is False]
+            for transaction_id, txn in unacknowledged:
+                targets = txn.get('unacknowledged')
+                if targets is None:
+                    with self.lock:
+                        targets = [(cid, host, port) for cid, (host, port) in self.participants.items()]
+                    if not targets:
+                        continue  # nobody has registered since the restart yet
+                print(f"[COORDINATOR] Re-sending COMMIT for {transaction_id} to {len(targets)} participants")
+                try:
+                    txn['unacknowledged'] = self._phase2_commit(transaction_id, txn['operations'], targets)
+                except RuntimeError:
+                    return  # fan-out pool shut down by stop()
+                if not txn['unacknowledged']:
+                    txn['acknowledged'] = True
+                    print(f"[COORDINATOR] {transaction_id} acknowledged by every participant")
+            if unacknowledged:
+                self._maybe_checkpoint()
+
+    def _send_abort_quietly(self, client_id, host, port, transaction_id, timestamp):
+        try:
             self._send_abort(client_id, host, port, transaction_id, timestamp)
-            print(f"[COORDINATOR] {client_id} aborted")
+            print(f"[COORDINATOR] {client_id} aborted (late)")
+        except Exception as e:
+            print(f"[COORDINATOR] {client_id} did not acknowledge late abort: {e}")
         
-                
     def _send_abort(self, client_id, host, port, transaction_id, timestamp):
         """Send ABORT message to a participant"""
         message = {
@@ -247,19 +446,89 @@ class TwoPhaseCommitCoordinator:
         }
         
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.settimeout(5.0)
+            s.settimeout(self.phase_timeout)
             s.connect((host, port))
-            s.sendall(json.dumps(message).encode('utf-8'))
-            response = s.recv(1024).decode('utf-8')
-            result = json.loads(response)
+            send_message(s, message, self.codec)
+            result = recv_message(s)
             
             # Update clock
             if 'timestamp' in result:
                 self.lamport_clock.update(result['timestamp'])
             
+    def _query_transaction(self, transaction_id):
+        """Outcome of a transaction; unknown transactions were aborted (presumed abort)"""
+        txn = self.transactions.get(transaction_id)
+        status = txn['state'].value if txn else TransactionState.ABORTED.value
+        timestamp = self.lamport_clock.increment()
+        return {'status': status, 'transaction_id': transaction_id, 'timestamp': timestamp}
+
+    def _log(self, kind, transaction_id, operations=(), sync=False):
+        """Append to the WAL. Update self.transactions first so checkpoints never miss a record."""
+        if self.wal is None:
+            return
+        with self._wal_lock:
+            lsn = self.wal.append(kind, transaction_id, operations, sync=False)
+        if sync:
+            self.wal.wait_durable(lsn)
+
+    def _maybe_checkpoint(self):
+        """
+        Rewrite the WAL as: transaction counter, still-undecided transactions and
+        commit decisions not yet acknowledged by every participant. Everything else
+        (aborts, fully acknowledged commits) is dropped from the log and from memory.
+        """
+        if self.wal is None or self.wal.records_since_checkpoint < self.checkpoint_every:
+            return
+        with self._wal_lock:
+            with self.lock:
+                counter = self.transaction_counter
+            records = [(wal.COUNTER, str(counter), [])]
+            for transaction_id, txn in list(self.transactions.items()):
+                state = txn['state']
+                if state == TransactionState.PREPARING:
+                    records.append((wal.PREPARING, transaction_id, txn['operations']))
+                elif state == TransactionState.COMMITTED and not txn.get('acknowledged'):
+                    records.append((wal.PREPARING, transaction_id, txn['operations']))
+                    records.append((wal.COMMITTED, transaction_id, []))
+                else:
+                    del self.transactions[transaction_id]
+            self.wal.checkpoint(records)
+
+    def _recover_from_wal(self):
+        """Rebuild transaction state; transactions without a decision are aborted"""
+        for kind, transaction_id, operations in self.wal.replay():
+            if kind == wal.COUNTER:
+                self.transaction_counter = max(self.transaction_counter, int(transaction_id))
+            elif kind == wal.PREPARING:
+                self.transactions[transaction_id] = {'operations': operations,
+                                                     'state': TransactionState.PREPARING}
+                self.transaction_counter = max(self.transaction_counter,
+                                               int(transaction_id.rsplit('_', 1)[1]))
+            elif kind in (wal.COMMITTED, wal.ABORTED) and transaction_id in self.transactions:
+                self.transactions[transaction_id]['state'] = (
+                    TransactionState.COMMITTED if kind == wal.COMMITTED else TransactionState.ABORTED)
+                if kind == wal.COMMITTED:
+                    # the commit may never have reached every participant: _redeliver_commits re-sends it
+                    self.transactions[transaction_id]['acknowledged'] = False
+                    
+        undecided = [txn_id for txn_id, txn in self.transactions.items()
+                     if txn['state'] == TransactionState.PREPARING]
+        for transaction_id in undecided:
+            self.transactions[transaction_id]['state'] = TransactionState.ABORTED
+            self._log(wal.ABORTED, transaction_id)
+        recommit = sum(txn['state'] == TransactionState.COMMITTED for txn in self.transactions.values())
+        print(f"[COORDINATOR] Recovered {len(self.transactions)} transactions from WAL "
+              f"({len(undecided)} undecided -> aborted, {recommit} commits to re-send), "
+              f"counter at {self.transaction_counter}")
+
     def stop(self):
         """Stop the coordinator"""
         self._stop.set()
+        if self.executor:
+            self.executor.shutdown()
+        self.fanout_pool.shutdown(wait=False)
+        if self.wal:
+            self.wal.close()
         if self.server_socket:
             try:
                 self.server_socket.close()
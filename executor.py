@@ -0,0 +1,91 @@
+import queue
+import threading
+
+
+class BoundedExecutor:
+    """
+    Fixed-size worker pool with a bounded pending queue, shared by the accept loops.
+    When every worker is busy and the queue is full, submit() rejects the task
+    instead of spawning another thread.
+    """
+    def __init__(self, max_workers=32, max_pending=128, name="worker"):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.name = name
+        self._tasks = queue.Queue(maxsize=max_pending)
+        self._workers = []
+        self._stats_lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.active = 0
+        self._shutdown = False
+
+    def start(self):
+        for i in range(self.max_workers):
+            t = threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True)
+            t.start()
+            self._workers.append(t)
+        return self
+
+    def submit(self, fn, *args):
+        """Queue fn(*args) for a worker. Returns False if the task was rejected."""
+        if self._shutdown:
+            return False
+        try:
+            self._tasks.put_nowait((fn, args))
+        except queue.Full:
+            with self._stats_lock:
+                self.rejected += 1
+            return False
+        with self._stats_lock:
+            self.submitted += 1
+        return True
+
+    def _worker(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            fn, args = task
+            with self._stats_lock:
+                self.active += 1
+            try:
+                fn(*args)
+            except Exception as e:
+                with self._stats_lock:
+                    self.failed += 1
+                print(f"[{self.name}] task error: {e}")
+            finally:
+                with self._stats_lock:
+                    self.active -= 1
+                    self.completed += 1
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "workers": self.max_workers,
+                "active": self.active,
+                "pending": self._tasks.qsize(),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "failed": self.failed,
+            }
+
+    def shutdown(self, wait=False):
+        """Stop accepting work and let workers exit once the queue drains"""
+        self._shutdown = True
+        workers, self._workers = self._workers, []
+
+        def signal_workers():
+            for _ in workers:
+                self._tasks.put(None)  # blocks until there is room behind the pending tasks
+
+        if not wait:
+            threading.Thread(target=signal_workers, daemon=True).start()
+            return
+        signal_workers()
+        for t in workers:
+            t.join()
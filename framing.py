@@ -0,0 +1,201 @@
+import struct
+from codec import get_codec, detect_codec  # JSON (default) or compact binary payloads
+
+# every message on the wire is a 4-byte big-endian length followed by the payload
+HEADER = struct.Struct("!I")
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+
+class FrameError(Exception):
+    """Raised on a malformed or truncated frame"""
+
+
+def encode_message(message, codec=None):
+    return get_codec(codec).encode(message)
+
+
+def decode_message(payload):
+    """Decode a payload in whichever codec it was written in"""
+    return detect_codec(payload).decode(payload)
+
+
+def encode_frame(payload):
+    """Header + payload as one bytes object (used where scatter/gather sends are not available)"""
+    return HEADER.pack(len(payload)) + payload
+
+
+def send_frame(sock, payload):
+    """
+    Send one length-prefixed frame. Uses sendmsg() so the header and payload
+    go out together without concatenating them into a new buffer.
+    """
+    if len(payload) > MAX_FRAME_SIZE:
+        raise FrameError(f"frame of {len(payload)} bytes exceeds MAX_FRAME_SIZE")
+    header = HEADER.pack(len(payload))
+    if not hasattr(sock, "sendmsg"):  # e.g. Windows
+        sock.sendall(header + payload)
+        return
+
+    buffers = [memoryview(header), memoryview(payload)]
+    while buffers:
+        sent = sock.sendmsg(buffers)
+        # drop whatever was fully written and slice the partially written buffer
+        while sent and buffers:
+            if sent >= len(buffers[0]):
+                sent -= len(buffers[0])
+                buffers.pop(0)
+            else:
+                buffers[0] = buffers[0][sent:]
+                sent = 0
+        buffers = [b for b in buffers if len(b)]
+
+
+def send_message(sock, message, codec=None):
+    """Serialize a message (JSON unless another codec is given) and send it as a single frame"""
+    send_frame(sock, encode_message(message, codec))
+
+
+class FrameReader:
+    """
+    Buffered reader that splits a socket stream back into frames.
+    Small frames are served from one reusable receive buffer; frames larger than
+    the buffer are received straight into their own bytearray through a memoryview.
+    """
+    def __init__(self, sock, buffer_size=65536):
+        self.sock = sock
+        self._buf = bytearray(buffer_size)
+        self._view = memoryview(self._buf)
+        self._start = 0     # first unread byte
+        self._end = 0       # one past the last received byte
+        self.codec = None   # codec of the last message read; replies should use it
+
+    def _available(self):
+        return self._end - self._start
+
+    def _fill(self, needed):
+        """Receive until at least `needed` unread bytes are buffered. Returns False on EOF."""
+        if self._start + needed > len(self._buf):
+            # compact: move the unread tail to the front of the buffer
+            pending = self._available()
+            self._buf[:pending] = self._view[self._start:self._end]
+            self._start, self._end = 0, pending
+        while self._available() < needed:
+            n = self.sock.recv_into(self._view[self._end:])
+            if n == 0:
+                return False
+            self._end += n
+        return True
+
+    def read_frame(self):
+        """Return the next frame payload, or None if the peer closed the connection cleanly"""
+        if not self._fill(HEADER.size):
+            if self._available():
+                raise FrameError("connection closed in the middle of a frame header")
+            return None
+        (length,) = HEADER.unpack_from(self._buf, self._start)
+        if length > MAX_FRAME_SIZE:
+            raise FrameError(f"frame of {length} bytes exceeds MAX_FRAME_SIZE")
+        self._start += HEADER.size
+
+        if length <= len(self._buf):
+            if not self._fill(length):
+                raise FrameError("connection closed in the middle of a frame")
+            payload = bytes(self._view[self._start:self._start + length])
+            self._start += length
+            return payload
+
+        # large frame: copy what is already buffered, then recv_into the rest in place
+        payload = bytearray(length)
+        out = memoryview(payload)
+        have = min(self._available(), length)
+        out[:have] = self._view[self._start:self._start + have]
+        self._start += have
+        while have < length:
+            n = self.sock.recv_into(out[have:])
+            if n == 0:
+                raise FrameError("connection closed in the middle of a frame")
+            have += n
+        return payload
+
+    def read_message(self):
+        """Return the next decoded message, or None on EOF"""
+        payload = self.read_frame()
+        if payload is None:
+            return None
+        self.codec = detect_codec(payload)
+        return self.codec.decode(payload)
+
+
+class FrameParser:
+    """
+    Incremental frame splitter for sockets read by a selector loop: feed() it
+    whatever recv() returned and it hands back the payloads of the frames that
+    are now complete, keeping any partial frame for the next call.
+    """
+    def __init__(self):
+        self._buf = bytearray()
+
+    def feed(self, data):
+        buf = self._buf
+        buf += data
+        frames = []
+        start = 0
+        while len(buf) - start >= HEADER.size:
+            (length,) = HEADER.unpack_from(buf, start)
+            if length > MAX_FRAME_SIZE:
+                raise FrameError(f"frame of {length} bytes exceeds MAX_FRAME_SIZE")
+            end = start + HEADER.size + length
+            if end > len(buf):
+                break
+            frames.append(bytes(buf[start + HEADER.size:end]))
+            start = end
+        if start:
+            del buf[:start]
+        return frames
+
+    def buffered(self):
+        """Bytes of an incomplete frame waiting for more data"""
+        return len(self._buf)
+
+
+def recv_message(sock):
+    """
+    Read exactly one message from a socket used for a single request/response.
+    Raises ConnectionError if the peer closes the connection without answering.
+    """
+    message = FrameReader(sock, buffer_size=4096).read_message()
+    if message is None:
+        raise ConnectionError("connection closed before a response arrived")
+    return message
+
+
+async def read_message_async(reader):
+    """asyncio counterpart of FrameReader.read_message for an asyncio.StreamReader"""
+    payload = await read_frame_async(reader)
+    return None if payload is None else decode_message(payload)
+
+
+async def read_frame_async(reader):
+    """Next frame payload from an asyncio.StreamReader, or None on a clean EOF"""
+    import asyncio
+    try:
+        header = await reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise FrameError("connection closed in the middle of a frame header")
+        return None
+    (length,) = HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise FrameError(f"frame of {length} bytes exceeds MAX_FRAME_SIZE")
+    try:
+        payload = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        raise FrameError("connection closed in the middle of a frame")
+    return payload
+
+
+async def write_message_async(writer, message, codec=None):
+    """asyncio counterpart of send_message for an asyncio.StreamWriter"""
+    payload = encode_message(message, codec)
+    writer.writelines((HEADER.pack(len(payload)), payload))
+    await writer.drain()
@@ -0,0 +1,33 @@
+import socket
+import time
+from framing import FrameError, send_message, recv_message
+
+# Readiness probes for the song server (5001) and 2PC coordinator (5002): both
+# answer {"type": "health"} with {"status": "ok"} on a fresh connection.
+
+
+def check(host="localhost", port=5001, timeout=0.5):
+    """True if a service is listening on host:port and answers a health request"""
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            send_message(sock, {"type": "health"})
+            reply = recv_message(sock)
+    except (OSError, ValueError, FrameError):
+        return False
+    return bool(reply) and reply.get("status") == "ok"
+
+
+def wait_until_ready(host="localhost", port=5001, timeout=10.0, interval=0.01, max_interval=0.2):
+    """
+    Probe host:port until it answers (retrying with backoff from `interval` up to
+    `max_interval` seconds). Returns the seconds waited; raises TimeoutError.
+    """
+    started = time.perf_counter()
+    deadline = started + timeout
+    while not check(host, port, timeout=min(0.5, timeout)):
+        now = time.perf_counter()
+        if now >= deadline:
+            raise TimeoutError(f"no service answering on {host}:{port} after {timeout:.1f}s")
+        time.sleep(min(interval, deadline - now))
+        interval = min(interval * 2, max_interval)
+    return time.perf_counter() - started
@@ -1,29 +1,278 @@
+import itertools
 import threading
+import time
+from datetime import datetime, timezone
+
+_UNBOUNDED = float("inf")
+
+
+class _Epoch:
+    """One run of the clock's counter; retired (ceiling lowered) when the clock jumps"""
+    __slots__ = ("counter", "ceiling")
+
+    def __init__(self, start):
+        self.counter = itertools.count(start)
+        self.ceiling = _UNBOUNDED
+
 
 class LamportClock:
+    """
+    Lamport clock with a lock-free increment.
+    next() on an itertools.count is atomic under the GIL, so increment() (and
+    update() with an already-seen timestamp) never takes a lock. Jumps forward -
+    update() past the current time, reserve() - take a lock and swap in a new
+    counter; a value drawn from a retired counter is discarded and retried, so
+    timestamps stay unique and increasing.
+    """
+    def __init__(self, node_id):
+        self.node_id = node_id  # unique identifier for this node
+        self._epoch = _Epoch(1)
+        self._seen = 0          # a timestamp already handed out (hint for update's fast path)
+        self.lock = threading.Lock()  # serializes jumps only
+
+    def increment(self):
+        while True:
+            epoch = self._epoch
+            t = next(epoch.counter)
+            if t < epoch.ceiling:
+                self._seen = t
+                return t
+
+    def update(self, received_timestamp):
+        if received_timestamp < self._seen:
+            # clock is already past it: max(clock, received) + 1 == clock + 1
+            return self.increment()
+        with self.lock:
+            first = self._jump(received_timestamp + 1, 1)
+        self._seen = first
+        return first
+
+    def reserve(self, n):
+        """Reserve n consecutive timestamps in one call (for batched sends); returns them as a range"""
+        if n < 1:
+            raise ValueError("n must be at least 1")
+        with self.lock:
+            first = self._jump(0, n)
+        self._seen = first + n - 1
+        return range(first, first + n)
+
+    def _jump(self, at_least, n):
+        """Hand out n timestamps starting at max(next, at_least); caller holds self.lock"""
+        epoch = self._epoch
+        epoch.ceiling = -1                  # retire it: values drawn from now on are rejected
+        first = max(next(epoch.counter), at_least)
+        self._epoch = _Epoch(first + n)
+        return first
+
+    def get_time(self):
+        with self.lock:
+            current = self._jump(0, 0) - 1    # re-issues the peeked value, so nothing is skipped
+        return current
+
+    @property
+    def clock(self):
+        return self.get_time()
+
+    def get_timestamp_with_id(self):
+        return (self.get_time(), self.node_id) # return a tuple (timestamp, node_id) for total ordering
+        # if timestamps are equal, node_id breaks the tie
+
+    # total order only: timestamps sort as themselves and never prove concurrency
+    @staticmethod
+    def sort_key(timestamp):
+        return timestamp
+
+    @staticmethod
+    def concurrent(a, b):
+        return False
+
+    @staticmethod
+    def wall_time(timestamp):
+        return None
+
+    def __str__(self):
+        return f"node[{self.node_id}] time: {self.get_time()}"
+
+
+class LockingLamportClock:
+    """The original Lamport clock: one lock around every operation (kept for comparison)"""
     def __init__(self, node_id):
         self.node_id = node_id  # unique identifier for this node
         self.clock = 0
         self.lock = threading.Lock()  # thread-safe operations
-    
+
     def increment(self):
         with self.lock:
             self.clock += 1
             return self.clock
-    
+
     def get_time(self):
         with self.lock:
             return self.clock
-    
+
     def update(self, received_timestamp):
         with self.lock:
             self.clock = max(self.clock, received_timestamp) + 1
             return self.clock
-    
+
+    def reserve(self, n):
+        with self.lock:
+            first = self.clock + 1
+            self.clock += n
+            return range(first, first + n)
+
     def get_timestamp_with_id(self):
         with self.lock:
             return (self.clock, self.node_id) # return a tuple (timestamp, node_id) for total ordering
             # if timestamps are equal, node_id breaks the tie
-    
+
+    def __str__(self):
+        return f"node[{self.node_id}] time: {self.clock}"
+
+
+class VectorClock:
+    """
+    Vector clock: one counter per node, so causality can be tested, not just ordered.
+    Timestamps are sparse {node_id: count} dicts holding only nodes that have been
+    heard from, which keeps them small when there are many nodes but few talk to us.
+    """
+    def __init__(self, node_id):
+        self.node_id = node_id
+        self._vector = {}
+        self.lock = threading.Lock()
+
+    def increment(self):
+        with self.lock:
+            self._vector[self.node_id] = self._vector.get(self.node_id, 0) + 1
+            return dict(self._vector)
+
+    def update(self, received_timestamp):
+        with self.lock:
+            vector = self._vector
+            for node, count in self.decode(received_timestamp).items():
+                if count > vector.get(node, 0):
+                    vector[node] = count
+            vector[self.node_id] = vector.get(self.node_id, 0) + 1
+            return dict(vector)
+
+    def reserve(self, n):
+        """n successive timestamps of this node in one call"""
+        if n < 1:
+            raise ValueError("n must be at least 1")
+        with self.lock:
+            start = self._vector.get(self.node_id, 0)
+            self._vector[self.node_id] = start + n
+            base = dict(self._vector)
+        return [{**base, self.node_id: start + i} for i in range(1, n + 1)]
+
+    def get_time(self):
+        with self.lock:
+            return dict(self._vector)
+
+    def get_timestamp_with_id(self):
+        return (self.get_time(), self.node_id)
+
+    @staticmethod
+    def decode(timestamp):
+        """Sparse dict from a wire timestamp (dict, [[node, count], ...], or 0/None for 'nothing seen')"""
+        if not timestamp:
+            return {}
+        if isinstance(timestamp, dict):
+            return timestamp
+        return dict(timestamp)
+
+    @classmethod
+    def sort_key(cls, timestamp):
+        # sum of entries: if a happened before b then sum(a) < sum(b)
+        return sum(cls.decode(timestamp).values())
+
+    @classmethod
+    def happened_before(cls, a, b):
+        a, b = cls.decode(a), cls.decode(b)
+        return a != b and all(count <= b.get(node, 0) for node, count in a.items())
+
+    @classmethod
+    def concurrent(cls, a, b):
+        a, b = cls.decode(a), cls.decode(b)
+        return a != b and not cls.happened_before(a, b) and not cls.happened_before(b, a)
+
+    @staticmethod
+    def wall_time(timestamp):
+        return None
+
+    def __str__(self):
+        return f"node[{self.node_id}] time: {self.get_time()}"
+
+
+class HybridLogicalClock:
+    """
+    Hybrid logical clock: physical milliseconds plus a logical counter, packed into
+    one int (wall_ms << 16 | logical) so timestamps compare, sort and serialize
+    like Lamport timestamps while staying close to real time.
+    """
+    LOGICAL_BITS = 16
+
+    def __init__(self, node_id, now=time.time):
+        self.node_id = node_id
+        self._now = now         # seconds since the epoch (injectable for tests)
+        self._last = 0
+        self.lock = threading.Lock()
+
+    def _physical(self):
+        return int(self._now() * 1000) << self.LOGICAL_BITS
+
+    def increment(self):
+        with self.lock:
+            self._last = max(self._last + 1, self._physical())
+            return self._last
+
+    def update(self, received_timestamp):
+        with self.lock:
+            self._last = max(self._last, int(received_timestamp or 0)) + 1
+            self._last = max(self._last, self._physical())
+            return self._last
+
+    def reserve(self, n):
+        if n < 1:
+            raise ValueError("n must be at least 1")
+        with self.lock:
+            first = max(self._last + 1, self._physical())
+            self._last = first + n - 1
+        return range(first, first + n)
+
+    def get_time(self):
+        with self.lock:
+            return self._last
+
+    def get_timestamp_with_id(self):
+        return (self.get_time(), self.node_id)
+
+    @staticmethod
+    def sort_key(timestamp):
+        return timestamp
+
+    @staticmethod
+    def concurrent(a, b):
+        return False
+
+    @classmethod
+    def wall_time(cls, timestamp):
+        """UTC datetime of the physical part of a timestamp"""
+        return datetime.fromtimestamp((timestamp >> cls.LOGICAL_BITS) / 1000, timezone.utc)
+
     def __str__(self):
-        return f"node[{self.node_id}] time: {self.clock}"
\ No newline at end of file
+        return f"node[{self.node_id}] time: {self.get_time()}"
+
+
+CLOCKS = {
+    "lamport": LamportClock,
+    "vector": VectorClock,
+    "hlc": HybridLogicalClock,
+}
+
+
+def create_clock(kind, node_id):
+    """Logical clock by name: "lamport" (default), "vector" or "hlc" """
+    if kind not in CLOCKS:
+        raise ValueError(f"unknown clock: {kind}")
+    return CLOCKS[kind](node_id)
@@ -0,0 +1,93 @@
+import threading
+from collections import OrderedDict
+
+
+class SongLockTable:
+    """
+    Participant-side concurrency control for 2PC.
+    A prepared transaction holds an exclusive lock on every song it touches and
+    keeps only its own operations as pending deltas (no playlist copies), so
+    transactions on different songs can prepare and commit concurrently.
+    Aborted transaction ids are remembered, so a PREPARE that arrives after its
+    own ABORT (the coordinator aborts on a timeout) votes NO instead of locking forever.
+    """
+    MAX_ABORTED = 10000     # aborted ids remembered; the oldest are forgotten first
+
+    def __init__(self):
+        self._owners = {}       # {song_id: transaction_id}
+        self._pending = {}      # {transaction_id: operations}
+        self._aborted = OrderedDict()   # {transaction_id: None}, oldest first
+        self._lock = threading.Lock()
+
+    def prepare(self, transaction_id, operations, contains):
+        """
+        Validate `operations` against the committed playlist (via contains(song_id))
+        and lock their songs. Returns (True, None) or (False, reason).
+        """
+        with self._lock:
+            if transaction_id in self._aborted:
+                return False, 'aborted'  # late PREPARE: the ABORT got here first
+            if transaction_id in self._pending:
+                return True, None  # duplicate PREPARE
+            present = {}        # membership after applying the earlier operations of this batch
+            for op in operations:
+                song_id = op['song_id']
+                owner = self._owners.get(song_id)
+                if owner is not None and owner != transaction_id:
+                    return False, 'locked'
+                in_playlist = present[song_id] if song_id in present else contains(song_id)
+                if op['operation'] == 'add':
+                    if in_playlist:
+                        return False, 'duplicate'
+                    present[song_id] = True
+                elif op['operation'] == 'remove':
+                    if not in_playlist:
+                        return False, 'not_found'
+                    present[song_id] = False
+                else:
+                    return False, 'invalid_operation'
+            self._acquire(transaction_id, operations)
+            return True, None
+
+    def restore(self, transaction_id, operations):
+        """Re-acquire locks for a transaction that was prepared before a restart"""
+        with self._lock:
+            self._acquire(transaction_id, operations)
+
+    def _acquire(self, transaction_id, operations):
+        for op in operations:
+            self._owners[op['song_id']] = transaction_id
+        self._pending[transaction_id] = operations
+
+    def release(self, transaction_id):
+        """Drop the transaction's locks and return its pending operations (None if unknown)"""
+        with self._lock:
+            return self._release(transaction_id)
+
+    def abort(self, transaction_id):
+        """Release like release() and remember the id, so a later PREPARE for it votes NO"""
+        with self._lock:
+            self._aborted[transaction_id] = None
+            if len(self._aborted) > self.MAX_ABORTED:
+                self._aborted.popitem(last=False)
+            return self._release(transaction_id)
+
+    def _release(self, transaction_id):
+        operations = self._pending.pop(transaction_id, None)
+        for op in operations or ():
+            if self._owners.get(op['song_id']) == transaction_id:
+                del self._owners[op['song_id']]
+        return operations
+
+    def get(self, transaction_id):
+        """Pending operations of a prepared transaction (None if it holds no locks)"""
+        with self._lock:
+            return self._pending.get(transaction_id)
+
+    def is_locked(self, song_id):
+        with self._lock:
+            return song_id in self._owners
+
+    def pending_transactions(self):
+        with self._lock:
+            return dict(self._pending)
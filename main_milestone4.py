@@ -1,29 +1,65 @@
-from client import Client
-from server import Server
-from coordinator_2pc import TwoPhaseCommitCoordinator
-from notifications import Notifications
-from music_player import MusicPlayer
-import pika  # for catching AMQP errors
+from catalog import load_catalog
+from contextlib import contextmanager
+from health import wait_until_ready
 import threading
 import time
 import sys
 
+# M4: client, server, coordinator, notifications, pika and pygame are imported on
+# first use, so the menu comes up without paying for subsystems not used yet.
+
+
+PAGE_SIZE = 20  # songs per page when browsing the catalog
+READY_TIMEOUT = 10.0  # seconds to wait for the server / coordinator health probes
+
+
+class StartupTimer:
+    """Wall time of each startup phase, printed once the menu is ready"""
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []  # [(name, seconds)]
+
+    @contextmanager
+    def phase(self, name):
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - began))
+
+    def report(self):
+        total = time.perf_counter() - self.started
+        parts = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases)
+        print(f"[STARTUP] ready in {total * 1000:.0f} ms ({parts})")
+
 
-SONGS = {
-    "1": {"title": "Cruel Summer", "artist": "Taylor Swift", "file": "songs/cruel_summer.mp3"},
-    "2": {"title": "Box Breathing", "artist": "Sorry Ghost", "file": "songs/box_breathing.mp3"},
-    "3": {"title": "Lover", "artist": "Taylor Swift", "file": "songs/lover.mp3"},
-    "4": {"title": "Golden", "artist": "HUNTRX", "file": "songs/golden.mp3"},
-    "5": {"title": "To The Creatures", "artist": "Sorry Ghost", "file": "songs/to_the_creatures.mp3"},
-    "6": {"title": "Take Down", "artist": "HUNTRX", "file": "songs/take_down.mp3"},
-    "7": {"title": "How It's Done", "artist": "HUNTRX", "file": "songs/how_its_done.mp3"},
-}
 class MusicApp:
-    def __init__(self, client_id):
+    def __init__(self, client_id, server_engine="threaded", broker="pika", clock="lamport", codec="json",
+                 catalog_path=None, audio="pygame"):
+        self.startup = StartupTimer()
         self.client_id = client_id
-        self.music_player = MusicPlayer()
+        with self.startup.phase("catalog"):
+            self.catalog = load_catalog(catalog_path)  # indexed song catalog (catalog.csv by default)
+        self.server_engine = server_engine
+        self.broker = broker
+        self.clock = clock
+        self.codec = codec
+        self.audio = audio  # "null" simulates playback (no sound device)
+        self._music_player = None
+        self._music_player_lock = threading.Lock()
         self.server = None
+        self.coordinator = None
         self.client = None
+
+    @property
+    def music_player(self):
+        """The MusicPlayer, created (and pygame imported) on first use"""
+        if self._music_player is None:
+            with self._music_player_lock:
+                if self._music_player is None:
+                    from music_player import MusicPlayer
+                    self._music_player = MusicPlayer(backend=self.audio)
+        return self._music_player
         
     def display_menu(self):
         print("\n" + "="*50)
@@ -34,6 +70,8 @@ class MusicApp:
         print("1.1. Pause a song")
         print("1.2. Resume a song")
         print("1.3. Stop a song")
+        print("1.4. Play my playlist")
+        print("1.5. Next track")
 
         print("_"*50)
         print("PLAYLIST MANAGEMENT:")
@@ -46,17 +84,38 @@ class MusicApp:
         print("3. Quit")
         print("="*50)
         
-    def display_songs(self):
-        print("\n📀 Available Songs:")
-        for key, song in SONGS.items():
-            in_playlist = "✓" if key in self.client.playlist else " "
-            print(f"[{in_playlist}] {key}. {song['title']} - {song['artist']}")
+    def display_songs(self, page=0, songs=None):
+        """Show one page of the catalog (or a list of search results)"""
+        pages = self.catalog.page_count(PAGE_SIZE)
+        if songs is None:
+            songs = self.catalog.page(page, PAGE_SIZE)
+            print(f"\n📀 Available Songs (page {page + 1}/{pages}):")
+        else:
+            print(f"\n🔎 {len(songs)} matching songs:")
+        for song in songs:
+            in_playlist = "✓" if song["id"] in self.client.playlist else " "
+            print(f"[{in_playlist}] {song['id']}. {song['title']} - {song['artist']}")
+        if pages > 1:
+            print("(n = next page, p = previous page, /words = search)")
+
+    def choose_song(self, prompt):
+        """Page/search through the catalog until the user enters a song id"""
+        page = 0
+        self.display_songs(page)
+        while True:
+            choice = input(prompt).strip()
+            if choice in ("n", "p"):
+                page = min(max(page + (1 if choice == "n" else -1), 0), self.catalog.page_count(PAGE_SIZE) - 1)
+                self.display_songs(page)
+            elif choice.startswith("/"):
+                self.display_songs(songs=self.catalog.search(choice[1:], limit=PAGE_SIZE))
+            else:
+                return choice
         
     def play_song(self):
-        self.display_songs()
-        choice = input("\nEnter song number: ").strip()
+        choice = self.choose_song("\nEnter song number: ")
         
-        song = SONGS[choice]
+        song = self.catalog[choice]
         song_request = f"{song['title']} - {song['artist']}"
             
         # Send request to server via IPC (with Lamport timestamp)
@@ -65,14 +124,41 @@ class MusicApp:
         
         # Play song
         self.music_player.play_song(song['file'], song['title'], song['artist'])
+        self.preload_upcoming(choice)
+
+    def play_playlist(self):
+        """Play the whole playlist back to back (shuffle / repeat optional)"""
+        if not self.client.playlist:
+            print("\n⚠️  Your playlist is empty!")
+            return
+        shuffle = input("Shuffle? (y/n): ").strip().lower() == "y"
+        repeat = input("Repeat (off/all/one) [off]: ").strip().lower() or "off"
+        if repeat not in self.music_player.queue.REPEAT_MODES:
+            print("Invalid repeat mode!")
+            return
+
+        songs = [self.catalog[song_id] for song_id in self.client.playlist if song_id in self.catalog]
+        self.music_player.queue.on_track = lambda file_path, title, artist: print(f"\n▶️  Now Playing: {title} by {artist}")
+        self.music_player.play_playlist([(song['file'], song['title'], song['artist']) for song in songs],
+                                        shuffle=shuffle, repeat=repeat)
+
+    def preload_upcoming(self, song_id=None):
+        """Decode the playlist entries after song_id (or the first ones) in the background"""
+        if not self.client or not self.client.playlist:
+            return
+        playlist = self.client.playlist.to_list()  # snapshot: 2PC commits may change it meanwhile
+        start = playlist.index(song_id) + 1 if song_id in playlist else 0
+        upcoming = playlist[start:start + self.music_player.prefetch_count]
+        self.music_player.preload([self.catalog[s]['file'] for s in upcoming if s in self.catalog])
             
 
     def add_to_playlist(self):
-        self.display_songs()
-        choice = input("\nEnter song number to add: ").strip()
-        song = SONGS[choice]
+        choice = self.choose_song("\nEnter song number to add: ")
+        song = self.catalog[choice]
         
         self.client.add_song(choice)
+        # M4: decode it now so playing it later starts from memory
+        self.music_player.preload([song['file']])
             
     def remove_from_playlist(self):
         if not self.client.playlist:
@@ -80,15 +166,16 @@ class MusicApp:
             return
             
         print("\n🎵 Your Playlist:")
-        for i, song_id in enumerate(self.client.playlist, 1):
-            song = SONGS[song_id]
+        playlist = self.client.playlist.to_list()  # numbers refer to the list as shown
+        for i, song_id in enumerate(playlist, 1):
+            song = self.catalog[song_id]
             print(f"{i}. {song['title']} - {song['artist']}")
             
         choice = input("\nEnter song number to remove: ").strip()
         
-        if choice.isdigit() and 1 <= int(choice) <= len(self.client.playlist):
-            song_id = self.client.playlist[int(choice) - 1]
-            song = SONGS[song_id]
+        if choice.isdigit() and 1 <= int(choice) <= len(playlist):
+            song_id = playlist[int(choice) - 1]
+            song = self.catalog[song_id]
             self.client.remove_song(song_id)            
             
     def view_playlist(self):
@@ -99,7 +186,7 @@ class MusicApp:
         print(f"\n🎵 {self.client_id}'s Playlist:")
         print("-" * 50)
         for i, song_id in enumerate(self.client.playlist, 1):
-            song = SONGS[song_id]
+            song = self.catalog[song_id]
             print(f"{i}. {song['title']} - {song['artist']}")
         print("-" * 50)
         print(f"Total songs: {len(self.client.playlist)}")
@@ -110,17 +197,24 @@ class MusicApp:
         # Only CLIENT_1 starts the server and coordinator
         if self.client_id == "CLIENT_1":
             # Start music server
-            self.server = Server(port=5001)
-            self.server.start()
-            time.sleep(0.5)
+            with self.startup.phase("server"):
+                from server import create_server
+                self.server = create_server(self.server_engine, port=5001, clock=self.clock, catalog=self.catalog)
+                self.server.start()
             
             # Start 2PC coordinator
-            self.coordinator = TwoPhaseCommitCoordinator(port=5002)
-            self.coordinator.start()
-            time.sleep(0.5)  # Give coordinator time to start
-        else:
-            # Other clients just wait for server/coordinator to be ready
-            time.sleep(1.0)
+            with self.startup.phase("coordinator"):
+                from coordinator_2pc import TwoPhaseCommitCoordinator
+                self.coordinator = TwoPhaseCommitCoordinator(port=5002, clock=self.clock, codec=self.codec)
+                self.coordinator.start()
+
+        # Wait until the server and coordinator answer their health probes
+        with self.startup.phase("health probes"):
+            for name, port in (("server", 5001), ("coordinator", 5002)):
+                try:
+                    wait_until_ready("localhost", port, timeout=READY_TIMEOUT)
+                except TimeoutError as e:
+                    print(f"⚠️  {name} not ready: {e}")
         
         # Create subscribe artist list based on client_id
         if self.client_id == "CLIENT_1":
@@ -131,32 +225,56 @@ class MusicApp:
             subscribed_artists = ["Sorry Ghost"]
         
         # Use node_id for Lamport timestamps
-        self.client = Client(
-            node_id=self.client_id,  # Use node_id for Lamport compatibility
-            server_host="localhost",
-            server_port=5001,
-            fav_artist_list=subscribed_artists,
-            coordinator_host='localhost',
-            coordinator_port=5002
-        )
-        self.client.receive_notification(self.client.subscription)
+        with self.startup.phase("client"):
+            from client import Client
+            self.client = Client(
+                node_id=self.client_id,  # Use node_id for Lamport compatibility
+                server_host="localhost",
+                server_port=5001,
+                fav_artist_list=subscribed_artists,
+                coordinator_host='localhost',
+                coordinator_port=5002,
+                persistent_connection=True,  # one socket for every song request in this session
+                notification_transport=self._transport(),
+                clock=self.clock,
+                codec=self.codec
+            )
+        with self.startup.phase("subscribe"):
+            self.client.receive_notification(self.client.subscription)  # returns once the queue is bound
         
-        # Publish notifications to client 
+        # Publish notifications to client in the background; the menu doesn't wait for them
+        threading.Thread(target=self.publish_updates, name="PUBLISH", daemon=True).start()
+        # Import pygame and open the audio device while the user reads the menu
+        threading.Thread(target=lambda: self.music_player, name="AUDIO-INIT", daemon=True).start()
+
+    def publish_updates(self):
+        """Publish the artist updates as one batch (the broker confirms them together)"""
+        from notifications import Notifications
+        from transport import is_connection_error
         try:
-            time.sleep(0.5)
-            notifications = Notifications("localhost")
+            notifications = Notifications("localhost", transport=self._transport(), clock=self.clock,
+                                          codec=self.codec)
             print("\n[NOTIFICATIONS] Publishing artist updates...")
-            notifications.publish_artist_message("Taylor Swift", "New album 'Midnights' released!")
-            time.sleep(0.2)
-            notifications.publish_artist_message("Sorry Ghost", "New single 'Echo' out now!")
-            time.sleep(0.2)
-            notifications.publish_artist_message("HUNTRX", "World tour announced for 2025!")
-        except pika.exceptions.AMQPConnectionError:
-            pass
+            notifications.publish_many([
+                ("Taylor Swift", "New album 'Midnights' released!"),
+                ("Sorry Ghost", "New single 'Echo' out now!"),
+                ("HUNTRX", "World tour announced for 2025!"),
+            ])
+        except Exception as e:
+            if not is_connection_error(e):
+                raise
             
+    def _transport(self):
+        """None keeps the default RabbitMQ connection; otherwise an in-process broker"""
+        if self.broker == "pika":
+            return None
+        from transport import create_transport
+        return create_transport(self.broker)
+
     def run(self):
         print(f"\n🎵 Welcome to Distributed Music Player - {self.client_id}! 🎵")
         self.initialize_services()
+        self.startup.report()
         
         while True:
             self.display_menu()
@@ -170,6 +288,10 @@ class MusicApp:
                 self.music_player.resume()
             elif choice == "1.3":
                 self.music_player.stop()
+            elif choice == "1.4":
+                self.play_playlist()
+            elif choice == "1.5":
+                self.music_player.next_track()
         
             elif choice == "2":
                 self.view_playlist()
@@ -180,8 +302,9 @@ class MusicApp:
 
             elif choice == "3":
                 print(f"\n👋 Goodbye from {self.client_id}!")
-                self.music_player.stop()
-                self.music_player.cleanup()
+                if self._music_player is not None:
+                    self._music_player.stop()
+                    self._music_player.cleanup()
                 self.client.close()
                 if self.coordinator:
                     self.coordinator.stop()
@@ -192,26 +315,37 @@ class MusicApp:
                 print("Invalid choice!")
 
 
-def run_lamport_demo():
+def run_lamport_demo(server_engine="threaded", broker="pika", clock="lamport", codec="json"):
     print("=" * 70)
     print("DISTRIBUTED MUSIC SYSTEM - LAMPORT TIMESTAMP DEMO")
     print("=" * 70)
     
     # start server first
+    from server import create_server
+    from client import Client
+    from notifications import Notifications
+    from transport import create_transport, is_connection_error
+
     print("\n[SETUP] Starting server...")
-    server = Server(port=5001)
+    catalog = load_catalog()
+    server = create_server(server_engine, port=5001, clock=clock, catalog=catalog)
     server.start()
-    time.sleep(0.5)  # give server time to start
+    wait_until_ready("localhost", 5001, timeout=READY_TIMEOUT)
     
     # create multiple clients to demonstrate concurrent requests
     print("\n[SETUP] Creating clients...")
+    # --broker=inprocess: all clients and the publisher share one in-process exchange
+    transport = None if broker == "pika" else create_transport(broker)
     
     # client 1 - likes Taylor Swift and Sorry Ghost
     client1 = Client(
         node_id="CLIENT_1",
         server_host="localhost",
         server_port=5001,
-        fav_artist_list=["Taylor Swift", "Sorry Ghost"]
+        fav_artist_list=["Taylor Swift", "Sorry Ghost"],
+        notification_transport=transport,
+        clock=clock,
+        codec=codec
     )
     
     # client 2 - likes HUNTRX and Taylor Swift
@@ -219,7 +353,10 @@ def run_lamport_demo():
         node_id="CLIENT_2",
         server_host="localhost",
         server_port=5001,
-        fav_artist_list=["HUNTRX", "Taylor Swift"]
+        fav_artist_list=["HUNTRX", "Taylor Swift"],
+        notification_transport=transport,
+        clock=clock,
+        codec=codec
     )
     
     # client 3 - likes Sorry Ghost
@@ -227,29 +364,31 @@ def run_lamport_demo():
         node_id="CLIENT_3",
         server_host="localhost",
         server_port=5001,
-        fav_artist_list=["Sorry Ghost"]
+        fav_artist_list=["Sorry Ghost"],
+        notification_transport=transport,
+        clock=clock,
+        codec=codec
     )
     
     # start notif listeners for all clients
     print("\n[SETUP] starting notification listeners...")
     client1.receive_notification(client1.subscription)
     client2.receive_notification(client2.subscription)
-    client3.receive_notification(client3.subscription)
-    time.sleep(0.5)
+    client3.receive_notification(client3.subscription)  # queues are bound when these return
     
     # publish artist updates with timestamps
     print("\n" + "=" * 70)
     print("PHASE 1: PUBLISHING ARTIST UPDATES (with Lamport timestamps)")
     print("=" * 70)
     try:
-        notifications = Notifications("localhost")
+        notifications = Notifications("localhost", transport=transport, clock=clock, codec=codec)
         notifications.publish_artist_message("Taylor Swift", "New album 'Midnights' released!")
-        time.sleep(0.2)
         notifications.publish_artist_message("Sorry Ghost", "New single 'Echo' out now!")
-        time.sleep(0.2)
         notifications.publish_artist_message("HUNTRX", "World tour announced for 2025!")
         time.sleep(1)  # Let notifications propagate
-    except pika.exceptions.AMQPConnectionError as e:
+    except Exception as e:
+        if not is_connection_error(e):
+            raise
         print(f"(skipping publish – RabbitMQ not available: {e})")
     
     # demonstrate concurrent song requests with lamport ordering
@@ -262,7 +401,7 @@ def run_lamport_demo():
     def client_request(client, song_id, delay=0):
         if delay > 0:
             time.sleep(delay)
-        song = SONGS[song_id]
+        song = catalog[song_id]
         song_str = f"{song['title']} - {song['artist']}"
         client.song_request(song_str)
     
@@ -321,13 +460,26 @@ def run_lamport_demo():
 
 
 def main():    
+    # Optional: --engine=asyncio runs the song server on a single event loop
+    #           --broker=inprocess replaces RabbitMQ with an in-process topic exchange
+    #           --clock=vector|hlc swaps the Lamport clock for a vector / hybrid logical clock
+    #           --codec=binary sends compact binary messages instead of JSON
+    #           --audio=null simulates playback without a sound device (headless / load tests)
+    options = dict(a[2:].split("=", 1) for a in sys.argv[1:] if a.startswith("--") and "=" in a)
+    args = [a for a in sys.argv[1:] if not (a.startswith("--") and "=" in a)]
+    server_engine = options.get("engine", "threaded")
+    broker = options.get("broker", "pika")
+    clock = options.get("clock", "lamport")
+    codec = options.get("codec", "json")
+    audio = options.get("audio", "pygame")
+
     # User picks to run the Lamport demo or menu 
-    if len(sys.argv) > 1 and sys.argv[1] == "--demo":
-        run_lamport_demo()
+    if args and args[0] == "--demo":
+        run_lamport_demo(server_engine, broker, clock, codec)
     else:
         # Menu options
-        client_id = sys.argv[1] if len(sys.argv) > 1 else "CLIENT_1"
-        app = MusicApp(client_id)
+        client_id = args[0] if args else "CLIENT_1"
+        app = MusicApp(client_id, server_engine, broker, clock, codec, audio=audio)
         app.run()
 
 if __name__ == "__main__":
@@ -1,51 +1,522 @@
-import pygame
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from audio_backend import create_backend
+
+
+class AudioCache:
+    """
+    LRU cache of decoded songs (backend Sound objects) bounded by a byte budget.
+    A background thread decodes prefetched files ahead of time, so playing a
+    cached song starts without touching the disk or the decoder.
+    """
+    def __init__(self, backend, budget_bytes=256 * 1024 * 1024):
+        self.backend = backend
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()   # {file_path: (sound, size in bytes)}, least recently used first
+        self._bytes = 0
+        self._loading = {}              # {file_path: Event} decodes in progress
+        self._lock = threading.Lock()
+        self._pending = deque()         # files waiting for the prefetch thread
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+        self._closed = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, file_path):
+        """Decoded song, from the cache or decoded now (waits for an in-flight prefetch)"""
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry is not None:
+                self._entries.move_to_end(file_path)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        return self._load(file_path)
+
+    def __contains__(self, file_path):
+        with self._lock:
+            return file_path in self._entries
+
+    def prefetch(self, file_paths):
+        """Queue files for background decoding (already cached or queued ones are skipped)"""
+        with self._lock:
+            if self._closed:
+                return
+            for file_path in file_paths:
+                if file_path not in self._entries and file_path not in self._loading \
+                        and file_path not in self._pending:
+                    self._pending.append(file_path)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._prefetch_loop, name="PREFETCH", daemon=True)
+                self._thread.start()
+            self._wakeup.notify()
+
+    def _prefetch_loop(self):
+        while True:
+            with self._lock:
+                self._wakeup.wait_for(lambda: self._pending or self._closed)
+                if self._closed:
+                    return
+                file_path = self._pending.popleft()
+            try:
+                self._load(file_path)
+            except Exception as e:  # missing file, unsupported format...
+                print(f"[PLAYER] could not preload {file_path}: {e}")
+
+    def _load(self, file_path):
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry is not None:
+                return entry[0]
+            loading = self._loading.get(file_path)
+            if loading is None:
+                self._loading[file_path] = threading.Event()
+        if loading is not None:
+            # someone else is decoding it: wait and use their result
+            loading.wait()
+            with self._lock:
+                entry = self._entries.get(file_path)
+            return entry[0] if entry is not None else self._load(file_path)
+
+        try:
+            sound = self.backend.load(file_path)
+            self._insert(file_path, sound)
+        finally:
+            with self._lock:
+                done = self._loading.pop(file_path)
+            done.set()
+        return sound
+
+    def _insert(self, file_path, sound):
+        size = self.backend.decoded_size(sound)
+        with self._lock:
+            if size > self.budget_bytes:
+                return  # never fits; play it uncached
+            while self._bytes + size > self.budget_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+            self._entries[file_path] = (sound, size)
+            self._bytes += size
+
+    def stats(self):
+        with self._lock:
+            return {"songs": len(self._entries), "bytes": self._bytes, "budget_bytes": self.budget_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._pending.clear()
+            self._entries.clear()
+            self._bytes = 0
+            self._wakeup.notify_all()
+
+
+class PlaybackQueue:
+    """
+    Plays a list of tracks back to back. Each track is a decoded Sound from the
+    player's cache; the next one is queued on the same mixer channel
+    (Channel.queue) while the current one plays, so the mixer switches tracks
+    itself without a gap. A single thread sleeps until the current track's end
+    (known from its length) to queue the one after, instead of polling get_busy().
+    Tracks the backend cannot decode into memory are streamed through its music
+    player and checked every STREAM_CHECK seconds, without the gapless switch.
+    """
+    REPEAT_MODES = ("off", "all", "one")
+    STREAM_CHECK = 0.25  # seconds between end checks for streamed tracks
+    RESYNC = 0.005       # re-check delay when the mixer has not switched yet
+
+    def __init__(self, player, on_track=None):
+        self.player = player
+        self.on_track = on_track      # on_track(file_path, title, artist) when a track starts
+        self.tracks = []              # [(file_path, title, artist)]
+        self.shuffle = False
+        self.repeat = "off"
+        self.transitions = []         # seconds between a track's end and the queue noticing it
+        self._order = []              # play order: indexes into tracks
+        self._position = None         # position in _order of the current track
+        self._queued = None           # position in _order of the track queued behind it
+        self._queued_sound = None
+        self._sound = None            # Sound playing (None when streaming)
+        self._ends_at = None          # time.monotonic() when the current track should end
+        self._deadline = None         # when the playback thread next wakes up (None: paused/idle)
+        self._remaining = None        # seconds left in the current track while paused
+        self._generation = 0          # bumped by play/stop/skip so stale queueing is dropped
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    @property
+    def active(self):
+        return self._position is not None
+
+    def play(self, tracks, shuffle=False, repeat="off", start=0):
+        """Start playing tracks from tracks[start]"""
+        if repeat not in self.REPEAT_MODES:
+            raise ValueError(f"unknown repeat mode: {repeat}")
+        with self._cond:
+            self.tracks = list(tracks)
+            self.repeat = repeat
+            self.shuffle = shuffle
+            if not self.tracks:
+                self._reset()
+                return
+            self._order = list(range(len(self.tracks)))
+            if shuffle:
+                self._shuffle_after(start)
+            position = self._order.index(start)
+        self._start(position)
+
+    def skip(self):
+        """Jump to the next track (even in repeat-one mode)"""
+        with self._cond:
+            if self._position is None:
+                return
+            position = self._following(self._position, skipping=True)
+        if position is None:
+            self.stop()
+        else:
+            self._start(position)
+
+    def previous(self):
+        with self._cond:
+            if self._position is None:
+                return
+            position = max(self._position - 1, 0)
+        self._start(position)
+
+    def set_shuffle(self, shuffle):
+        """Shuffle (or restore the order of) the tracks after the current one"""
+        with self._cond:
+            self.shuffle = shuffle
+            if self._position is None:
+                return
+            current = self._order[self._position]
+            if shuffle:
+                self._shuffle_after(current)
+            else:
+                self._order = list(range(len(self.tracks)))
+            self._position = self._order.index(current)
+            generation = self._generation
+        self._queue_following(generation)
+
+    def set_repeat(self, repeat):
+        if repeat not in self.REPEAT_MODES:
+            raise ValueError(f"unknown repeat mode: {repeat}")
+        with self._cond:
+            self.repeat = repeat
+            if self._position is None:
+                return
+            generation = self._generation
+        self._queue_following(generation)
+
+    def pause(self):
+        with self._cond:
+            if self._deadline is not None:
+                self._remaining = max(self._ends_at - time.monotonic(), 0.0)
+                self._deadline = None
+
+    def resume(self):
+        with self._cond:
+            if self._remaining is not None:
+                self._ends_at = self._deadline = time.monotonic() + self._remaining
+                self._remaining = None
+                self._cond.notify()
+
+    def stop(self):
+        """Stop following the queue (the caller stops the audio)"""
+        with self._cond:
+            self._reset()
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._reset()
+            self._closed = True
+            self._cond.notify()
+
+    def _reset(self):
+        self._generation += 1
+        self._position = self._queued = None
+        self._sound = self._queued_sound = None
+        self._ends_at = self._deadline = self._remaining = None
+
+    def _shuffle_after(self, first):
+        """Random order that starts with tracks[first]"""
+        rest = [i for i in range(len(self.tracks)) if i != first]
+        random.shuffle(rest)
+        self._order = [first] + rest
+
+    def _following(self, position, skipping=False):
+        """Position played after position, or None at the end of the queue"""
+        if self.repeat == "one" and not skipping:
+            return position
+        if position + 1 < len(self._order):
+            return position + 1
+        if self.repeat == "off":
+            return None
+        return 0
+
+    def _load(self, position):
+        """Decoded Sound for the track at position (None if it can only be streamed)"""
+        file_path = self.tracks[self._order[position]][0]
+        try:
+            return self.player.cache.get(file_path)
+        except self.player.backend.error:
+            return None
+
+    def _start(self, position, expected=None):
+        """Play the track at position. With `expected`, only if no play/stop/skip happened since."""
+        with self._cond:
+            if expected is not None and expected != self._generation:
+                return
+            self._generation += 1
+            generation = self._generation
+        sound = self._load(position)
+        file_path, title, artist = self.tracks[self._order[position]]
+        with self._cond:
+            if generation != self._generation:
+                return
+            channel = self.player._start_playback(file_path, sound)
+            self._position = position
+            self._sound = sound
+            self._queued = self._queued_sound = None
+            self._remaining = None
+            if sound is not None and channel is not None:
+                self._ends_at = self._deadline = time.monotonic() + sound.get_length()
+            else:
+                self._ends_at = self._deadline = time.monotonic() + self.STREAM_CHECK
+            self._ensure_thread()
+            self._cond.notify()
+        self.player._now_playing(file_path, title, artist)
+        if self.on_track:
+            self.on_track(file_path, title, artist)
+        self._queue_following(generation)
+
+    def _queue_following(self, generation):
+        """Queue the next track behind the current one and preload the ones after it"""
+        with self._cond:
+            if generation != self._generation or self._position is None:
+                return
+            following = self._following(self._position)
+            upcoming = []
+            position = following
+            while position is not None and len(upcoming) < self.player.prefetch_count:
+                upcoming.append(self.tracks[self._order[position]][0])
+                position = self._following(position)
+                if position == following:
+                    break
+        self.player.preload(upcoming)
+        if following is None:
+            with self._cond:
+                if generation == self._generation:
+                    self._queued = self._queued_sound = None
+            return
+        sound = self._load(following)   # usually already cached by an earlier preload
+        with self._cond:
+            if generation != self._generation:
+                return
+            self._queued = following
+            self._queued_sound = sound
+            channel = self.player._channel
+            if sound is not None and self._sound is not None and channel is not None:
+                channel.queue(sound)
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="PLAYBACK", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if self._deadline is None:
+                        self._cond.wait()
+                        continue
+                    remaining = self._deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._closed:
+                    return
+                advance = self._track_ended()
+            if advance is not None:
+                self._advanced(*advance)
+
+    def _track_ended(self):
+        """At the current track's deadline: work out what the mixer did (called with the lock held)"""
+        now = time.monotonic()
+        channel = self.player._channel
+        if self._sound is None:
+            # streamed track: the mixer cannot tell us its length, so check periodically
+            if self.player._is_playing():
+                self._deadline = now + self.STREAM_CHECK
+                return None
+            if self._queued is None:
+                self._finish()
+                return None
+            self._deadline = None
+            return ("restart", self._queued, self._generation)
+        if channel is not None and channel.get_busy() and (self._queued_sound is None or channel.get_queue() is not None):
+            # our timer ran a little ahead of the mixer: look again shortly
+            self._deadline = now + self.RESYNC
+            return None
+        if self._queued is None:
+            self._finish()
+            return None
+        if self._queued_sound is None or channel is None or not channel.get_busy():
+            # the next track was not queued on the channel (streamed, or queued too late)
+            self._deadline = None
+            return ("restart", self._queued, self._generation)
+        # gapless switch done by the mixer: take the queued track as current
+        self.transitions.append(now - self._ends_at)
+        # after a re-check the switch happened within the last RESYNC seconds
+        switched_at = self._ends_at if self._deadline == self._ends_at else now
+        self._position = self._queued
+        self._sound = self._queued_sound
+        self._queued = self._queued_sound = None
+        self._ends_at = self._deadline = switched_at + self._sound.get_length()
+        return ("switched", self._position, self._generation)
+
+    def _advanced(self, kind, position, generation):
+        if kind == "restart":
+            # stop()/play()/close() may have run since _run let go of the lock
+            self._start(position, expected=generation)
+            return
+        with self._cond:
+            if generation != self._generation:
+                return
+            file_path, title, artist = self.tracks[self._order[position]]
+        self.player._now_playing(file_path, title, artist)
+        if self.on_track:
+            self.on_track(file_path, title, artist)
+        self._queue_following(generation)
+
+    def _finish(self):
+        self._reset()
+        self.player._now_playing(None, None, None)
+
 
 class MusicPlayer:
-    def __init__(self):
-        """ Initialize pygame mixer for music playback """
-        pygame.mixer.init()
+    def __init__(self, cache_bytes=256 * 1024 * 1024, prefetch_count=3, backend="pygame"):
+        """ Initialize the audio backend ("pygame", "null" or a backend object) for music playback """
+        self.backend = create_backend(backend) if isinstance(backend, str) else backend
         self.current_song = None
         self.current_artist = None
         self.current_file = None
         self.volume = 0.7  # Default volume (0.0 to 1.0)
-        pygame.mixer.music.set_volume(self.volume)
-        
+        self.backend.music.set_volume(self.volume)
+        # decoded songs kept in memory (LRU within cache_bytes) and preloaded ahead of play
+        self.cache = AudioCache(self.backend, cache_bytes)
+        self.prefetch_count = prefetch_count  # how many upcoming songs to preload
+        self._channel = None  # channel playing a cached Sound (None when streaming via mixer.music)
+        self.queue = PlaybackQueue(self)  # gapless playlist playback
+
 
     def play_song(self, file_path, title, artist):
         """ Play a song from the given file path"""
-        pygame.mixer.music.load(file_path)
-        pygame.mixer.music.play()
-        
+        self.queue.stop()
+        try:
+            sound = self.cache.get(file_path)
+        except self.backend.error:
+            sound = None  # the mixer cannot decode it into memory: stream it instead
+
+        self._start_playback(file_path, sound)
+        self._now_playing(file_path, title, artist)
+        return f"\n▶️  Now Playing: {title} by {artist}"
+
+
+    def play_playlist(self, tracks, shuffle=False, repeat="off"):
+        """ Play (file_path, title, artist) tracks back to back; repeat is "off", "all" or "one" """
+        self.queue.play(tracks, shuffle=shuffle, repeat=repeat)
+
+
+    def next_track(self):
+        """ Skip to the next track of the playlist being played """
+        if self.queue.active:
+            self.queue.skip()
+        else:
+            print("⚠️  No playlist is playing")
+
+
+    def _start_playback(self, file_path, sound):
+        """Stop what is playing and start sound (or stream file_path); returns the channel used"""
+        self._stop_playback()
+        if sound is not None:
+            self._channel = sound.play()
+            if self._channel is not None:
+                self._channel.set_volume(self.volume)
+        else:
+            self.backend.music.load(file_path)
+            self.backend.music.play()
+        return self._channel
+
+
+    def _now_playing(self, file_path, title, artist):
         self.current_song = title
         self.current_artist = artist
         self.current_file = file_path
-        return f"\n▶️  Now Playing: {title} by {artist}"           
-            
+
+
+    def preload(self, file_paths):
+        """ Decode upcoming songs in the background (at most prefetch_count of them) """
+        self.cache.prefetch(list(file_paths)[:self.prefetch_count])
+
+
+    def _is_playing(self):
+        if self._channel is not None:
+            return self._channel.get_busy()
+        return self.backend.music.get_busy()
+
+
+    def _stop_playback(self):
+        if self._channel is not None:
+            self._channel.stop()
+            self._channel = None
+        self.backend.music.stop()
+
 
     def pause(self):
         """ Pause the currently playing song """
-        if pygame.mixer.music.get_busy():
-            pygame.mixer.music.pause()
+        if self._is_playing():
+            if self._channel is not None:
+                self._channel.pause()
+            else:
+                self.backend.music.pause()
+            self.queue.pause()
             print("⏸️  Paused")
         else:
             print("⚠️  No song is currently playing")
-            
+
 
     def resume(self):
         """ Resume the paused song """
-        pygame.mixer.music.unpause()
+        if self._channel is not None:
+            self._channel.unpause()
+        else:
+            self.backend.music.unpause()
+        self.queue.resume()
         print("▶️  Resumed")
-        
+
 
     def stop(self):
         """ Stop playing the current song """
-        pygame.mixer.music.stop()
+        self.queue.stop()
+        self._stop_playback()
         print("⏹️  Stopped")
         self.current_song = None
         self.current_artist = None
         self.current_file = None
-    
-        
+
+
     def cleanup(self):
-        """ Clean up pygame mixer """
-        pygame.mixer.quit()
\ No newline at end of file
+        """ Clean up the audio backend """
+        self.queue.close()
+        self.cache.close()
+        self.backend.quit()
@@ -1,54 +1,88 @@
 from client import Client 
-import pika #RabbitMQ
-import json 
+from codec import get_codec  # JSON (default) or compact binary message bodies
+from collections import namedtuple
 from datetime import datetime, timezone
-from lamport_clock import LamportClock #lamport clock
+from lamport_clock import create_clock #lamport clock (or vector / hybrid logical clock)
+from transport import PikaTransport  # default notification transport (RabbitMQ)
+
+# outcome of one message sent through Notifications.publish_many
+PublishResult = namedtuple("PublishResult", ["artist", "routing_key", "lamport_timestamp", "acked"])
 
 class Notifications:
     EXCHANGE_NAME = "artist_update"
     EXCHANGE_TYPE = "topic"      # topic because the routing key is based on artist name
     
-    # Connect to RabbitMQ broker and define exchange 
-    def __init__(self, host: str= "localhost"):
-        params = pika.ConnectionParameters(host)
-        self.connection = pika.BlockingConnection(params)
-        self.channel = self.connection.channel()
-
-        self.channel.exchange_declare(exchange=self.EXCHANGE_NAME, exchange_type=self.EXCHANGE_TYPE)
+    # Connect to RabbitMQ broker (or another transport) and define exchange 
+    def __init__(self, host: str= "localhost", transport=None, clock: str = "lamport", codec: str = "json"):
+        self.transport = transport or PikaTransport(host)
+        self.transport.declare_exchange(self.EXCHANGE_NAME, self.EXCHANGE_TYPE)
+        self.codec = get_codec(codec)   # subscribers detect the codec from the body
         
         # M4: init lamport clock for notification service
-        self.lamport_clock = LamportClock("NOTIFICATION_SERVICE")
+        self.lamport_clock = create_clock(clock, "NOTIFICATION_SERVICE")
 
-    def publish_artist_message(self, artist: str, message: str):
+    def _build_message(self, artist: str, message: str, lamport_time=None):
         '''
-        Publish a message to the exchange with routing key based on artist name
+        Routing key and JSON body for one artist update
         e.g. Routing key: artist.Taylor Swift
-        MODIFIED: Now includes Lamport timestamp in the message payload
         '''
         # M4: increment clock before sending notification (send event)
-        lamport_time = self.lamport_clock.increment()
+        if lamport_time is None:
+            lamport_time = self.lamport_clock.increment()
         
         routing_key = f"artist.{(artist)}"   
+        # with a hybrid logical clock the UTC time is the physical part of the timestamp
+        sent_at = self.lamport_clock.wall_time(lamport_time) or datetime.now(timezone.utc)
         payload = {
             "type": "artist_update",
             "artist": artist,
             "message": message,
-            "timestamp_utc": datetime.now(timezone.utc).isoformat(),
+            "timestamp_utc": sent_at.isoformat(),
             "lamport_timestamp": lamport_time,  # M4: add lamport timestamp
             "node_id": "NOTIFICATION_SERVICE"   # M4: identify sender
         }
-        body = json.dumps(payload).encode("utf-8")
+        return routing_key, self.codec.encode(payload), lamport_time
+
+    def publish_artist_message(self, artist: str, message: str):
+        '''
+        Publish a message to the exchange with routing key based on artist name
+        e.g. Routing key: artist.Taylor Swift
+        MODIFIED: Now includes Lamport timestamp in the message payload
+        '''
+        routing_key, body, lamport_time = self._build_message(artist, message)
 
         # Sends message to RabbitMQ
-        self.channel.basic_publish(
-            exchange=self.EXCHANGE_NAME, 
-            routing_key=routing_key, 
-            body=body,
-            properties=pika.BasicProperties(delivery_mode=2)) # make message persistent
+        self.transport.publish(self.EXCHANGE_NAME, routing_key, body)
         
         # M4: enhanced logging with lamport timestamp
         print(f" [x] sent at lamport time {lamport_time} - '{routing_key}':'{message}'") 
     
     
+    def publish_many(self, messages, window: int = 256, timeout: float = 30.0):
+        '''
+        Publish an iterable of (artist, message) pairs without waiting for each one.
+        Up to `window` messages are in flight at once; the broker confirms them
+        asynchronously. Returns one PublishResult per message (acked=False on nack
+        or if no confirm arrived before the timeout).
+        '''
+        messages = list(messages)
+        if not messages:
+            return []
+        built = []
+        # one clock call for the whole batch: consecutive timestamps, one per message
+        timestamps = self.lamport_clock.reserve(len(messages))
+        for (artist, message), timestamp in zip(messages, timestamps):
+            routing_key, body, lamport_time = self._build_message(artist, message, timestamp)
+            built.append((artist, routing_key, body, lamport_time))
+        acks = self.transport.publish_batch(
+            self.EXCHANGE_NAME, self.EXCHANGE_TYPE,
+            [(routing_key, body) for _, routing_key, body, _ in built], window, timeout)
+        results = [PublishResult(artist, routing_key, lamport_time, acked)
+                   for (artist, routing_key, _, lamport_time), acked in zip(built, acks)]
+        nacked = sum(1 for r in results if not r.acked)
+        print(f" [x] published {len(results)} messages ({len(results) - nacked} acked, {nacked} not acked)")
+        return results
+    
+    
     def close_connection(self):
-        self.connection.close()
\ No newline at end of file
+        self.transport.close()
@@ -0,0 +1,100 @@
+import threading
+
+_REMOVED = object()  # tombstone left in place of a removed song
+
+
+class Playlist:
+    """
+    Ordered set of song ids.
+    Songs keep their insertion order; a hash index gives O(1) membership, add and
+    remove. Removals leave tombstones that are compacted away lazily, so positional
+    access stays O(1) except for the first lookup after a batch of removals.
+    Thread-safe: 2PC threads write while the UI thread reads, and a read may compact.
+    """
+    def __init__(self, songs=()):
+        self._items = []        # song ids in insertion order (with tombstones)
+        self._index = {}        # {song_id: position in _items}
+        self._removed = 0       # number of tombstones in _items
+        self._lock = threading.Lock()
+        for song_id in songs:
+            self.add(song_id)
+
+    def add(self, song_id):
+        """Append a song if it is not already present. Returns True if it was added."""
+        with self._lock:
+            if song_id in self._index:
+                return False
+            self._index[song_id] = len(self._items)
+            self._items.append(song_id)
+            return True
+
+    append = add  # list-compatible spelling
+
+    def remove(self, song_id):
+        """Remove a song; raises ValueError if it is not in the playlist (like list.remove)"""
+        if not self.discard(song_id):
+            raise ValueError(f"{song_id!r} is not in the playlist")
+
+    def discard(self, song_id):
+        """Remove a song if present. Returns True if it was removed."""
+        with self._lock:
+            position = self._index.pop(song_id, None)
+            if position is None:
+                return False
+            self._items[position] = _REMOVED
+            self._removed += 1
+            if self._removed > len(self._index):  # keep tombstones at most half of the list
+                self._compact()
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._items = []
+            self._index = {}
+            self._removed = 0
+
+    def _compact(self):
+        """Drop tombstones (call with _lock held)"""
+        self._items = [song_id for song_id in self._items if song_id is not _REMOVED]
+        self._index = {song_id: i for i, song_id in enumerate(self._items)}
+        self._removed = 0
+
+    def index(self, song_id):
+        """Position of a song in play order"""
+        with self._lock:
+            if song_id not in self._index:
+                raise ValueError(f"{song_id!r} is not in the playlist")
+            if self._removed:
+                self._compact()
+            return self._index[song_id]
+
+    def __getitem__(self, position):
+        with self._lock:
+            if self._removed:
+                self._compact()
+            return self._items[position]
+
+    def __contains__(self, song_id):
+        return song_id in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        with self._lock:
+            items = [song_id for song_id in self._items if song_id is not _REMOVED]
+        return iter(items)
+
+    def __eq__(self, other):
+        if isinstance(other, (Playlist, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def copy(self):
+        return Playlist(self)
+
+    def to_list(self):
+        return list(self)
+
+    def __repr__(self):
+        return f"Playlist({self.to_list()!r})"
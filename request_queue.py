@@ -0,0 +1,134 @@
+import heapq
+import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class LamportRequestQueue:
+    """
+    Bounded priority queue of requests ordered by (lamport timestamp, node_id).
+    Backed by a heap so push/pop are O(log n) instead of re-sorting a list.
+    `sort_key` maps a timestamp to something orderable (the clock's sort_key).
+    """
+    def __init__(self, maxsize=1024, sort_key=None):
+        self.maxsize = maxsize          # 0 or None means unbounded
+        self.sort_key = sort_key or (lambda timestamp: timestamp)
+        self._heap = []
+        self._seq = itertools.count()   # tie-breaker so request dicts are never compared
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._consumer = None
+        self._stop = threading.Event()
+        self.dispatched = 0
+        self.batches = 0                # dispatch rounds (< dispatched when requests ran in parallel)
+
+    def _full(self):
+        return bool(self.maxsize) and len(self._heap) >= self.maxsize
+
+    def push(self, request, block=True, timeout=None):
+        """
+        Add a request. When the queue is full the caller waits (backpressure)
+        and queue.Full is raised if no slot frees up before the timeout.
+        """
+        key = (self.sort_key(request["timestamp"]), request["node_id"])
+        with self._not_full:
+            if self._full():
+                if not block:
+                    raise queue.Full
+                if not self._not_full.wait_for(lambda: not self._full(), timeout):
+                    raise queue.Full
+            heapq.heappush(self._heap, (key, next(self._seq), request))
+            self._not_empty.notify()
+
+    def pop(self, block=True, timeout=None):
+        """Remove and return the request with the smallest (timestamp, node_id)"""
+        with self._not_empty:
+            if not self._heap:
+                if not block:
+                    raise queue.Empty
+                if not self._not_empty.wait_for(lambda: self._heap, timeout):
+                    raise queue.Empty
+            _, _, request = heapq.heappop(self._heap)
+            self._not_full.notify()
+            return request
+
+    def pop_concurrent(self, concurrent, limit, timeout=None):
+        """
+        Pop the next request plus every following one that is concurrent with all
+        requests taken so far (at most `limit`); they have no causal order among them.
+        """
+        with self._not_empty:
+            if not self._not_empty.wait_for(lambda: self._heap, timeout):
+                raise queue.Empty
+            batch = [heapq.heappop(self._heap)[2]]
+            while self._heap and len(batch) < limit:
+                candidate = self._heap[0][2]
+                if not all(concurrent(candidate["timestamp"], r["timestamp"]) for r in batch):
+                    break
+                batch.append(heapq.heappop(self._heap)[2])
+            self._not_full.notify(len(batch))
+            return batch
+
+    def peek(self):
+        with self._lock:
+            return self._heap[0][2] if self._heap else None
+
+    def snapshot(self, limit=None):
+        """Return the queued (timestamp, node_id) keys in order without draining"""
+        with self._lock:
+            if limit is None:
+                keys = sorted(entry[0] for entry in self._heap)
+            else:
+                keys = [entry[0] for entry in heapq.nsmallest(limit, self._heap)]
+        return keys
+
+    def __len__(self):
+        with self._lock:
+            return len(self._heap)
+
+    def start_consumer(self, dispatch, concurrent=None, workers=1):
+        """
+        Start a background thread that pops requests in order and calls dispatch(request).
+        With a `concurrent(a, b)` test (vector clocks) and workers > 1, runs of mutually
+        concurrent requests are dispatched in parallel; runs still go one after another,
+        so causally ordered requests keep their order.
+        """
+        if self._consumer and self._consumer.is_alive():
+            return
+        self._stop.clear()
+        parallel = concurrent is not None and workers > 1
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dispatch") if parallel else None
+
+        def run(request):
+            try:
+                dispatch(request)
+            except Exception as e:
+                print(f"[QUEUE] dispatch error: {e}")
+
+        def consume():
+            while not self._stop.is_set():
+                try:
+                    if parallel:
+                        batch = self.pop_concurrent(concurrent, workers, timeout=0.2)
+                    else:
+                        batch = [self.pop(timeout=0.2)]
+                except queue.Empty:
+                    continue
+                if len(batch) == 1:
+                    run(batch[0])
+                else:
+                    list(pool.map(run, batch))
+                self.dispatched += len(batch)
+                self.batches += 1
+            if pool:
+                pool.shutdown(wait=False)
+
+        self._consumer = threading.Thread(target=consume, daemon=True)
+        self._consumer.start()
+
+    def stop_consumer(self):
+        self._stop.set()
+        if self._consumer:
+            self._consumer.join(timeout=1)
@@ -1,18 +1,64 @@
 import socket 
+import selectors
 import threading
-import json  # timestamp msgs
-from lamport_clock import LamportClock  # lamport clock
+import queue
+from collections import deque
+from lamport_clock import create_clock  # lamport / vector / hybrid logical clock
+from request_queue import LamportRequestQueue  # heap-ordered request queue
+from framing import FrameParser, FrameError, send_message  # length-prefixed messages
+from codec import detect_codec
+from executor import BoundedExecutor  # fixed worker pool for requests
+
+
+class _Connection:
+    """A client connection as seen by the selector loop"""
+    __slots__ = ("sock", "addr", "parser", "pending", "lock", "send_lock", "scheduled", "closing", "closed")
+
+    def __init__(self, sock, addr):
+        self.sock = sock
+        self.addr = addr
+        self.parser = FrameParser()
+        self.pending = deque()          # frames received but not handled yet, in arrival order
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        self.scheduled = False          # a worker is (or is about to be) handling this connection
+        self.closing = False            # peer closed / connection dropped: close once idle
+        self.closed = False
+
+
 class Server:
-    def __init__(self, host='localhost', port=5001):
+    BATCH = 16  # requests a worker handles from one connection before yielding to others
+    BUSY_BACKLOG = 4096  # rejected batches waiting for their "busy" reply; beyond that, drop the connection
+
+    def __init__(self, host='localhost', port=5001, queue_size=1024, enqueue_timeout=2.0,
+                 max_workers=32, max_pending=128, backlog=128, clock="lamport", dispatch_workers=4,
+                 catalog=None, send_timeout=10.0):
         self.host = host
         self.port = port
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_address = (self.host, self.port)
         self._stop = threading.Event()
         self._thread = None
-        self.lamport_clock = LamportClock("SERVER")  # M4: server's Lamport clock
-        self.request_queue = []  # M4: ordered queue of requests
-        self.queue_lock = threading.Lock()  # M4: thread-safe queue
+        self.lamport_clock = create_clock(clock, "SERVER")  # M4: server's Lamport clock
+        # M4: ordered queue of requests
+        self.request_queue = LamportRequestQueue(maxsize=queue_size, sort_key=self.lamport_clock.sort_key)
+        # concurrent requests (only detectable with vector clocks) are dispatched in parallel
+        self.dispatch_workers = dispatch_workers
+        self.enqueue_timeout = enqueue_timeout  # how long a request waits for a free slot
+        # one selector thread reads every connection; each request (not each connection)
+        # takes a worker, so idle persistent connections don't hold one
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.backlog = backlog
+        self.send_timeout = send_timeout  # how long a worker waits on a client that doesn't read
+        self.executor = None
+        self._selector = None
+        # "busy" replies are sent by their own thread so a slow client never stalls the selector
+        self._busy_replies = queue.Queue(maxsize=self.BUSY_BACKLOG)
+        self.connections = 0
+        # song catalog (catalog.Catalog); when set, requests are resolved against it and
+        # clients can page through / search it with {"type": "catalog", ...} messages
+        self.catalog = catalog
 
     def start(self):
         if self._thread and self._thread.is_alive():
@@ -21,63 +67,315 @@ class Server:
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.server_socket.bind((self.host, self.port))
-        self.server_socket.listen(5)
+        self.server_socket.listen(self.backlog)
         print(f"[Server] Listening on {self.host}:{self.port}")
+        self.executor = BoundedExecutor(self.max_workers, self.max_pending, name="SERVER").start()
+        self.request_queue.start_consumer(self._dispatch_request, concurrent=self.lamport_clock.concurrent,
+                                          workers=self.dispatch_workers)
+
+        self.server_socket.setblocking(False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self.server_socket, selectors.EVENT_READ, None)
 
         def loop():
             try:
                 while not self._stop.is_set():
-                    try:
-                        conn, addr = self.server_socket.accept()
-                    except OSError:
-                        break
-                    threading.Thread(target=self._handle_client, args=(conn, addr), daemon=True).start()
+                    for key, _ in self._selector.select():
+                        if key.data is None:
+                            self._accept()
+                        else:
+                            self._read(key.data)
             finally:
-                try: self.server_socket.close()
-                except Exception: pass
+                for key in list(self._selector.get_map().values()):
+                    try: key.fileobj.close()
+                    except Exception: pass
+                self._selector.close()
 
         self._thread = threading.Thread(target=loop, daemon=True)
         self._thread.start()
+        threading.Thread(target=self._busy_reply_loop, daemon=True).start()
+
+    # --- selector thread: accept and read; requests go to the worker pool ---
+
+    def _accept(self):
+        try:
+            sock, addr = self.server_socket.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self._stop.set()
+            return
+        if self._stop.is_set():  # the wake-up connection from stop()
+            sock.close()
+            return
+        print("Connected by", addr)
+        # the fd is non-blocking; the timeout only bounds how long a worker's send waits
+        sock.settimeout(self.send_timeout)
+        conn = _Connection(sock, addr)
+        self.connections += 1
+        self._selector.register(sock, selectors.EVENT_READ, conn)
+
+    def _read(self, conn):
+        try:
+            data = conn.sock.recv(65536)
+        except (BlockingIOError, InterruptedError, socket.timeout):
+            return
+        except OSError as e:
+            print(f"[SERVER] Dropping connection {conn.addr}: {e}")
+            data = b""
+        if not data:
+            if conn.parser.buffered():
+                print(f"[SERVER] Dropping connection {conn.addr}: closed in the middle of a frame")
+            self._release(conn)
+            return
+        try:
+            frames = conn.parser.feed(data)
+        except FrameError as e:
+            print(f"[SERVER] Dropping connection {conn.addr}: {e}")
+            self._release(conn)
+            return
+        for payload in frames:
+            self._enqueue(conn, payload)
+
+    def _release(self, conn):
+        """Stop reading conn; the socket is closed as soon as no worker is using it"""
+        self._selector.unregister(conn.sock)
+        self.connections -= 1
+        with conn.lock:
+            conn.closing = True
+            idle = not conn.scheduled
+        if idle:
+            self._close(conn)
+
+    def _enqueue(self, conn, payload):
+        with conn.lock:
+            conn.pending.append(payload)
+            if conn.scheduled:
+                return  # the worker already handling this connection will get to it
+            conn.scheduled = True
+        if not self.executor.submit(self._serve, conn):
+            # every worker busy and the pending queue full: answer "busy" instead of hanging
+            with conn.lock:
+                rejected, conn.pending = list(conn.pending), deque()
+                conn.scheduled = False
+            print(f"[Server] Busy, rejecting {len(rejected)} requests from {conn.addr}")
+            try:
+                self._busy_replies.put_nowait((conn, rejected))
+            except queue.Full:
+                print(f"[SERVER] Dropping connection {conn.addr}: too many busy replies queued")
+                self._drop(conn)
+
+    def _busy_reply_loop(self):
+        while True:
+            item = self._busy_replies.get()
+            if item is None:
+                return
+            conn, rejected = item
+            for payload in rejected:
+                self._reply_busy(conn, payload)
+
+    # --- workers ---
+
+    def _serve(self, conn):
+        """Handle a connection's pending requests in order (at most BATCH, then requeue)"""
+        try:
+            while True:
+                for _ in range(self.BATCH):
+                    with conn.lock:
+                        if not conn.pending or conn.closed:
+                            conn.scheduled = False
+                            closing = conn.closing
+                            break
+                        payload = conn.pending.popleft()
+                    self._handle_frame(conn, payload)
+                else:
+                    if self.executor.submit(self._serve, conn):
+                        return  # let other connections' requests in before our next batch
+                    continue    # pool queue full: keep serving here rather than stall this connection
+                break
+        except BaseException:
+            # never leave the connection marked as scheduled with nobody serving it
+            with conn.lock:
+                conn.scheduled = False
+                closing = conn.closing
+            self._drop(conn)
+            if closing:
+                self._close(conn)
+            raise
+        if closing:
+            self._close(conn)
 
-    def _handle_client(self, conn, addr):
-        with conn:
-            print("Connected by", addr)
-            data = conn.recv(1024)
-            if not data:
+    def _handle_frame(self, conn, payload):
+        codec = detect_codec(payload)  # answer in the codec the client spoke
+        try:
+            message = codec.decode(payload)
+        except ValueError as e:
+            print(f"[SERVER] Dropping connection {conn.addr}: {e}")
+            self._drop(conn)
+            return
+        try:
+            if not isinstance(message, dict):
+                raise ValueError("request is not an object")
+            response = self._respond(message)
+        except Exception as e:
+            # malformed request (missing field, wrong type, ...): answer it, keep the connection
+            print(f"[SERVER] Bad request from {conn.addr}: {e!r}")
+            response = self._error_response(message, f"Bad request: {e!r}")
+        self._send(conn, response, codec)
+
+    def _error_response(self, message, text):
+        response = {"message": text, "status": "error", "timestamp": self.lamport_clock.increment()}
+        if isinstance(message, dict) and "request_id" in message:
+            response["request_id"] = message["request_id"]
+        return response
+
+    def _reply_busy(self, conn, payload):
+        codec = detect_codec(payload)
+        try:
+            message = codec.decode(payload)
+        except ValueError:
+            message = {}
+        response = {"message": "Server busy, try again later", "status": "busy",
+                    "timestamp": self.lamport_clock.increment()}
+        if "request_id" in message:
+            response["request_id"] = message["request_id"]
+        self._send(conn, response, codec)
+
+    def _send(self, conn, response, codec):
+        try:
+            with conn.send_lock:
+                send_message(conn.sock, response, codec)
+        except OSError as e:
+            print(f"[SERVER] Dropping connection {conn.addr}: {e}")
+            self._drop(conn)
+
+    def _drop(self, conn):
+        """Abandon a broken connection from a worker: the selector sees EOF and releases it"""
+        with conn.lock:
+            conn.pending.clear()
+        try:
+            conn.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _close(self, conn):
+        with conn.lock:
+            if conn.closed:
                 return
-            
-            # M4: parse JSON message with timestamp
-            message = json.loads(data.decode("utf-8").strip())
-            song = message["song"]
-            client_timestamp = message["timestamp"]
-            client_id = message["node_id"]
-            
-            # M4: update server clock on receive
-            server_time = self.lamport_clock.update(client_timestamp)
-            print(f"Received song request: {song} from {client_id} (client T={client_timestamp}, server T={server_time})")
-            
-            # M4: add to ordered queue
-            with self.queue_lock:
-                self.request_queue.append({
-                    "timestamp": client_timestamp,
-                    "node_id": client_id,
-                    "song": song
-                })
-                self.request_queue.sort(key=lambda x: (x["timestamp"], x["node_id"]))
-                print(f"[SERVER] Request queue: {[(r['timestamp'], r['node_id']) for r in self.request_queue]}")
-            
-            # M4: increment clock before sending response
-            response_timestamp = self.lamport_clock.increment()
-            response = json.dumps({
-                "message": f"Playing song: {song}",
-                "timestamp": response_timestamp
-            })
-            conn.sendall(response.encode("utf-8"))
+            conn.closed = True
+        try:
+            conn.sock.close()
+        except OSError:
+            pass
+
+    def _respond(self, message):
+        request_type = message.get("type")
+        if request_type == "health":
+            response = {"status": "ok"}  # readiness probe (health.py); leaves the clock alone
+        elif request_type == "catalog":
+            response = self._handle_catalog_request(message)
+        else:
+            response = self._handle_song_request(message)
+        if "request_id" in message:
+            # pipelined connections match responses back by request_id
+            response["request_id"] = message["request_id"]
+        return response
+
+    def _handle_song_request(self, message):
+        # M4: parse JSON message with timestamp
+        song = message["song"]
+        client_timestamp = message["timestamp"]
+        client_id = message["node_id"]
+        
+        # M4: update server clock on receive
+        server_time = self.lamport_clock.update(client_timestamp)
+        print(f"Received song request: {song} from {client_id} (client T={client_timestamp}, server T={server_time})")
+
+        song_id = None
+        if self.catalog is not None:
+            # accept a song id, "Title - Artist", or anything search can match
+            entry = self.catalog.resolve(song)
+            if entry is None:
+                return {"message": f"Song not found: {song}", "timestamp": self.lamport_clock.increment()}
+            song_id, song = entry["id"], f"{entry['title']} - {entry['artist']}"
+        
+        # M4: add to ordered queue (blocks briefly when full -> backpressure)
+        try:
+            self.request_queue.push({
+                "timestamp": client_timestamp,
+                "node_id": client_id,
+                "song": song,
+                "song_id": song_id
+            }, timeout=self.enqueue_timeout)
+            text = f"Playing song: {song}"
+        except queue.Full:
+            print(f"[SERVER] Request queue full, rejecting {song} from {client_id}")
+            text = "Server busy, try again later"
+        
+        # M4: increment clock before sending response
+        response_timestamp = self.lamport_clock.increment()
+        response = {
+            "message": text,
+            "timestamp": response_timestamp
+        }
+        if song_id is not None:
+            response["song_id"] = song_id
+        return response
+
+    def _handle_catalog_request(self, message):
+        """One page of the catalog, or search results when the message has a 'query'"""
+        if "timestamp" in message:
+            self.lamport_clock.update(message["timestamp"])
+        if self.catalog is None:
+            response = {"message": "No catalog loaded", "songs": []}
+        elif message.get("query"):
+            songs = self.catalog.search(message["query"], limit=message.get("limit", 10))
+            response = {"message": f"{len(songs)} matches", "songs": songs}
+        else:
+            page_size = message.get("page_size", 20)
+            page = message.get("page", 0)
+            response = {
+                "message": f"Page {page + 1} of {self.catalog.page_count(page_size)}",
+                "songs": self.catalog.page(page, page_size),
+                "page": page,
+                "pages": self.catalog.page_count(page_size),
+                "total": len(self.catalog),
+            }
+        response["timestamp"] = self.lamport_clock.increment()
+        return response
+
+    def _dispatch_request(self, request):
+        """Consume requests from the queue in (timestamp, node_id) order (concurrent ones may overlap)"""
+        print(f"[SERVER] Dispatching (T={request['timestamp']}, {request['node_id']}): {request['song']}")
+
+    def queue_snapshot(self, limit=10):
+        """Return the first `limit` (timestamp, node_id) pairs still waiting in the queue"""
+        return self.request_queue.snapshot(limit)
 
     def stop(self):
         self._stop.set()
+        self.request_queue.stop_consumer()
+        if self.executor:
+            self.executor.shutdown()
+        try:
+            self._busy_replies.put_nowait(None)
+        except queue.Full:
+            pass
         # poke accept() so the loop exits
         try:
             socket.create_connection((self.host, self.port), timeout=1).close()
         except Exception:
-            pass
\ No newline at end of file
+            pass
+
+
+def create_server(engine="threaded", **kwargs):
+    """
+    Build a song server with the chosen engine:
+    "threaded" -> Server (worker pool), "asyncio" -> AsyncServer (single event loop)
+    """
+    if engine == "asyncio":
+        from async_server import AsyncServer
+        return AsyncServer(**kwargs)
+    if engine != "threaded":
+        raise ValueError(f"unknown server engine: {engine}")
+    return Server(**kwargs)
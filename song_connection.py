@@ -0,0 +1,90 @@
+import itertools
+import socket
+import threading
+from concurrent.futures import Future
+from framing import FrameReader, send_message
+
+
+class SongConnection:
+    """
+    Long-lived connection to the song Server that carries many pipelined requests.
+    Each request is tagged with a request_id and its response is matched back
+    by a reader thread, so callers do not wait on each other.
+    """
+    def __init__(self, host="localhost", port=5001, timeout=5.0, codec="json"):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.codec = codec
+        self.sock = None
+        self._ids = itertools.count(1)
+        self._pending = {}              # {request_id: Future}
+        self._pending_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._reader_thread = None
+        self._closed = threading.Event()
+
+    def connect(self):
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self.sock.settimeout(None)  # the reader thread blocks until responses arrive
+        self._closed.clear()
+        self._reader_thread = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader_thread.start()
+
+    def is_open(self):
+        return self.sock is not None and not self._closed.is_set()
+
+    def request(self, message):
+        """Send a message without waiting; returns a Future resolved with the response"""
+        future = Future()
+        if not self.is_open():
+            future.set_exception(ConnectionError("song connection is not open"))
+            return future
+        request_id = next(self._ids)
+        with self._pending_lock:
+            self._pending[request_id] = future
+        try:
+            with self._send_lock:
+                send_message(self.sock, dict(message, request_id=request_id), self.codec)
+        except Exception as e:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+            future.set_exception(e)
+        return future
+
+    def _read_loop(self):
+        reader = FrameReader(self.sock)
+        error = ConnectionError("song connection closed")
+        try:
+            while True:
+                response = reader.read_message()
+                if response is None:
+                    break
+                with self._pending_lock:
+                    future = self._pending.pop(response.get("request_id"), None)
+                if future is not None:
+                    future.set_result(response)
+        except Exception as e:
+            error = e
+        finally:
+            self._closed.set()
+            self._fail_pending(error)
+
+    def _fail_pending(self, error):
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    def close(self):
+        self._closed.set()
+        if self.sock:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.sock.close()
+        if self._reader_thread:
+            self._reader_thread.join(timeout=1)
+        self._fail_pending(ConnectionError("song connection closed"))
@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from catalog import Catalog, MappedCatalog
+
+CATALOG_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "catalog.csv")
+
+
+class MappedCatalogTruncationTest(unittest.TestCase):
+    """A truncated .scat file must be rejected with ValueError when opened, never fail later"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "catalog.scat")
+        self.catalog = Catalog.load(CATALOG_CSV)
+        self.catalog.save(self.path)
+        with open(self.path, "rb") as f:
+            self.data = f.read()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_intact_file_opens(self):
+        mapped = MappedCatalog(self.path)
+        try:
+            self.assertEqual(len(mapped), len(self.catalog))
+        finally:
+            mapped.close()
+
+    def test_every_truncation_is_a_value_error(self):
+        truncated = os.path.join(self.directory.name, "truncated.scat")
+        for end in range(len(self.data)):
+            with open(truncated, "wb") as f:
+                f.write(self.data[:end])
+            with self.assertRaises(ValueError, msg=f"truncated to {end} bytes"):
+                MappedCatalog(truncated)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from codec import MAGIC, BinaryCodec, CodecError, JsonCodec, decode
+
+MESSAGE = {
+    "type": "song",
+    "song": "Hello - Adele",
+    "timestamp": 42,
+    "operations": [{"operation": "add", "song_id": "Hello - Adele"}],
+    "extra": [None, True, False, -1, 2**40, 2**70, 1.5, "x" * 300],
+}
+
+
+class BinaryCodecMalformedInputTest(unittest.TestCase):
+    """Every bad payload must fail with CodecError (a ValueError), never IndexError/struct.error"""
+
+    def test_round_trip(self):
+        self.assertEqual(decode(BinaryCodec.encode(MESSAGE)), MESSAGE)
+
+    def test_every_truncation(self):
+        payload = BinaryCodec.encode(MESSAGE)
+        for end in range(len(payload)):
+            with self.assertRaises(CodecError, msg=f"truncated to {end} bytes"):
+                BinaryCodec.decode(payload[:end])
+
+    def test_trailing_bytes(self):
+        with self.assertRaises(CodecError):
+            BinaryCodec.decode(BinaryCodec.encode(MESSAGE) + b"\0")
+
+    def test_unknown_tag_and_interned_id(self):
+        for payload in (bytes([MAGIC, 0x7F]), bytes([MAGIC, 10, 0xFE])):
+            with self.assertRaises(CodecError):
+                BinaryCodec.decode(payload)
+
+    def test_corrupt_bytes(self):
+        payload = BinaryCodec.encode(MESSAGE)
+        rng = random.Random(327)
+        for _ in range(2000):
+            corrupt = bytearray(payload)
+            for _ in range(rng.randint(1, 4)):
+                corrupt[rng.randrange(1, len(corrupt))] = rng.randrange(256)
+            try:
+                BinaryCodec.decode(bytes(corrupt))
+            except ValueError:
+                pass    # CodecError, or UnicodeDecodeError / int() errors, all ValueErrors
+
+    def test_deep_nesting(self):
+        with self.assertRaises(CodecError):
+            BinaryCodec.decode(bytes([MAGIC]) + bytes([11, 1]) * 100000)
+
+    def test_json_errors_are_value_errors(self):
+        with self.assertRaises(ValueError):
+            JsonCodec.decode(b'{"type": "so')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import os
+import sys
+import threading
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from transport import PikaTopicDispatcher
+
+
+class FakeChannel:
+    """The few BlockingChannel calls the dispatcher makes, recorded"""
+    def __init__(self):
+        self.is_open = True
+        self.bindings = set()
+        self.acked = []
+        self.callback = None
+        self.next_tag = 0
+
+    def exchange_declare(self, **kwargs):
+        pass
+
+    def queue_declare(self, **kwargs):
+        return types.SimpleNamespace(method=types.SimpleNamespace(queue="amq.gen-1"))
+
+    def queue_bind(self, exchange, queue, routing_key):
+        self.bindings.add(routing_key)
+
+    def queue_unbind(self, exchange, queue, routing_key):
+        self.bindings.discard(routing_key)
+
+    def basic_qos(self, **kwargs):
+        pass
+
+    def basic_consume(self, queue, on_message_callback, auto_ack):
+        self.callback = on_message_callback
+
+    def basic_ack(self, delivery_tag, multiple):
+        self.acked.append(delivery_tag)
+
+    def close(self):
+        self.is_open = False
+
+    def deliver(self, routing_key, body):
+        self.next_tag += 1
+        method = types.SimpleNamespace(routing_key=routing_key, delivery_tag=self.next_tag)
+        self.callback(self, method, None, body)
+
+
+class FakeConnection:
+    """SharedConnection stand-in that runs every job on the calling thread"""
+    def __init__(self):
+        self.channels = []
+        self._setups = {}
+
+    def channel(self):
+        self.channels.append(FakeChannel())
+        return self.channels[-1]
+
+    def call(self, fn, timeout=None):
+        return fn(None)
+
+    call_soon = call
+
+    def add_setup(self, setup):
+        setup_id = len(self._setups) + 1
+        self._setups[setup_id] = setup
+        setup(self)
+        return setup_id
+
+    def remove_setup(self, setup_id):
+        self._setups.pop(setup_id, None)
+
+
+class FakePool:
+    def __init__(self):
+        self.connection = FakeConnection()
+        self.users = 0
+
+    def acquire(self):
+        self.users += 1
+        return self.connection
+
+    def release(self, connection):
+        self.users -= 1
+
+
+class PikaTopicDispatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = FakePool()
+        self.received = {}
+        self.lock = threading.Lock()
+        self.done = threading.Condition(self.lock)
+
+    def subscribe(self, name, routing_keys):
+        def on_message(body):
+            with self.lock:
+                self.received.setdefault(name, []).append(body)
+                self.done.notify_all()
+        return PikaTopicDispatcher.subscribe(self.pool, "artist_update", "topic", routing_keys, on_message)
+
+    def wait_for(self, count):
+        with self.lock:
+            self.assertTrue(self.done.wait_for(
+                lambda: sum(len(v) for v in self.received.values()) >= count, timeout=5))
+
+    def test_one_binding_per_key_and_local_routing(self):
+        subscriptions = [self.subscribe(f"c{i}", [f"artist.A{i % 2}", "artist.Shared"]) for i in range(4)]
+        wildcard = self.subscribe("all", ["artist.*"])
+        channel = self.pool.connection.channels[-1]
+        self.assertEqual(self.pool.users, 1)   # one consumer for every subscription
+        self.assertEqual(channel.bindings, {"artist.A0", "artist.A1", "artist.Shared", "artist.*"})
+
+        channel.deliver("artist.A1", b"one")
+        channel.deliver("artist.Shared", b"shared")
+        self.wait_for(2 + 4 + 2)
+        self.assertEqual(self.received["c0"], [b"shared"])
+        self.assertEqual(sorted(self.received["c1"]), [b"one", b"shared"])
+        self.assertEqual(sorted(self.received["all"]), [b"one", b"shared"])
+
+        for subscription in subscriptions[:3]:
+            subscription.close()
+        self.assertEqual(channel.bindings, {"artist.A1", "artist.Shared", "artist.*"})
+        subscriptions[3].close()
+        wildcard.close()
+        self.assertFalse(channel.is_open)
+        self.assertEqual(self.pool.users, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
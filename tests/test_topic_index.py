@@ -0,0 +1,66 @@
+import itertools
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from topic_index import TopicTrie
+
+
+def topic_matches(pattern, routing_key):
+    """Reference AMQP topic matcher: '*' = exactly one word, '#' = zero or more"""
+    return _match(pattern.split("."), routing_key.split("."))
+
+
+def _match(pattern, words):
+    if not pattern:
+        return not words
+    head, rest = pattern[0], pattern[1:]
+    if head == "#":
+        return any(_match(rest, words[i:]) for i in range(len(words) + 1))
+    if not words:
+        return False
+    return (head == "*" or head == words[0]) and _match(rest, words[1:])
+
+
+WORDS = ("artist", "genre", "a", "b")
+PATTERN_WORDS = WORDS + ("*", "#")
+
+
+class TopicTrieTest(unittest.TestCase):
+    """TopicTrie.match must agree with the reference matcher on every binding"""
+
+    def setUp(self):
+        self.patterns = [".".join(words) for n in range(1, 4)
+                         for words in itertools.product(PATTERN_WORDS, repeat=n)]
+        self.keys = [".".join(words) for n in range(1, 5)
+                     for words in itertools.product(WORDS, repeat=n)]
+
+    def assert_agrees(self, trie, bound):
+        for key in self.keys:
+            expected = {pattern for pattern in bound if topic_matches(pattern, key)}
+            self.assertEqual(trie.match(key), expected, key)
+
+    def test_match_agrees_with_reference(self):
+        trie = TopicTrie()
+        for pattern in self.patterns:
+            trie.add(pattern, pattern)
+        self.assertEqual(len(trie), len(self.patterns))
+        self.assert_agrees(trie, self.patterns)
+
+    def test_remove_keeps_other_bindings(self):
+        trie = TopicTrie()
+        for pattern in self.patterns:
+            trie.add(pattern, pattern)
+        bound = set(self.patterns)
+        for pattern in random.Random(327).sample(self.patterns, len(self.patterns) // 2):
+            self.assertTrue(trie.remove(pattern, pattern))
+            bound.discard(pattern)
+        self.assertFalse(trie.remove("artist.nobody", "artist.nobody"))
+        self.assertEqual(len(trie), len(bound))
+        self.assert_agrees(trie, bound)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+class _Node:
+    __slots__ = ("children", "star", "hash", "subscribers")
+
+    def __init__(self):
+        self.children = {}      # {word: _Node}
+        self.star = None        # child for '*' (exactly one word)
+        self.hash = None        # child for '#' (zero or more words)
+        self.subscribers = set()
+
+    def is_empty(self):
+        return not (self.children or self.star or self.hash or self.subscribers)
+
+
+class TopicTrie:
+    """
+    Index of topic bindings (e.g. "artist.Taylor Swift", "artist.*", "genre.#").
+    Bindings are compiled into a trie over the '.'-separated words, so matching a
+    routing key only walks the branches its words select: exact keys cost
+    O(len(key)) no matter how many bindings exist.
+    """
+    def __init__(self):
+        self._root = _Node()
+        self._count = 0
+
+    def add(self, pattern, subscriber):
+        node = self._root
+        for word in pattern.split("."):
+            if word == "*":
+                node.star = node.star or _Node()
+                node = node.star
+            elif word == "#":
+                node.hash = node.hash or _Node()
+                node = node.hash
+            else:
+                node = node.children.setdefault(word, _Node())
+        if subscriber not in node.subscribers:
+            node.subscribers.add(subscriber)
+            self._count += 1
+
+    def remove(self, pattern, subscriber):
+        """Remove one binding and prune branches left empty"""
+        path = [self._root]
+        for word in pattern.split("."):
+            node = path[-1]
+            if word == "*":
+                child = node.star
+            elif word == "#":
+                child = node.hash
+            else:
+                child = node.children.get(word)
+            if child is None:
+                return False
+            path.append(child)
+        leaf = path[-1]
+        if subscriber not in leaf.subscribers:
+            return False
+        leaf.subscribers.discard(subscriber)
+        self._count -= 1
+        words = pattern.split(".")
+        for depth in range(len(words), 0, -1):
+            node, parent, word = path[depth], path[depth - 1], words[depth - 1]
+            if not node.is_empty():
+                break
+            if word == "*":
+                parent.star = None
+            elif word == "#":
+                parent.hash = None
+            else:
+                del parent.children[word]
+        return True
+
+    def match(self, routing_key):
+        """Set of subscribers whose binding matches the routing key"""
+        words = routing_key.split(".")
+        result = set()
+        seen = set()
+        stack = [(self._root, 0)]
+        while stack:
+            node, i = stack.pop()
+            if (id(node), i) in seen:
+                continue
+            seen.add((id(node), i))
+            if node.hash is not None:
+                # '#' may swallow any number of the remaining words (including none)
+                for j in range(i, len(words) + 1):
+                    stack.append((node.hash, j))
+            if i == len(words):
+                result |= node.subscribers
+                continue
+            child = node.children.get(words[i])
+            if child is not None:
+                stack.append((child, i + 1))
+            if node.star is not None:
+                stack.append((node.star, i + 1))
+        return result
+
+    def __len__(self):
+        return self._count
@@ -0,0 +1,611 @@
+import itertools
+import sys
+import threading
+import time
+from collections import deque
+from executor import BoundedExecutor
+from ack_batcher import AckBatcher
+from topic_index import TopicTrie
+from connection_pool import PikaConnectionPool
+
+# Notification transports. Both backends expose the same methods:
+#   declare_exchange(exchange, exchange_type)
+#   publish(exchange, routing_key, body)                       -> None
+#   publish_batch(exchange, exchange_type, messages, window, timeout) -> [acked, ...]
+#   subscribe(exchange, exchange_type, routing_keys, on_message, ...) -> subscription with close()
+#   close()
+
+
+def is_connection_error(error):
+    """True if error means RabbitMQ could not be reached (without importing pika just to check)"""
+    pika = sys.modules.get("pika")
+    return pika is not None and isinstance(error, pika.exceptions.AMQPConnectionError)
+
+
+def create_transport(kind="pika", host="localhost"):
+    """Build a notification transport: "pika" (RabbitMQ) or "inprocess" (no broker needed)"""
+    if kind == "pika":
+        return PikaTransport(host)
+    if kind == "inprocess":
+        return InProcessTransport()
+    raise ValueError(f"unknown notification transport: {kind}")
+
+
+# --- RabbitMQ backend ---
+
+class PikaTransport:
+    """
+    RabbitMQ via pika. Publishing and subscriptions run on connections borrowed from
+    the process-wide PikaConnectionPool, so many transports in one process share a
+    couple of TCP connections (and reconnect together) instead of opening one each.
+    """
+    def __init__(self, host="localhost", pool=None, timeout=10.0):
+        import pika
+        self.pika = pika
+        self.host = host
+        self.timeout = timeout
+        self.pool = pool or PikaConnectionPool.shared(host)
+        self.connection = self.pool.acquire()
+        self._publisher = None   # ConfirmingPublisher, opened on first publish_batch()
+
+    def declare_exchange(self, exchange, exchange_type="topic"):
+        self.connection.call(
+            lambda channel: channel.exchange_declare(exchange=exchange, exchange_type=exchange_type),
+            self.timeout)
+
+    def publish(self, exchange, routing_key, body):
+        properties = self.pika.BasicProperties(delivery_mode=2) # make message persistent
+        self.connection.call(
+            lambda channel: channel.basic_publish(
+                exchange=exchange, routing_key=routing_key, body=body, properties=properties),
+            self.timeout)
+
+    def publish_batch(self, exchange, exchange_type, messages, window=256, timeout=30.0):
+        if self._publisher is not None and self._publisher.failed:
+            # its connection is gone for good: open a new one instead of failing every batch
+            self._publisher.close()
+            self._publisher = None
+        if self._publisher is None:
+            self._publisher = ConfirmingPublisher(self.host, exchange, exchange_type)
+        return self._publisher.publish(messages, window, timeout)
+
+    def subscribe(self, exchange, exchange_type, routing_keys, on_message,
+                  prefetch_count=50, ack_every=10, workers=2, max_queue_length=None):
+        """
+        Subscribe on_message to the routing keys. Every subscription in the process
+        shares one consumer queue per exchange (PikaTopicDispatcher): the broker holds
+        one binding per distinct routing key, and deliveries are routed to the
+        matching subscriptions locally through a TopicTrie.
+        """
+        return PikaTopicDispatcher.subscribe(
+            self.pool, exchange, exchange_type, routing_keys, on_message,
+            prefetch_count=prefetch_count, ack_every=ack_every, workers=workers,
+            max_queue_length=max_queue_length)
+
+    def close(self):
+        if self._publisher:
+            self._publisher.close()
+            self._publisher = None
+        if self.connection is not None:
+            self.pool.release(self.connection)
+            self.connection = None
+
+
+class PikaTopicDispatcher:
+    """
+    One exclusive queue and consumer per (connection pool, exchange), shared by
+    every subscription in the process. The queue is bound once per distinct
+    routing key (bindings are reference counted), so a million (client, artist)
+    pairs across the clients of a process cost one binding per artist on the
+    broker; each delivery is matched against a TopicTrie of the subscriptions and
+    handed to every match. Deliveries are processed by `workers` threads, at most
+    `prefetch_count` unacked at a time, and acked in batches of `ack_every`
+    once every matching subscription has handled them. The first subscription
+    sizes these; the queue, bindings and consumer are redeclared after a reconnect.
+    """
+    _shared = {}                # {(pool, exchange): PikaTopicDispatcher}
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def subscribe(cls, pool, exchange, exchange_type, routing_keys, on_message, **options):
+        with cls._shared_lock:
+            dispatcher = cls._shared.get((pool, exchange))
+            if dispatcher is None:
+                dispatcher = cls(pool, exchange, exchange_type, **options)
+                cls._shared[(pool, exchange)] = dispatcher
+            try:
+                return dispatcher._add(routing_keys, on_message)
+            except Exception:
+                if not dispatcher._subscriptions:
+                    del cls._shared[(pool, exchange)]
+                    dispatcher._close()
+                raise
+
+    def __init__(self, pool, exchange, exchange_type, prefetch_count=50, ack_every=10, workers=2,
+                 max_queue_length=None):
+        self.pool = pool
+        self.exchange = exchange
+        self.exchange_type = exchange_type
+        self.prefetch_count = prefetch_count
+        self.ack_every = ack_every
+        self.arguments = {"x-max-length": max_queue_length} if max_queue_length else None
+        self._lock = threading.Lock()
+        self._routes = TopicTrie()          # routing pattern -> PikaSubscription
+        self._bindings = {}                 # {routing pattern: subscriptions using it}
+        self._subscriptions = set()
+        self._state = {"channel": None, "queue": None, "acker": None}
+        self.workers = BoundedExecutor(workers, max_pending=prefetch_count, name="NOTIFY").start()
+        self.connection = pool.acquire()
+        try:
+            self._setup_id = self.connection.add_setup(self._setup)
+        except Exception:
+            self.workers.shutdown()
+            pool.release(self.connection)
+            raise
+
+    @property
+    def channel(self):
+        return self._state["channel"]
+
+    # --- I/O thread ---
+    def _setup(self, amqp_connection):
+        channel = amqp_connection.channel()
+        channel.exchange_declare(exchange=self.exchange, exchange_type=self.exchange_type)
+        result = channel.queue_declare(queue="", exclusive=True, arguments=self.arguments)
+        queue_name = result.method.queue
+        with self._lock:
+            patterns = list(self._bindings)
+        for pattern in patterns:
+            channel.queue_bind(exchange=self.exchange, queue=queue_name, routing_key=pattern)
+        # bound how many unacked messages the broker pushes to this process
+        channel.basic_qos(prefetch_count=self.prefetch_count)
+
+        # delivery tags belong to one channel: acks for a channel lost in a
+        # reconnect are dropped (the broker redelivers those messages)
+        def ack(tag, multiple):
+            self.connection.call_soon(lambda _: channel.is_open and self._state["channel"] is channel
+                                      and channel.basic_ack(delivery_tag=tag, multiple=multiple))
+        acker = AckBatcher(ack, self.ack_every)
+
+        # the I/O thread only looks up the subscriptions and hands the message off
+        def callback(ch, method, properties, body):
+            with self._lock:
+                targets = self._routes.match(method.routing_key)
+            acker.delivered(method.delivery_tag)
+            if not self.workers.submit(self._process, targets, acker, method.delivery_tag, body):
+                self._process(targets, acker, method.delivery_tag, body)  # pool stopped: handle inline
+
+        channel.basic_consume(queue=queue_name, on_message_callback=callback, auto_ack=False)
+        self._state.update(channel=channel, queue=queue_name, acker=acker)
+
+    def _process(self, targets, acker, delivery_tag, body):
+        try:
+            for subscription in targets:
+                if subscription.closed:
+                    continue
+                try:
+                    subscription.on_message(body)
+                except Exception as e:
+                    print(f"[NOTIFY] subscriber failed on {self.exchange}: {e!r}")
+        finally:
+            acker.processed(delivery_tag)
+
+    def _bind(self, channel, pattern, bind):
+        # skip if the channel was replaced meanwhile: _setup binds the current patterns itself
+        if channel is None or not channel.is_open or self._state["channel"] is not channel:
+            return
+        if bind:
+            channel.queue_bind(exchange=self.exchange, queue=self._state["queue"], routing_key=pattern)
+        else:
+            channel.queue_unbind(exchange=self.exchange, queue=self._state["queue"], routing_key=pattern)
+
+    # --- caller side (under _shared_lock) ---
+    def _add(self, routing_keys, on_message):
+        subscription = PikaSubscription(self, list(dict.fromkeys(routing_keys)), on_message)
+        added = []
+        with self._lock:
+            self._subscriptions.add(subscription)
+            for pattern in subscription.routing_keys:
+                self._routes.add(pattern, subscription)
+                users = self._bindings.setdefault(pattern, set())
+                if not users:
+                    added.append(pattern)
+                users.add(subscription)
+        try:
+            for pattern in added:   # only keys nobody in this process was bound to yet
+                self.connection.call(lambda _, pattern=pattern: self._bind(self.channel, pattern, True),
+                                     10.0)
+        except Exception:
+            self._remove(subscription)
+            raise
+        return subscription
+
+    def _remove(self, subscription):
+        """Drop a subscription's routes and the bindings nobody else needs"""
+        removed = []
+        with self._lock:
+            if subscription not in self._subscriptions:
+                return
+            self._subscriptions.discard(subscription)
+            for pattern in subscription.routing_keys:
+                self._routes.remove(pattern, subscription)
+                users = self._bindings.get(pattern)
+                if users is not None:
+                    users.discard(subscription)
+                    if not users:
+                        del self._bindings[pattern]
+                        removed.append(pattern)
+            if not self._subscriptions:
+                return  # the caller closes the whole dispatcher (and its queue) instead
+        for pattern in removed:
+            self.connection.call_soon(lambda _, pattern=pattern: self._bind(self.channel, pattern, False))
+
+    def _close(self):
+        """Last subscription gone: drop the consumer queue and give back the connection"""
+        self.workers.shutdown()
+        channel = self._state["channel"]
+        self.connection.remove_setup(self._setup_id)
+        try:
+            # closing the channel cancels the consumer and drops the exclusive queue
+            self.connection.call(lambda _: channel is not None and channel.is_open and channel.close(), 5.0)
+        except Exception:
+            pass
+        self.pool.release(self.connection)
+
+    def unsubscribe(self, subscription):
+        with self._shared_lock:
+            self._remove(subscription)
+            if not self._subscriptions and self._shared.get((self.pool, self.exchange)) is self:
+                del self._shared[(self.pool, self.exchange)]
+                self._close()
+
+
+class PikaSubscription:
+    """One subscriber's routing keys on a shared PikaTopicDispatcher"""
+    def __init__(self, dispatcher, routing_keys, on_message):
+        self.dispatcher = dispatcher
+        self.routing_keys = routing_keys
+        self.on_message = on_message
+        self.closed = False
+
+    @property
+    def connection(self):
+        return self.dispatcher.connection
+
+    @property
+    def channel(self):
+        return self.dispatcher.channel
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.dispatcher.unsubscribe(self)
+
+
+class _Batch:
+    """One publish() call: ack flags plus how many of its messages are still unconfirmed"""
+    __slots__ = ("results", "unconfirmed", "cancelled")
+
+    def __init__(self, size):
+        self.results = [None] * size
+        self.unconfirmed = 0
+        self.cancelled = False
+
+
+class ConfirmingPublisher:
+    '''
+    Publisher running pika's asynchronous SelectConnection on its own I/O thread,
+    with publisher confirms enabled. Messages are pipelined (no round trip per
+    publish) and the broker's Basic.Ack/Basic.Nack frames, which may cover
+    several delivery tags at once (multiple=True), are matched back to messages.
+    '''
+    def __init__(self, host, exchange, exchange_type, connect_timeout=10.0):
+        import pika
+        self.pika = pika
+        self.exchange = exchange
+        self.exchange_type = exchange_type
+        self._ready = threading.Event()
+        self._error = None
+        self._channel = None
+        self._next_tag = 1          # broker numbers confirms 1, 2, 3... per channel
+        self._outstanding = {}      # {delivery_tag: (_Batch, index)}
+        self._in_flight = 0         # published or scheduled, not yet confirmed
+        self._cond = threading.Condition()
+
+        self._connection = pika.SelectConnection(
+            pika.ConnectionParameters(host),
+            on_open_callback=self._on_connection_open,
+            on_open_error_callback=self._on_connection_error,
+            on_close_callback=self._on_connection_closed)
+        self._thread = threading.Thread(target=self._connection.ioloop.start, daemon=True)
+        self._thread.start()
+        if not self._ready.wait(connect_timeout) or self._error:
+            self.close()
+            raise pika.exceptions.AMQPConnectionError(self._error or "timed out opening publisher")
+
+    # --- I/O thread callbacks ---
+    def _on_connection_open(self, connection):
+        connection.channel(on_open_callback=self._on_channel_open)
+
+    def _on_connection_error(self, connection, error):
+        self._error = error
+        self._ready.set()
+        connection.ioloop.stop()
+
+    def _on_connection_closed(self, connection, reason):
+        self._error = self._error or reason
+        self._ready.set()
+        self._fail_outstanding()
+        connection.ioloop.stop()
+
+    def _on_channel_open(self, channel):
+        self._channel = channel
+        channel.exchange_declare(exchange=self.exchange, exchange_type=self.exchange_type,
+                                 callback=lambda _: channel.confirm_delivery(
+                                     self._on_confirm, callback=lambda _: self._ready.set()))
+
+    def _on_confirm(self, frame):
+        method = frame.method
+        acked = isinstance(method, self.pika.spec.Basic.Ack)
+        with self._cond:
+            if method.multiple:
+                tags = [tag for tag in self._outstanding if tag <= method.delivery_tag]
+            else:
+                tags = [method.delivery_tag]
+            for tag in tags:
+                entry = self._outstanding.pop(tag, None)
+                if entry:
+                    batch, i = entry
+                    batch.results[i] = acked
+                    batch.unconfirmed -= 1
+                    self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _publish_chunk(self, chunk, batch, start):
+        for offset, (routing_key, body) in enumerate(chunk):
+            with self._cond:
+                if batch.cancelled:
+                    # the caller timed out: give back the slots of what was not published yet
+                    self._in_flight = max(self._in_flight - (len(chunk) - offset), 0)
+                    self._cond.notify_all()
+                    return
+                self._outstanding[self._next_tag] = (batch, start + offset)
+                self._next_tag += 1
+            self._channel.basic_publish(
+                exchange=self.exchange,
+                routing_key=routing_key,
+                body=body,
+                properties=self.pika.BasicProperties(delivery_mode=2))
+
+    def _fail_outstanding(self):
+        with self._cond:
+            for batch, i in self._outstanding.values():
+                batch.results[i] = False
+            self._outstanding.clear()
+            self._in_flight = 0
+            self._cond.notify_all()
+
+    # --- caller side ---
+    @property
+    def failed(self):
+        """True once the connection or channel is lost; the publisher cannot be used again"""
+        return self._error is not None
+
+    def publish(self, messages, window, timeout):
+        '''Publish [(routing_key, body)] keeping at most `window` unconfirmed; returns ack flags'''
+        batch = _Batch(len(messages))
+        sent = 0
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while sent < len(messages) and not self._error:
+                if not self._cond.wait_for(lambda: self._in_flight < window or self._error,
+                                           deadline - time.monotonic()):
+                    break
+                if self._error:
+                    break
+                chunk = messages[sent:sent + window - self._in_flight]
+                self._in_flight += len(chunk)
+                batch.unconfirmed += len(chunk)
+                # the I/O thread assigns delivery tags and publishes the whole chunk
+                self._connection.ioloop.add_callback_threadsafe(
+                    lambda chunk=chunk, start=sent: self._publish_chunk(chunk, batch, start))
+                sent += len(chunk)
+            if not self._cond.wait_for(lambda: batch.unconfirmed == 0 or self._error,
+                                       deadline - time.monotonic()):
+                self._abandon(batch)
+        return [bool(r) for r in batch.results]
+
+    def _abandon(self, batch):
+        """
+        Forget a timed-out batch (call with _cond held) so its unconfirmed messages
+        don't shrink the window of later publish() calls. Chunks the I/O thread has
+        not published yet are skipped by _publish_chunk.
+        """
+        batch.cancelled = True
+        tags = [tag for tag, (owner, _) in self._outstanding.items() if owner is batch]
+        for tag in tags:
+            del self._outstanding[tag]
+        self._in_flight = max(self._in_flight - len(tags), 0)
+        self._cond.notify_all()
+
+    def close(self):
+        if self._thread.is_alive():
+            def shutdown():
+                if self._connection.is_open:
+                    self._connection.close()
+                else:
+                    self._connection.ioloop.stop()
+            self._connection.ioloop.add_callback_threadsafe(shutdown)
+            self._thread.join(timeout=5)
+
+
+# --- in-process backend ---
+
+class BoundedMessageQueue:
+    """
+    Per-queue buffer of the in-process broker.
+    overflow="drop-head" discards the oldest message when full (RabbitMQ's default
+    for x-max-length); overflow="reject-publish" refuses the new message instead.
+    """
+    def __init__(self, maxsize=10000, overflow="drop-head"):
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self._items = deque()
+        self._cond = threading.Condition()
+        self.dropped = 0
+        self.rejected = 0
+        self.closed = False
+
+    def put(self, body):
+        with self._cond:
+            if self.closed:
+                return False
+            if self.maxsize and len(self._items) >= self.maxsize:
+                if self.overflow == "reject-publish":
+                    self.rejected += 1
+                    return False
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(body)
+            self._cond.notify()
+            return True
+
+    def get(self, timeout=None):
+        """Next message, or None on timeout / once the queue is closed and empty"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._items or self.closed, timeout)
+            return self._items.popleft() if self._items else None
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+
+class InProcessBroker:
+    """Pure-Python stand-in for RabbitMQ exchanges, exclusive queues and bindings"""
+    _default = None
+    _default_lock = threading.Lock()
+
+    @classmethod
+    def default(cls):
+        """Broker shared by every InProcessTransport in this process"""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._exchanges = {}        # {exchange: exchange_type}
+        self._bindings = {}         # {exchange: TopicTrie of routing pattern -> queue name}
+        self._queue_bindings = {}   # {queue name: [(exchange, routing pattern)]}
+        self._queues = {}           # {queue name: BoundedMessageQueue}
+        self._queue_ids = itertools.count(1)
+
+    def declare_exchange(self, exchange, exchange_type="topic"):
+        with self._lock:
+            self._exchanges.setdefault(exchange, exchange_type)
+            self._bindings.setdefault(exchange, TopicTrie())
+
+    def declare_queue(self, maxsize=10000, overflow="drop-head"):
+        with self._lock:
+            name = f"inproc.gen-{next(self._queue_ids)}"
+            self._queues[name] = BoundedMessageQueue(maxsize, overflow)
+            return name
+
+    def get_queue(self, name):
+        with self._lock:
+            return self._queues[name]
+
+    def bind(self, exchange, queue_name, routing_key):
+        with self._lock:
+            self._bindings.setdefault(exchange, TopicTrie()).add(routing_key, queue_name)
+            self._queue_bindings.setdefault(queue_name, []).append((exchange, routing_key))
+
+    def delete_queue(self, name):
+        with self._lock:
+            q = self._queues.pop(name, None)
+            for exchange, pattern in self._queue_bindings.pop(name, ()):
+                self._bindings[exchange].remove(pattern, name)
+        if q:
+            q.close()
+
+    def publish(self, exchange, routing_key, body):
+        """Route a message to every bound queue; False if any queue refused it"""
+        with self._lock:
+            bindings = self._bindings.get(exchange)
+            names = bindings.match(routing_key) if bindings is not None else ()
+            queues = [self._queues[name] for name in names if name in self._queues]
+        accepted = True
+        for q in queues:
+            accepted = q.put(body) and accepted
+        return accepted
+
+
+class InProcessTransport:
+    """Notification transport backed by an InProcessBroker (no RabbitMQ needed)"""
+    def __init__(self, broker=None):
+        self.broker = broker or InProcessBroker.default()
+
+    def declare_exchange(self, exchange, exchange_type="topic"):
+        self.broker.declare_exchange(exchange, exchange_type)
+
+    def publish(self, exchange, routing_key, body):
+        self.broker.publish(exchange, routing_key, body)
+
+    def publish_batch(self, exchange, exchange_type, messages, window=256, timeout=30.0):
+        # delivery is synchronous, so "acked" means every bound queue accepted the message
+        return [self.broker.publish(exchange, routing_key, body) for routing_key, body in messages]
+
+    def subscribe(self, exchange, exchange_type, routing_keys, on_message,
+                  prefetch_count=50, ack_every=10, workers=2, max_queue_length=10000):
+        self.broker.declare_exchange(exchange, exchange_type)
+        queue_name = self.broker.declare_queue(max_queue_length)
+        for routing_key in routing_keys:
+            self.broker.bind(exchange, queue_name, routing_key)
+        return InProcessSubscription(self.broker, queue_name, on_message, prefetch_count, workers)
+
+    def close(self):
+        pass
+
+
+class InProcessSubscription:
+    """Dispatcher thread moving messages from an in-process queue to a worker pool"""
+    def __init__(self, broker, queue_name, on_message, prefetch_count, workers):
+        self.broker = broker
+        self.queue_name = queue_name
+        self.queue = broker.get_queue(queue_name)
+        self.on_message = on_message
+        self._unacked = threading.Semaphore(prefetch_count)   # prefetch window
+        self.pool = BoundedExecutor(workers, max_pending=prefetch_count, name="NOTIFY").start()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._dispatch, daemon=True)
+        self._thread.start()
+
+    def _dispatch(self):
+        while not self._stop.is_set():
+            body = self.queue.get(timeout=0.5)
+            if body is None:
+                if self.queue.closed:
+                    return
+                continue
+            self._unacked.acquire()
+            if not self.pool.submit(self._process, body):
+                self._process(body)
+
+    def _process(self, body):
+        try:
+            self.on_message(body)
+        finally:
+            self._unacked.release()
+
+    def close(self):
+        self._stop.set()
+        self.broker.delete_queue(self.queue_name)
+        self.pool.shutdown()
@@ -0,0 +1,204 @@
+import os
+import struct
+import threading
+import time
+import zlib
+
+# record kinds
+PREPARING = 1   # coordinator: transaction started (operations attached)
+PREPARED = 2    # participant: voted YES (operations attached)
+COMMITTED = 3
+ABORTED = 4
+SNAPSHOT = 5    # checkpoint: full playlist as a list of 'add' operations
+COUNTER = 6     # checkpoint: coordinator transaction counter (stored in transaction_id)
+
+KIND_NAMES = {PREPARING: 'PREPARING', PREPARED: 'PREPARED', COMMITTED: 'COMMITTED',
+              ABORTED: 'ABORTED', SNAPSHOT: 'SNAPSHOT', COUNTER: 'COUNTER'}
+
+# record = header (payload length, crc32, kind) + payload
+RECORD_HEADER = struct.Struct("!IIB")
+# payload = transaction_id, operation count, then (opcode, song_id) per operation
+_STR_LEN = struct.Struct("!H")
+_COUNT = struct.Struct("!I")
+_OPCODES = {'add': 0, 'remove': 1}
+_OPNAMES = {code: name for name, code in _OPCODES.items()}
+
+
+def _encode_str(value, out):
+    data = str(value).encode("utf-8")
+    out += _STR_LEN.pack(len(data))
+    out += data
+
+
+def _decode_str(buf, offset):
+    (n,) = _STR_LEN.unpack_from(buf, offset)
+    offset += _STR_LEN.size
+    return buf[offset:offset + n].decode("utf-8"), offset + n
+
+
+def encode_record(kind, transaction_id, operations=()):
+    payload = bytearray()
+    _encode_str(transaction_id, payload)
+    payload += _COUNT.pack(len(operations))
+    for op in operations:
+        payload.append(_OPCODES[op['operation']])
+        _encode_str(op['song_id'], payload)
+    crc = zlib.crc32(payload, kind)
+    return RECORD_HEADER.pack(len(payload), crc, kind) + payload
+
+
+def decode_payload(payload):
+    transaction_id, offset = _decode_str(payload, 0)
+    (count,) = _COUNT.unpack_from(payload, offset)
+    offset += _COUNT.size
+    operations = []
+    for _ in range(count):
+        opcode = payload[offset]
+        song_id, offset = _decode_str(payload, offset + 1)
+        operations.append({'operation': _OPNAMES[opcode], 'song_id': song_id})
+    return transaction_id, operations
+
+
+def read_records(path):
+    """
+    Yield (kind, transaction_id, operations, end_offset) for every intact record.
+    Stops at the first torn or corrupt record (e.g. a crash mid-write).
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        data = f.read()
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        length, crc, kind = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload, kind) != crc:
+            return
+        transaction_id, operations = decode_payload(payload)
+        offset = start + length
+        yield kind, transaction_id, operations, offset
+
+
+class WriteAheadLog:
+    """
+    Append-only transaction log with group fsync.
+    Writers append to the file buffer; a flusher thread fsyncs every flush_interval
+    and wakes all writers whose records are now durable, so many concurrent
+    commits share one fsync.
+    """
+    def __init__(self, path, flush_interval=0.005):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # held across an fsync and while checkpoint()/close() swap or close the file, so the
+        # fsync never hits a closed (or reused) descriptor; appends only need _lock
+        self._file_lock = threading.Lock()
+        self._durable = threading.Condition(self._lock)
+        self._written_lsn = 0       # last record handed to the file
+        self._durable_lsn = 0       # last record known to be on disk
+        self._closed = False
+        self.records_since_checkpoint = 0
+
+        # drop a torn tail left by a crash before appending after it
+        valid_end = 0
+        for *_, end in read_records(path):
+            valid_end = end
+            self.records_since_checkpoint += 1
+        self._file = open(path, "ab")
+        if self._file.tell() != valid_end:
+            self._file.truncate(valid_end)
+            self._file.seek(valid_end)
+
+        self._flush_needed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def replay(self):
+        """Return every intact record as (kind, transaction_id, operations)"""
+        with self._lock:
+            self._file.flush()
+        return [(kind, txn_id, ops) for kind, txn_id, ops, _ in read_records(self.path)]
+
+    def append(self, kind, transaction_id, operations=(), sync=True):
+        """
+        Append a record and return its log sequence number.
+        With sync=True return only once it has been fsynced; with sync=False the
+        caller can release its own locks first and then call wait_durable(lsn).
+        """
+        record = encode_record(kind, transaction_id, operations)
+        with self._lock:
+            if self._closed:
+                raise ValueError("write-ahead log is closed")
+            self._file.write(record)
+            self._written_lsn += 1
+            lsn = self._written_lsn
+            self.records_since_checkpoint += 1
+            self._flush_needed.set()
+        if sync:
+            self.wait_durable(lsn)
+        return lsn
+
+    def wait_durable(self, lsn):
+        with self._lock:
+            self._durable.wait_for(lambda: self._durable_lsn >= lsn or self._closed)
+
+    def _flush_loop(self):
+        while True:
+            self._flush_needed.wait()
+            if self._closed:
+                return
+            self._flush_needed.clear()
+            self.sync()
+
+    def sync(self):
+        """Write buffered records to disk and wake the writers waiting on them"""
+        # sleeping first lets concurrent writers join the same fsync
+        if self.flush_interval:
+            time.sleep(self.flush_interval)
+        with self._file_lock:
+            with self._lock:
+                if self._closed:
+                    return
+                self._file.flush()
+                target = self._written_lsn
+                fd = self._file.fileno()
+            try:
+                os.fsync(fd)    # appends can go on meanwhile; the file itself can't be swapped
+            except OSError as e:
+                print(f"[WAL] fsync of {self.path} failed: {e}")
+                return
+            with self._lock:
+                self._durable_lsn = max(self._durable_lsn, target)
+                self._durable.notify_all()
+
+    def checkpoint(self, records):
+        """
+        Replace the log with `records` (a list of (kind, transaction_id, operations))
+        that fully describe the current state. Everything before is truncated.
+        """
+        data = b"".join(encode_record(kind, txn_id, ops) for kind, txn_id, ops in records)
+        tmp_path = self.path + ".tmp"
+        with self._file_lock, self._lock:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "ab")
+            self._durable_lsn = self._written_lsn
+            self.records_since_checkpoint = len(records)
+            self._durable.notify_all()
+
+    def close(self):
+        with self._file_lock, self._lock:
+            if self._closed:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._closed = True
+            self._durable_lsn = self._written_lsn
+            self._durable.notify_all()
+            self._file.close()
+        self._flush_needed.set()